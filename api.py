@@ -0,0 +1,112 @@
+r"""Serves `MCPAgent` over HTTP with warm MCP sessions, see `src/server/app.py`.
+
+The MCP servers are given as JSON in `MCP_SERVERS`, keyed by the name used to prefix their
+tools. An entry with a `command` is started over stdio, an entry with a `url` is reached
+over SSE, or over streamable HTTP with `"transport": "streamable-http"`. With `API_WORKERS`
+above one, runs are sharded across that many processes, see `src/server/workers.py`.
+
+Examples:
+    ```bash
+    MCP_SERVERS='{"context7": {"command": "npx", "args": ["-y", "@upstash/context7-mcp"]}}' \
+        python ./api.py
+    curl -X POST localhost:8000/runs -H "X-Tenant-ID: acme" -d '{"message": "...", "wait": true}'
+    ```
+"""
+
+from typing import Any
+from functools import partial
+
+from mcp import StdioServerParameters
+from main import MCPAgent
+import uvicorn
+from pydantic import Field, AliasChoices
+from pydantic_settings import BaseSettings
+from mcp.client.session_group import (
+    ServerParameters,
+    SseServerParameters,
+    StreamableHttpParameters,
+)
+
+from src.server.app import create_app
+from src.server.workers import WorkerPool
+from src.server.admission import AdmissionControl
+
+
+class ApiConfig(BaseSettings):
+    host: str = Field(
+        default="0.0.0.0",  # noqa: S104
+        description="Interface to listen on.",
+        validation_alias=AliasChoices("API_HOST", "host"),
+    )
+    port: int = Field(
+        default=8000,
+        description="Port to listen on.",
+        validation_alias=AliasChoices("API_PORT", "port"),
+    )
+    mcp_servers: dict[str, dict[str, Any]] = Field(
+        ...,
+        description="MCP servers keyed by name, see the module docstring.",
+        validation_alias=AliasChoices("MCP_SERVERS", "mcp_servers"),
+    )
+    max_running: int = Field(
+        default=8,
+        description="Runs executing at the same time.",
+        validation_alias=AliasChoices("API_MAX_RUNNING", "max_running"),
+    )
+    max_queued: int = Field(
+        default=64,
+        description="Runs waiting for a slot before new ones get 429.",
+        validation_alias=AliasChoices("API_MAX_QUEUED", "max_queued"),
+    )
+    max_per_tenant: int = Field(
+        default=8,
+        description="Queued plus running runs per tenant before its new ones get 429.",
+        validation_alias=AliasChoices("API_MAX_PER_TENANT", "max_per_tenant"),
+    )
+    workers: int = Field(
+        default=1,
+        ge=1,
+        description="Worker processes with their own agent and sessions, runs are sharded across them.",
+        validation_alias=AliasChoices("API_WORKERS", "workers"),
+    )
+    tenant_header: str = Field(
+        default="X-Tenant-ID",
+        description="Request header that names the tenant of a run.",
+        validation_alias=AliasChoices("API_TENANT_HEADER", "tenant_header"),
+    )
+
+    def server_params(self) -> dict[str, ServerParameters]:
+        params: dict[str, ServerParameters] = {}
+        for name, server in self.mcp_servers.items():
+            server = dict(server)
+            transport = server.pop("transport", None)
+            if "command" in server:
+                params[name] = StdioServerParameters(**server)
+            elif transport == "streamable-http":
+                params[name] = StreamableHttpParameters(**server)
+            else:
+                params[name] = SseServerParameters(**server)
+        return params
+
+
+def agent_factory() -> MCPAgent | WorkerPool:
+    factory = partial(MCPAgent, params=config.server_params())
+    if config.workers == 1:
+        return factory()
+    return WorkerPool(factory, workers=config.workers)
+
+
+config = ApiConfig()
+app = create_app(
+    agent_factory,
+    admission=AdmissionControl(
+        max_running=config.max_running,
+        max_queued=config.max_queued,
+        max_per_tenant=config.max_per_tenant,
+    ),
+    tenant_header=config.tenant_header,
+)
+
+if __name__ == "__main__":
+    # A single server process, `API_WORKERS` spreads the runs over processes behind it
+    uvicorn.run(app, host=config.host, port=config.port)
@@ -0,0 +1,100 @@
+"""OpenAI-compatible stub for `Config.base_url` that replies from a fixed script.
+
+A request that offers tools and does not end with a tool result gets `--tool-calls` calls
+to the first offered tools, every other request gets `Done. TERMINATE`. The router of
+`MCPAgent._create_run` is always told `DIRECT`.
+
+Examples:
+    ```bash
+    python ./benchmarks/fake_llm.py --port 8765 --latency 0.2
+    ```
+"""
+
+import json
+import time
+import uuid
+from typing import Any
+import asyncio
+import argparse
+from collections.abc import AsyncIterator
+
+import uvicorn
+from starlette.routing import Route
+from starlette.requests import Request
+from starlette.responses import Response, JSONResponse, StreamingResponse
+from starlette.applications import Starlette
+
+
+def scripted_reply(body: dict[str, Any], tool_calls: int) -> dict[str, Any]:
+    messages = body["messages"]
+    tools = body.get("tools") or []
+    if "Reply `DIRECT`" in (messages[0].get("content") or ""):
+        return {"content": "DIRECT"}
+    if not tools or messages[-1].get("role") == "tool":
+        return {"content": "Done. TERMINATE"}
+    calls = [
+        {
+            "id": f"call_{uuid.uuid4().hex[:12]}",
+            "type": "function",
+            "function": {"name": tool["function"]["name"], "arguments": '{"query": "bench"}'},
+        }
+        for tool in tools[:tool_calls]
+    ]
+    return {"content": None, "tool_calls": calls}
+
+
+def chunk(base: dict[str, Any], delta: dict[str, Any], finish_reason: str | None) -> str:
+    choice = {"index": 0, "delta": delta, "finish_reason": finish_reason}
+    return (
+        f"data: {json.dumps({**base, 'object': 'chat.completion.chunk', 'choices': [choice]})}\n\n"
+    )
+
+
+async def stream_reply(base: dict[str, Any], reply: dict[str, Any]) -> AsyncIterator[str]:
+    if reply.get("tool_calls"):
+        calls = [{"index": i, **call} for i, call in enumerate(reply["tool_calls"])]
+        yield chunk(base, {"role": "assistant", "tool_calls": calls}, None)
+        finish_reason = "tool_calls"
+    else:
+        for word in reply["content"].split(" "):
+            yield chunk(base, {"content": f"{word} "}, None)
+        finish_reason = "stop"
+    yield chunk(base, {}, finish_reason)
+    yield "data: [DONE]\n\n"
+
+
+def build_app(latency: float = 0.0, tool_calls: int = 1) -> Starlette:
+    async def completions(request: Request) -> Response:
+        body = await request.json()
+        if latency > 0:
+            await asyncio.sleep(latency)
+        reply = scripted_reply(body, tool_calls=tool_calls)
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex}", "created": int(time.time())}
+        base["model"] = body["model"]
+        if body.get("stream"):
+            return StreamingResponse(stream_reply(base, reply), media_type="text/event-stream")
+        finish_reason = "tool_calls" if reply.get("tool_calls") else "stop"
+        choice = {
+            "index": 0,
+            "message": {"role": "assistant", **reply},
+            "finish_reason": finish_reason,
+        }
+        usage = {"prompt_tokens": 100, "completion_tokens": 10, "total_tokens": 110}
+        return JSONResponse({
+            **base,
+            "object": "chat.completion",
+            "choices": [choice],
+            "usage": usage,
+        })
+
+    return Starlette(routes=[Route("/v1/chat/completions", completions, methods=["POST"])])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per completion.")
+    parser.add_argument("--tool-calls", type=int, default=1, help="Tool calls per first turn.")
+    args = parser.parse_args()
+    app = build_app(latency=args.latency, tool_calls=args.tool_calls)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,399 @@
+"""Hermetic benchmarks for session setup, tool listing and end-to-end runs.
+
+Every MCP server is `stub_mcp_server.py` and the LLM is `fake_llm.py`, both started on
+localhost, so the numbers only move when this code does.
+
+Examples:
+    ```bash
+    python -m benchmarks.harness run --output ./benchmarks/results/baseline.json
+    python -m benchmarks.harness run --output ./benchmarks/results/current.json
+    python -m benchmarks.harness compare ./benchmarks/results/baseline.json ./benchmarks/results/current.json
+    ```
+"""
+
+import sys
+import json
+import time
+import socket
+from typing import Literal
+import asyncio
+from pathlib import Path
+import argparse
+from datetime import datetime
+from functools import partial
+from contextlib import ExitStack, contextmanager
+import subprocess
+from collections.abc import Iterator
+
+from mcp import StdioServerParameters
+from main import MCPAgent
+from pydantic import Field, BaseModel
+from mcp.client.session_group import (
+    ServerParameters,
+    SseServerParameters,
+    StreamableHttpParameters,
+)
+
+from src.utils.stats import percentile
+from src.sessions.pool import SessionPool
+from src.server.workers import WorkerPool
+from src.workflow.batch import BatchRun, BatchSummary
+
+ROOT = Path(__file__).parent
+Transport = Literal["stdio", "sse", "streamable-http"]
+
+
+class BenchmarkConfig(BaseModel):
+    tools: int = Field(default=20, description="Tools exposed by the stub MCP server.")
+    tool_latency: float = Field(default=0.01, description="Seconds per stub tool call.")
+    payload: int = Field(default=1024, description="Characters per stub tool result.")
+    llm_latency: float = Field(default=0.05, description="Seconds per fake LLM completion.")
+    tool_calls: int = Field(default=2, description="Tool calls the fake LLM asks for per run.")
+    repeats: int = Field(default=10, description="Samples for session setup and tool listing.")
+    startup_repeats: int = Field(
+        default=5, description="Fresh interpreters started to measure the cold start."
+    )
+    runs: int = Field(
+        default=64, description="Runs per concurrency level, at least the concurrency itself."
+    )
+    concurrency: list[int] = Field(
+        default=[1, 8, 64], description="Concurrency levels of the end-to-end runs."
+    )
+    workers: list[int] = Field(
+        default=[],
+        description="Worker process counts of `WorkerPool` run at the highest concurrency level.",
+    )
+    transports: list[Transport] = Field(
+        default=["stdio", "sse", "streamable-http"],
+        description="Transports measured for session setup and tool listing.",
+    )
+    run_transport: Transport = Field(
+        default="stdio", description="Transport used by the end-to-end runs."
+    )
+    base_port: int = Field(default=18700, description="First local port used by the stubs.")
+
+
+class Timing(BaseModel):
+    count: int = Field(..., description="Number of samples.")
+    mean: float = Field(..., description="Mean in seconds.")
+    p50: float = Field(..., description="Median in seconds.")
+    p99: float = Field(..., description="99th percentile in seconds.")
+    max: float = Field(..., description="Slowest sample in seconds.")
+
+    @classmethod
+    def from_samples(cls, samples: list[float]) -> "Timing":
+        return cls(
+            count=len(samples),
+            mean=sum(samples) / len(samples) if samples else 0.0,
+            p50=percentile(samples, 50),
+            p99=percentile(samples, 99),
+            max=max(samples, default=0.0),
+        )
+
+
+class RunLevel(BaseModel):
+    concurrency: int = Field(..., description="Runs in flight at once.")
+    workers: int = Field(default=1, description="Processes the runs were sharded across.")
+    summary: BatchSummary = Field(..., description="Throughput and latency of the level.")
+
+
+class BenchmarkReport(BaseModel):
+    created_at: str = Field(..., description="ISO timestamp of the benchmark.")
+    python: str = Field(..., description="Interpreter version the benchmark ran on.")
+    config: BenchmarkConfig = Field(..., description="Settings the benchmark ran with.")
+    session_setup: dict[str, Timing] = Field(
+        default_factory=dict, description="Time to open and initialize a session per transport."
+    )
+    tool_listing: dict[str, Timing] = Field(
+        default_factory=dict, description="Time of `list_tools` on an open session per transport."
+    )
+    runs: list[RunLevel] = Field(
+        default_factory=list, description="End-to-end runs per concurrency level."
+    )
+    worker_runs: list[RunLevel] = Field(
+        default_factory=list, description="End-to-end runs sharded over `WorkerPool` processes."
+    )
+    startup: dict[str, Timing] = Field(
+        default_factory=dict,
+        description="Cold start of a fresh interpreter: the process, `import main`, and a ready agent.",
+    )
+    slowest_imports: dict[str, float] = Field(
+        default_factory=dict, description="Modules with the largest cumulative import time."
+    )
+
+    def metrics(self) -> dict[str, tuple[float, bool]]:
+        """Flattens the report into `name -> (value, higher_is_better)`."""
+        metrics: dict[str, tuple[float, bool]] = {}
+        for stage, timing in self.startup.items():
+            metrics[f"startup.{stage}.p50"] = (timing.p50, False)
+        for transport, timing in self.session_setup.items():
+            metrics[f"session_setup.{transport}.p50"] = (timing.p50, False)
+        for transport, timing in self.tool_listing.items():
+            metrics[f"tool_listing.{transport}.p50"] = (timing.p50, False)
+        for level in self.runs:
+            prefix = f"runs.c{level.concurrency}"
+            metrics[f"{prefix}.latency_p50"] = (level.summary.latency_p50, False)
+            metrics[f"{prefix}.latency_p95"] = (level.summary.latency_p95, False)
+            metrics[f"{prefix}.throughput"] = (level.summary.throughput, True)
+        for level in self.worker_runs:
+            prefix = f"worker_runs.w{level.workers}"
+            metrics[f"{prefix}.latency_p50"] = (level.summary.latency_p50, False)
+            metrics[f"{prefix}.throughput"] = (level.summary.throughput, True)
+        return metrics
+
+
+# Run in a fresh interpreter, prints the seconds until `main` is imported and an agent is ready
+STARTUP_SCRIPT = """
+import json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+agent = main.MCPAgent(model="bench", api_key="bench", params=main.StdioServerParameters(command="-"))
+agent.llm_config
+print(json.dumps({"import_main": imported - started, "agent_ready": time.perf_counter() - started}))
+"""
+
+
+def wait_for_port(port: int, timeout: float = 20.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.05)
+    raise TimeoutError(f"Nothing is listening on port {port} after {timeout} seconds.")
+
+
+@contextmanager
+def spawn(args: list[str], port: int) -> Iterator[None]:
+    """Starts a stub in a subprocess and stops it when the block exits."""
+    process = subprocess.Popen(  # noqa: S603
+        [sys.executable, *args], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_for_port(port)
+        yield
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+class Benchmark:
+    """Starts the stubs, measures each stage and writes a `BenchmarkReport`."""
+
+    def __init__(self, config: BenchmarkConfig):
+        self.config = config
+        self.llm_port = config.base_port
+        self.ports = {"sse": config.base_port + 1, "streamable-http": config.base_port + 2}
+
+    def _server_args(self) -> list[str]:
+        return [
+            str(ROOT / "stub_mcp_server.py"),
+            f"--tools={self.config.tools}",
+            f"--latency={self.config.tool_latency}",
+            f"--payload={self.config.payload}",
+        ]
+
+    def params(self, transport: Transport) -> ServerParameters:
+        if transport == "stdio":
+            return StdioServerParameters(command=sys.executable, args=self._server_args())
+        if transport == "sse":
+            return SseServerParameters(url=f"http://127.0.0.1:{self.ports['sse']}/sse")
+        port = self.ports["streamable-http"]
+        return StreamableHttpParameters(url=f"http://127.0.0.1:{port}/mcp")
+
+    @contextmanager
+    def stubs(self) -> Iterator[None]:
+        with ExitStack() as stack:
+            llm_args = [
+                str(ROOT / "fake_llm.py"),
+                f"--port={self.llm_port}",
+                f"--latency={self.config.llm_latency}",
+                f"--tool-calls={self.config.tool_calls}",
+            ]
+            stack.enter_context(spawn(llm_args, self.llm_port))
+            for transport, port in self.ports.items():
+                args = [*self._server_args(), f"--transport={transport}", f"--port={port}"]
+                stack.enter_context(spawn(args, port))
+            yield
+
+    async def session_setup(self, transport: Transport) -> Timing:
+        samples = []
+        for _ in range(self.config.repeats):
+            pool = SessionPool(min_size=1)
+            started = time.perf_counter()
+            await pool.warmup(self.params(transport))
+            samples.append(time.perf_counter() - started)
+            await pool.aclose()
+        return Timing.from_samples(samples)
+
+    async def tool_listing(self, transport: Transport) -> Timing:
+        samples = []
+        pool = SessionPool()
+        try:
+            async with pool.session(self.params(transport)) as session:
+                for _ in range(self.config.repeats):
+                    started = time.perf_counter()
+                    await session.list_tools()
+                    samples.append(time.perf_counter() - started)
+        finally:
+            await pool.aclose()
+        return Timing.from_samples(samples)
+
+    async def runs(self) -> list[RunLevel]:
+        levels = []
+        async with MCPAgent(
+            model="bench",
+            api_key="bench",
+            base_url=f"http://127.0.0.1:{self.llm_port}/v1",
+            params=self.params(self.config.run_transport),
+        ) as agent:
+
+            async def run(message: str) -> object:
+                # `a_run` echoes to the console, the workflow itself is what is measured
+                return await agent._collect(agent._simple_workflow(message, echo=False))
+
+            await run("warm up")
+            for concurrency in self.config.concurrency:
+                messages = [f"bench {i}" for i in range(max(self.config.runs, concurrency))]
+                batch = BatchRun(run, messages, concurrency=concurrency)
+                outcomes = [outcome async for outcome in batch]
+                failed = [outcome.error for outcome in outcomes if not outcome.ok]
+                if failed:
+                    raise RuntimeError(f"{len(failed)} runs failed, first error: {failed[0]}")
+                levels.append(RunLevel(concurrency=concurrency, summary=batch.summary))
+        return levels
+
+    async def worker_runs(self) -> list[RunLevel]:
+        levels = []
+        concurrency = max(self.config.concurrency)
+        factory = partial(
+            MCPAgent,
+            model="bench",
+            api_key="bench",
+            base_url=f"http://127.0.0.1:{self.llm_port}/v1",
+            params=self.params(self.config.run_transport),
+        )
+        for workers in self.config.workers:
+            pool = WorkerPool(factory, workers=workers)
+
+            async def run(message: str, pool: WorkerPool = pool) -> object:
+                return [event async for event in pool.a_stream(message)][-1]
+
+            try:
+                # One run per worker at once, as each goes to the least busy worker
+                await asyncio.gather(*(run("warm up") for _ in range(workers)))
+                messages = [f"bench {i}" for i in range(max(self.config.runs, concurrency))]
+                batch = BatchRun(run, messages, concurrency=concurrency)
+                outcomes = [outcome async for outcome in batch]
+            finally:
+                await pool.aclose()
+            failed = [outcome.error for outcome in outcomes if not outcome.ok]
+            if failed:
+                raise RuntimeError(f"{len(failed)} runs failed, first error: {failed[0]}")
+            levels.append(
+                RunLevel(concurrency=concurrency, workers=workers, summary=batch.summary)
+            )
+        return levels
+
+    def startup(self) -> dict[str, Timing]:
+        samples: dict[str, list[float]] = {"process": [], "import_main": [], "agent_ready": []}
+        for _ in range(self.config.startup_repeats):
+            started = time.perf_counter()
+            output = subprocess.run(  # noqa: S603
+                [sys.executable, "-c", STARTUP_SCRIPT],
+                cwd=ROOT.parent,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout
+            samples["process"].append(time.perf_counter() - started)
+            for stage, seconds in json.loads(output.splitlines()[-1]).items():
+                samples[stage].append(seconds)
+        return {stage: Timing.from_samples(values) for stage, values in samples.items()}
+
+    def slowest_imports(self, top: int = 15) -> dict[str, float]:
+        """Returns the cumulative import seconds of the slowest modules under `import main`."""
+        stderr = subprocess.run(  # noqa: S603
+            [sys.executable, "-X", "importtime", "-c", "import main"],
+            cwd=ROOT.parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stderr
+        cumulative: dict[str, float] = {}
+        for line in stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, total, module = line.split("|")
+            if total.strip().isdigit():
+                cumulative[module.strip()] = int(total) / 1e6
+        slowest = sorted(cumulative.items(), key=lambda item: item[1], reverse=True)
+        return dict(slowest[:top])
+
+    async def run(self) -> BenchmarkReport:
+        report = BenchmarkReport(
+            created_at=datetime.now().isoformat(timespec="seconds"),
+            python=sys.version.split()[0],
+            config=self.config,
+        )
+        report.startup = self.startup()
+        report.slowest_imports = self.slowest_imports()
+        with self.stubs():
+            for transport in self.config.transports:
+                report.session_setup[transport] = await self.session_setup(transport)
+                report.tool_listing[transport] = await self.tool_listing(transport)
+            report.runs = await self.runs()
+            report.worker_runs = await self.worker_runs()
+        return report
+
+
+def compare(
+    baseline: BenchmarkReport, current: BenchmarkReport, tolerance: float = 0.1
+) -> list[str]:
+    """Returns the metrics of `current` that are more than `tolerance` worse than `baseline`."""
+    regressions = []
+    previous = baseline.metrics()
+    for name, (value, higher_is_better) in current.metrics().items():
+        if name not in previous or previous[name][0] == 0:
+            continue
+        change = value / previous[name][0] - 1
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append(f"{name}: {previous[name][0]:.4f} -> {value:.4f} ({change:+.1%})")
+    return regressions
+
+
+def load(path: str) -> BenchmarkReport:
+    return BenchmarkReport.model_validate_json(Path(path).read_text(encoding="utf-8"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="Run the benchmarks and write a JSON report.")
+    run_parser.add_argument("--output", default=None, help="Report path.")
+    for name, field in BenchmarkConfig.model_fields.items():
+        option = f"--{name.replace('_', '-')}"
+        if isinstance(field.default, list):
+            run_parser.add_argument(option, nargs="+", default=None, help=field.description)
+        else:
+            kind = type(field.default) if field.default is not None else str
+            run_parser.add_argument(option, type=kind, default=None, help=field.description)
+    compare_parser = commands.add_parser("compare", help="Compare two reports.")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--tolerance", type=float, default=0.1)
+    args = vars(parser.parse_args())
+
+    if args.pop("command") == "compare":
+        regressions = compare(load(args["baseline"]), load(args["current"]), args["tolerance"])
+        print("\n".join(regressions) or "No regressions.")
+        sys.exit(1 if regressions else 0)
+
+    output = args.pop("output")
+    config = BenchmarkConfig(**{k: v for k, v in args.items() if v is not None})
+    report = asyncio.run(Benchmark(config).run())
+    path = Path(output or ROOT / "results" / f"{report.created_at.replace(':', '-')}.json")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(report.model_dump_json(indent=2), encoding="utf-8")
+    print(f"Report written to {path}")
@@ -0,0 +1,77 @@
+"""Stub MCP server for benchmarks, with a configurable number of tools, latency and payload.
+
+Examples:
+    ```bash
+    python ./benchmarks/stub_mcp_server.py --tools 40 --latency 0.05 --payload 2048
+    python ./benchmarks/stub_mcp_server.py --transport sse --port 8001
+    python ./benchmarks/stub_mcp_server.py --tools 2 --dynamic
+    ```
+"""
+
+import asyncio
+import argparse
+from collections.abc import Callable, Awaitable
+
+from mcp.server.fastmcp import Context, FastMCP
+
+
+def make_tool(latency: float, payload: int) -> Callable[[str], Awaitable[str]]:
+    async def tool(query: str = "") -> str:
+        if latency > 0:
+            await asyncio.sleep(latency)
+        return "x" * payload
+
+    return tool
+
+
+def build_server(
+    tools: int = 20,
+    latency: float = 0.0,
+    payload: int = 256,
+    port: int = 8000,
+    dynamic: bool = False,
+) -> FastMCP:
+    server = FastMCP("stub", host="127.0.0.1", port=port, log_level="WARNING")
+    for index in range(tools):
+        server.add_tool(
+            make_tool(latency=latency, payload=payload),
+            name=f"tool_{index}",
+            description=f"Stub tool number {index}, returns {payload} characters of text.",
+        )
+    if dynamic:
+
+        @server.resource("stub://items/{item_id}", name="item", description="A stub item.")
+        def item(item_id: str) -> str:
+            return f"item {item_id}"
+
+        @server.tool(description="Adds a tool named `name` and announces the new tool list.")
+        async def add_tool(name: str, ctx: Context) -> str:
+            server.add_tool(make_tool(latency=latency, payload=payload), name=name)
+            await ctx.session.send_tool_list_changed()
+            return f"added {name}"
+
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tools", type=int, default=20, help="Number of tools to expose.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per tool call.")
+    parser.add_argument("--payload", type=int, default=256, help="Characters per tool result.")
+    parser.add_argument(
+        "--transport", choices=["stdio", "sse", "streamable-http"], default="stdio"
+    )
+    parser.add_argument("--port", type=int, default=8000, help="Port for HTTP transports.")
+    parser.add_argument(
+        "--dynamic",
+        action="store_true",
+        help="Add a resource template and an `add_tool` tool that changes the tool list.",
+    )
+    args = parser.parse_args()
+    build_server(
+        tools=args.tools,
+        latency=args.latency,
+        payload=args.payload,
+        port=args.port,
+        dynamic=args.dynamic,
+    ).run(transport=args.transport)
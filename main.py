@@ -1,78 +1,140 @@
 import os
+import time
+from typing import Any
 import asyncio
-
-import logfire
-
-logfire.configure(send_to_logfire=False)
-
+from weakref import WeakValueDictionary
+from functools import partial
 from contextlib import asynccontextmanager
-from collections.abc import AsyncGenerator
+from collections.abc import Iterable, AsyncIterable, AsyncIterator, AsyncGenerator
 
 from mcp import ClientSession, StdioServerParameters
-from autogen import ChatResult, AssistantAgent, ConversableAgent
-from pydantic import ConfigDict, computed_field
-from autogen.mcp import create_toolkit
-from mcp.client.sse import sse_client
-from mcp.client.stdio import stdio_client
+from autogen import AssistantAgent, ConversableAgent
+import logfire
+from pydantic import Field, ConfigDict, PrivateAttr, computed_field
+from typing_extensions import Self
 from autogen.io.run_response import Message
-from mcp.client.session_group import (
-    ServerParameters,
-    SseServerParameters,
-    StreamableHttpParameters,
-)
-from mcp.client.streamable_http import streamablehttp_client
+from mcp.client.session_group import ServerParameters, SseServerParameters
 
 from src.types.config import Config
+from src.types.events import Routed, RunEvent, RunStarted, RunFinished, StageStarted, StageFinished
+from src.sessions.pool import SessionPool
+from src.tools.catalog import ToolCatalog, MergedCatalog
+from src.workflow.batch import BatchRun
+from src.tools.selection import SelectedTools, ToolSelection, register_tools
+from src.utils.telemetry import SpanRecorder, trace_stages, get_telemetry
+from src.workflow.agents import AgentSet, AgentPool
+from src.workflow.streaming import ChatRun, stream_response, enable_streaming
+from src.sessions.connection import server_name
+from src.workflow.compaction import ContextBudget, extract_plan, add_compaction
+from src.workflow.checkpoints import ToolReplay, RunCheckpoint, CheckpointStore, replaying
 
 
 class MCPAgent(Config):
     model_config = ConfigDict(arbitrary_types_allowed=True)
-    params: ServerParameters
+    params: ServerParameters | list[ServerParameters] | dict[str, ServerParameters] = Field(
+        ...,
+        description="One MCP server, a list of servers, or servers keyed by the name used to prefix their tools.",
+    )
+    session_pool: SessionPool = Field(
+        default_factory=SessionPool,
+        description="Pool of long-lived MCP sessions shared by every run of this agent.",
+        exclude=True,
+    )
+    tool_catalog: ToolCatalog = Field(
+        default_factory=ToolCatalog,
+        description="Cache of tool lists, tool detail and toolkits per MCP server.",
+        exclude=True,
+    )
+    agent_pool: AgentPool = Field(
+        default_factory=AgentPool,
+        description="Built agents with their tools registered, reused across runs.",
+        exclude=True,
+    )
+    route_requests: bool = Field(
+        default=True,
+        description="Let a router skip the planning stage of `_create_run` for simple requests.",
+    )
+    tool_selection: ToolSelection = Field(
+        default_factory=ToolSelection,
+        description="Which tools are sent to the LLM for a request, all of them by default.",
+    )
+    context_budget: ContextBudget | None = Field(
+        default=None,
+        description="Token limits of the chat history, tool results and plan hand-off, `None` sends them in full.",
+    )
+    checkpoints: CheckpointStore | None = Field(
+        default=None,
+        description="Durable per-stage checkpoints of planned runs for `a_resume`, `None` disables them.",
+        exclude=True,
+    )
+
+    # One lock per run being resumed, dropped once no resume of that run is left
+    _resume_locks: WeakValueDictionary[str, asyncio.Lock] = PrivateAttr(
+        default_factory=WeakValueDictionary
+    )
+
+    def model_post_init(self, context: Any, /) -> None:  # noqa: ANN401
+        """Configures telemetry once the first agent is built, see `get_telemetry`."""
+        get_telemetry()
+
+    @property
+    def telemetry(self) -> SpanRecorder:
+        """Latency percentiles and counters of every span recorded in this process."""
+        return get_telemetry()
 
     @computed_field
     @property
-    def _compiled_params(self) -> ServerParameters:
-        return self.params
+    def _compiled_params(self) -> dict[str, ServerParameters]:
+        if isinstance(self.params, dict):
+            return self.params
+        params_list = self.params if isinstance(self.params, list) else [self.params]
+        compiled: dict[str, ServerParameters] = {}
+        for params in params_list:
+            name = server_name(params)
+            suffix = 2
+            while name in compiled:
+                name = f"{server_name(params)}_{suffix}"
+                suffix += 1
+            compiled[name] = params
+        return compiled
 
     @asynccontextmanager
-    async def _session_context(self) -> AsyncGenerator[ClientSession, None]:
-        if isinstance(self._compiled_params, StdioServerParameters):
-            async with (
-                stdio_client(self._compiled_params) as (read, write),
-                ClientSession(read, write) as session,
-            ):
-                await session.initialize()
-                yield session
-        elif isinstance(self._compiled_params, SseServerParameters):
-            async with (
-                sse_client(**self._compiled_params.model_dump()) as streams,
-                ClientSession(*streams) as session,
-            ):
-                await session.initialize()
-                yield session
-        elif isinstance(self._compiled_params, StreamableHttpParameters):
-            async with (
-                streamablehttp_client(**self._compiled_params.model_dump()) as streams,
-                ClientSession(*streams) as session,
-            ):
-                await session.initialize()
-                yield session
-        else:
-            raise ValueError("Invalid parameters provided for MCPAgent.")
+    async def _session_context(
+        self, server: str | None = None
+    ) -> AsyncGenerator[ClientSession, None]:
+        servers = self._compiled_params
+        params = servers[server] if server is not None else next(iter(servers.values()))
+        async with self.session_pool.session(params) as session:
+            yield session
+
+    async def _get_catalog(self) -> MergedCatalog:
+        return await self.tool_catalog.get_many(self._compiled_params, pool=self.session_pool)
 
     async def a_get_tool_detail(self) -> str:
         try:
-            async with self._session_context() as session:
-                tools_result = await session.list_tools()
-                tool_detail = ""
-                for tool in tools_result.tools:
-                    tool_detail += f"\n- `{tool.name}`:\n{tool.description}"
+            catalog = await self._get_catalog()
         except Exception:
-            tool_detail = "No tools available or an error occurred while fetching tool details."
-        return tool_detail
-
-    async def _create_simple_run(self, message: str, session: ClientSession) -> Message:
-        # Ref: https://docs.ag2.ai/0.9.3/docs/user-guide/advanced-concepts/tools/mcp/client/
+            return "No tools available or an error occurred while fetching tool details."
+        return catalog.detail
+
+    def _select_tools(self, catalog: MergedCatalog, message: str) -> SelectedTools:
+        selected = self.tool_selection.select(
+            catalog.toolkit.tools,
+            index=catalog.index,
+            detail=catalog.detail,
+            query=message,
+            always=catalog.builtin,
+        )
+        if selected.pruned:
+            logfire.info(
+                "Sending {kept}/{total} tools to the LLM, about {saved} prompt tokens saved per turn",
+                kept=len(selected.tools),
+                total=len(selected.tools) + len(selected.pruned),
+                saved=selected.saved_tokens,
+            )
+        return selected
+
+    def _build_simple_agents(self, selected: SelectedTools, stream: bool) -> AgentSet:
         user = ConversableAgent(
             name="user",
             system_message="REPLY `TERMINATE` if the task is done.",
@@ -85,20 +147,36 @@ class MCPAgent(Config):
             llm_config=self.llm_config,
             is_termination_msg=lambda x: "TERMINATE" in (x.get("content") or "") if x else False,
         )
-        toolkit = await create_toolkit(session=session)
-        for tool in toolkit.tools:
-            tool.register_for_execution(user)
-            tool.register_for_llm(user)
-            tool.register_for_execution(agent)
-            tool.register_for_llm(agent)
-
-        result = await user.a_run(
-            recipient=agent, message=message, tools=toolkit.tools, max_turns=None, user_input=False
+        add_compaction(self.context_budget, user, agent)
+        agents = AgentSet(user=user, assistant=agent)
+
+        def on_expand() -> None:
+            agents.dirty = True
+            if stream:
+                enable_streaming(user, agent)
+
+        register_tools(
+            selected, callers=[user, agent], executors=[user, agent], on_expand=on_expand
+        )
+        if stream:
+            enable_streaming(user, agent)
+        return agents
+
+    def _build_router(self) -> AgentSet:
+        router = ConversableAgent(
+            name="router",
+            system_message="""Decide how the user's request should be handled.
+            Reply `DIRECT` if it can be answered right away or needs only a few straightforward
+            tool calls, such as looking something up or listing items.
+            Reply `PLAN` if it needs content to be written or several coordinated steps.
+            Reply with that single word only.
+            """,
+            llm_config=self.llm_config,
+            human_input_mode="NEVER",
         )
-        await result.process()
-        return await result.messages
+        return AgentSet(router=router)
 
-    async def _create_run(self, message: str, session: ClientSession) -> Message:
+    def _build_planning_agents(self, stream: bool) -> AgentSet:
         assistant = AssistantAgent(
             name="assistant",
             system_message="""You are an Assistant Agent who provides comprehensive answers and content preparation for user requests.
@@ -150,34 +228,12 @@ class MCPAgent(Config):
             human_input_mode="NEVER",
             is_termination_msg=lambda x: "TERMINATE" in (x.get("content") or "") if x else False,
         )
+        add_compaction(self.context_budget, assistant, planner)
+        if stream:
+            enable_streaming(assistant, planner)
+        return AgentSet(assistant=assistant, planner=planner)
 
-        # Get available tools information
-        tool_detail = await self.a_get_tool_detail()
-
-        # Step 1: Assistant analyzes the user's request
-        assistant_plan = await assistant.a_run(
-            recipient=planner,
-            message=f"""
-            Please work together to fulfill this user request:
-
-            User Request: {message}
-
-            Available MCP Tools:
-            {tool_detail}
-
-            Assistant: Please provide comprehensive content/answers that fulfill the user's request.
-            If they ask for explanations, provide detailed explanations.
-            If they need specific content, prepare that content.
-
-            Planner: Take the assistant's content and create a detailed technical execution plan
-            that includes the assistant's prepared content and uses the available tools.
-            """,
-            max_turns=4,
-        )
-        await assistant_plan.process()
-        result_messages = await assistant_plan.messages
-
-        # Step 2: Execute the plan with MCP agent
+    def _build_execution_agents(self, selected: SelectedTools, stream: bool) -> AgentSet:
         mcp_agent = AssistantAgent(
             name="mcp_agent",
             system_message="""
@@ -189,20 +245,343 @@ class MCPAgent(Config):
             """,
             llm_config=self.llm_config,
         )
+        # Same executor AG2 creates for `a_run` without a recipient, made explicit so that
+        # pruned tools can be registered for execution only
+        executor = ConversableAgent(
+            name="user",
+            human_input_mode="NEVER",
+            is_termination_msg=lambda x: "TERMINATE" in (x.get("content") or "") if x else False,
+        )
+        add_compaction(self.context_budget, mcp_agent)
+        agents = AgentSet(user=executor, mcp_agent=mcp_agent)
+
+        def on_expand() -> None:
+            agents.dirty = True
+            if stream:
+                enable_streaming(mcp_agent)
+
+        register_tools(selected, callers=[mcp_agent], executors=[executor], on_expand=on_expand)
+        if stream:
+            enable_streaming(mcp_agent)
+        return agents
+
+    async def _collect(self, events: AsyncIterator[RunEvent]) -> list[Message]:
+        messages: list[dict[str, Any]] = []
+        async for event in trace_stages(events):
+            if isinstance(event, RunFinished):
+                messages = event.messages
+        return messages
+
+    def _replay(self, checkpoint: RunCheckpoint | None) -> ToolReplay | None:
+        if checkpoint is None or self.checkpoints is None:
+            return None
+        return ToolReplay(self.checkpoints, checkpoint.run_id)
+
+    def _save_checkpoint(self, checkpoint: RunCheckpoint | None, **stage: Any) -> None:  # noqa: ANN401
+        if checkpoint is None or self.checkpoints is None:
+            return
+        for name, value in stage.items():
+            setattr(checkpoint, name, value)
+        self.checkpoints.save(checkpoint)
+
+    async def _simple_workflow(
+        self,
+        message: str,
+        stream: bool = False,
+        echo: bool = True,
+        checkpoint: RunCheckpoint | None = None,
+    ) -> AsyncIterator[RunEvent]:
+        # Ref: https://docs.ag2.ai/0.9.3/docs/user-guide/advanced-concepts/tools/mcp/client/
+        started = time.perf_counter()
+        catalog = await self._get_catalog()
+        selected = self._select_tools(catalog, message)
+        key = ("simple", catalog.version, tuple(tool.name for tool in selected.tools), stream)
+        build = partial(self._build_simple_agents, selected, stream=stream)
+        yield StageStarted(stage="execute")
+        stage_started = time.perf_counter()
+        with self.agent_pool.lease(key, build) as agents:
+            # The chat task copies the replay when it starts, it is not kept across `yield`
+            with replaying(self._replay(checkpoint)):
+                chat = ChatRun(agents["user"], agents["assistant"], message=message)
+            async with chat as result:
+                async for event in stream_response(result, stage="execute", echo=echo):
+                    yield event
+                messages = list(await result.messages)
+                summary = await result.summary
+        yield StageFinished(stage="execute", duration=time.perf_counter() - stage_started)
+        yield RunFinished(
+            messages=messages, summary=summary, duration=time.perf_counter() - started
+        )
+
+    async def _create_simple_run(self, message: str, echo: bool = True) -> list[Message]:
+        return await self._collect(self._simple_workflow(message=message, echo=echo))
+
+    async def _planned_workflow(
+        self,
+        message: str,
+        stream: bool = False,
+        echo: bool = True,
+        checkpoint: RunCheckpoint | None = None,
+    ) -> AsyncIterator[RunEvent]:
+        started = time.perf_counter()
+        # Get available tools information
+        catalog = await self._get_catalog()
+        selected = self._select_tools(catalog, message)
+        tool_detail = selected.detail
+        # A resumed run that already has its plan goes straight to execution
+        plan = checkpoint.plan if checkpoint is not None else None
+        if plan is None:
+            # Step 1: Assistant analyzes the user's request
+            yield StageStarted(stage="plan")
+            stage_started = time.perf_counter()
+            with self.agent_pool.lease(
+                ("plan", stream), partial(self._build_planning_agents, stream=stream)
+            ) as agents:
+                chat = ChatRun(
+                    agents["assistant"],
+                    agents["planner"],
+                    message=f"""
+                Please work together to fulfill this user request:
+
+                User Request: {message}
+
+                Available MCP Tools:
+                {tool_detail}
+
+                Assistant: Please provide comprehensive content/answers that fulfill the user's request.
+                If they ask for explanations, provide detailed explanations.
+                If they need specific content, prepare that content.
+
+                Planner: Take the assistant's content and create a detailed technical execution plan
+                that includes the assistant's prepared content and uses the available tools.
+                """,
+                    max_turns=4,
+                    cache=self.completion_cache,
+                )
+                async with chat as assistant_plan:
+                    async for event in stream_response(assistant_plan, stage="plan", echo=echo):
+                        yield event
+                    plan_messages = list(await assistant_plan.messages)
+                plan = extract_plan(plan_messages, self.context_budget, author="planner")
+            if self.completion_cache is not None:
+                cache_stats = self.completion_cache.stats()
+                logfire.info(
+                    "Completion cache hit rate {hit_rate:.0%} ({hits} hits, {misses} misses)",
+                    hit_rate=cache_stats.hit_rate,
+                    hits=cache_stats.hits,
+                    misses=cache_stats.misses,
+                )
+            yield StageFinished(stage="plan", duration=time.perf_counter() - stage_started)
+            self._save_checkpoint(checkpoint, plan=plan, plan_messages=plan_messages)
+
+        # Step 2: Execute the plan with MCP agent
+        yield StageStarted(stage="execute")
+        stage_started = time.perf_counter()
+        key = ("execute", catalog.version, tuple(tool.name for tool in selected.tools), stream)
+        build = partial(self._build_execution_agents, selected, stream=stream)
+        with self.agent_pool.lease(key, build) as agents:
+            with replaying(self._replay(checkpoint)):
+                chat = ChatRun(
+                    agents["user"],
+                    agents["mcp_agent"],
+                    message=f"Original Message:\n{message}\n\nExecution Plan:\n{plan}",
+                    max_turns=3,
+                )
+            async with chat as result:
+                async for event in stream_response(result, stage="execute", echo=echo):
+                    yield event
+                messages = list(await result.messages)
+                summary = await result.summary
+        yield StageFinished(stage="execute", duration=time.perf_counter() - stage_started)
+        yield RunFinished(
+            messages=messages, summary=summary, duration=time.perf_counter() - started
+        )
 
-        toolkit = await create_toolkit(session=session)
-        result = await mcp_agent.a_run(
-            message=f"Original Message:\n{message}\n\nExecution Plan:\n{result_messages}",
-            tools=toolkit.tools,
-            max_turns=3,
-            user_input=False,
+    async def _route(self, message: str) -> Routed:
+        with self.agent_pool.lease(("route",), self._build_router) as agents:
+            router = agents["router"]
+            router.client_cache = self.completion_cache
+            reply = await router.a_generate_reply(messages=[{"role": "user", "content": message}])
+        content = reply.get("content") if isinstance(reply, dict) else reply
+        text = (content or "").strip()
+        # Anything but a clear `DIRECT` keeps the original planning behaviour
+        direct = "DIRECT" in text.upper() and "PLAN" not in text.upper()
+        return Routed(route="direct" if direct else "plan", reply=text)
+
+    async def _routed_workflow(
+        self,
+        message: str,
+        stream: bool = False,
+        echo: bool = True,
+        checkpoint: RunCheckpoint | None = None,
+    ) -> AsyncIterator[RunEvent]:
+        """Lets the router pick the simple or the planned workflow for `message`.
+
+        The tool catalog (and with it the MCP sessions) is loaded while the router's LLM call
+        is in flight, so neither waits for the other. A resumed run keeps its earlier route.
+        """
+        stages: dict[str, float] = {}
+        if checkpoint is not None and checkpoint.route is not None:
+            routed = Routed(route=checkpoint.route, reply="")
+        else:
+            catalog_task = asyncio.create_task(self._get_catalog())
+            yield StageStarted(stage="route")
+            stage_started = time.perf_counter()
+            try:
+                routed = await self._route(message)
+            except BaseException:
+                # Let the load finish in the background, its sessions stay pooled for the next run
+                catalog_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+                raise
+            yield routed
+            await catalog_task
+            stages["route"] = time.perf_counter() - stage_started
+            yield StageFinished(stage="route", duration=stages["route"])
+            self._save_checkpoint(checkpoint, route=routed.route)
+
+        workflow = self._simple_workflow if routed.route == "direct" else self._planned_workflow
+        async for event in workflow(
+            message=message, stream=stream, echo=echo, checkpoint=checkpoint
+        ):
+            if isinstance(event, StageFinished):
+                stages[event.stage] = event.duration
+            yield event
+        logfire.info(
+            "Run took the {route} route, stage latency: {stages}",
+            route=routed.route,
+            stages={stage: round(duration, 3) for stage, duration in stages.items()},
         )
-        await result.process()
-        return await result.messages
 
-    async def a_run(self, message: str) -> ChatResult:
-        async with self._session_context() as session:
-            return await self._create_simple_run(message=message, session=session)
+    async def _checkpointed(
+        self, checkpoint: RunCheckpoint, stream: bool = False, echo: bool = True
+    ) -> AsyncIterator[RunEvent]:
+        """Runs the planned workflow of `checkpoint`, saving it after every stage."""
+        workflow = self._routed_workflow if self.route_requests else self._planned_workflow
+        self._save_checkpoint(checkpoint, status="running", attempts=checkpoint.attempts + 1)
+        yield RunStarted(run_id=checkpoint.run_id, resumed=checkpoint.attempts > 1)
+        try:
+            async for event in workflow(
+                message=checkpoint.message, stream=stream, echo=echo, checkpoint=checkpoint
+            ):
+                if isinstance(event, RunFinished):
+                    self._save_checkpoint(
+                        checkpoint,
+                        status="succeeded",
+                        messages=event.messages,
+                        summary=event.summary,
+                        error=None,
+                    )
+                yield event
+        except BaseException as e:
+            self._save_checkpoint(checkpoint, status="failed", error=f"{type(e).__name__}: {e}")
+            raise
+
+    async def _create_run(self, message: str) -> list[Message]:
+        if self.checkpoints is not None:
+            return await self._collect(self._checkpointed(self.checkpoints.create(message)))
+        workflow = self._routed_workflow if self.route_requests else self._planned_workflow
+        return await self._collect(workflow(message=message))
+
+    async def a_resume(self, run_id: str) -> list[Message]:
+        """Continues a checkpointed run from the last stage it completed.
+
+        The route and the plan of the run are reused, and tool calls it already completed
+        are answered from the checkpoint instead of calling the MCP server again. A run that
+        already succeeded returns its messages right away. Resumes of the same run on this
+        agent take turns, so a second one waits and then returns what the first produced.
+
+        Raises:
+            ValueError: If checkpoints are disabled or there is no checkpoint for `run_id`.
+        """
+        if self.checkpoints is None:
+            raise ValueError("Checkpoints are disabled, set `checkpoints` to resume runs.")
+        lock = self._resume_locks.setdefault(run_id, asyncio.Lock())
+        async with lock:
+            checkpoint = self.checkpoints.load(run_id)
+            if checkpoint is None:
+                raise ValueError(f"No checkpoint for run {run_id}.")
+            if checkpoint.status == "succeeded":
+                return checkpoint.messages
+            logfire.info(
+                "Resuming run {run_id} after {error}, plan stored: {planned}, tool calls stored: {tool_calls}",
+                run_id=run_id,
+                error=checkpoint.error,
+                planned=checkpoint.plan is not None,
+                tool_calls=checkpoint.tool_calls,
+            )
+            return await self._collect(self._checkpointed(checkpoint))
+
+    async def a_run(self, message: str) -> list[Message]:
+        return await self._create_simple_run(message=message)
+
+    async def a_stream(
+        self, message: str, planning: bool = False, conversation_id: str | None = None
+    ) -> AsyncIterator[RunEvent]:
+        """Runs `message` and yields typed events as they happen instead of waiting for the end.
+
+        Tokens are streamed from the LLM, tool calls are reported with their duration, and the
+        last event is always `RunFinished`. Stages are reported with `StageStarted` and
+        `StageFinished`. With `planning`, the workflow of `_create_run` is used, including its
+        router unless `route_requests` is off, and with `checkpoints` the first event is
+        `RunStarted` with the id to pass to `a_resume`. `conversation_id` only matters to `WorkerPool`,
+        which keeps the runs of a conversation on one worker; a single agent serves them alike.
+
+        Examples:
+            ```python
+            async for event in agent.a_stream("Which repositories do I have?"):
+                if event.type == "token":
+                    print(event.content, end="", flush=True)
+            ```
+        """
+        if not planning:
+            events = self._simple_workflow(message=message, stream=True, echo=False)
+        elif self.checkpoints is not None:
+            checkpoint = self.checkpoints.create(message)
+            events = self._checkpointed(checkpoint, stream=True, echo=False)
+        elif self.route_requests:
+            events = self._routed_workflow(message=message, stream=True, echo=False)
+        else:
+            events = self._planned_workflow(message=message, stream=True, echo=False)
+        async for event in trace_stages(events):
+            yield event
+
+    def a_run_many(
+        self, messages: Iterable[str] | AsyncIterable[str], concurrency: int = 8
+    ) -> BatchRun:
+        """Runs many messages over the shared sessions and toolkit with bounded concurrency.
+
+        Outcomes are yielded as runs complete; a failing run is reported in its outcome
+        instead of aborting the batch, and `summary` holds throughput and latency afterwards.
+
+        Examples:
+            ```python
+            batch = agent.a_run_many(messages, concurrency=8)
+            async for outcome in batch:
+                print(outcome.index, outcome.error or outcome.result)
+            print(batch.summary)
+            ```
+        """
+        # Runs in parallel don't echo, their console output would interleave
+        runner = partial(self._create_simple_run, echo=False)
+        return BatchRun(runner, messages, concurrency=concurrency)
+
+    async def aclose(self) -> None:
+        """Closes every pooled MCP session, the completion cache and the checkpoint store, and drops pooled agents."""
+        await self.session_pool.aclose()
+        self.agent_pool.clear()
+        if self._completion_cache is not None:
+            self._completion_cache.close()
+            self._completion_cache = None
+        if self.checkpoints is not None:
+            self.checkpoints.close()
+
+    async def __aenter__(self) -> Self:
+        """Returns the agent so pooled sessions are closed when the block exits."""
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        """Closes the pooled sessions, see `aclose`."""
+        await self.aclose()
 
 
 if __name__ == "__main__":
@@ -254,9 +633,12 @@ if __name__ == "__main__":
     )
     playwright_params = StdioServerParameters(command="npx", args=["-y", "@playwright/mcp@latest"])
 
-    mcp_agent = MCPAgent(model="aide-gpt-4o", params=jira_params)
-    # tools = asyncio.run(mcp_agent.a_get_tool_detail())
-    # print(tools)
+    async def main() -> None:
+        async with MCPAgent(model="aide-gpt-4o", params=jira_params) as mcp_agent:
+            # tools = await mcp_agent.a_get_tool_detail()
+            # print(tools)
+
+            # Use the multi-agent workflow
+            await mcp_agent.a_run(message=message)
 
-    # Use the multi-agent workflow
-    asyncio.run(mcp_agent.a_run(message=message))
+    asyncio.run(main())
@@ -8,23 +8,190 @@
 #     "rich",
 # ]
 # ///
+import os
 import ast
+import json
+import time
 import shutil
-from typing import Literal
+from typing import Any, Literal
 import asyncio
+import hashlib
 from pathlib import Path
-from functools import cached_property
+from datetime import datetime
+from functools import partial, cached_property
+from contextlib import contextmanager
+from collections.abc import Iterator
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.util import Finalize
 
 import anyio
 import nbformat
-from pydantic import Field, BaseModel, ConfigDict, computed_field
+from pydantic import Field, BaseModel, ConfigDict, PrivateAttr, computed_field
 from nbconvert import MarkdownExporter
 from rich.console import Console
 from rich.progress import TaskID, Progress
+from jupyter_core.utils import run_sync
 from nbconvert.preprocessors import ExecutePreprocessor
 
 console = Console()
 
+# Kept in the output folder, mkdocs skips files starting with a dot
+MANIFEST_NAME = ".manifest.json"
+
+
+class CellTiming(BaseModel):
+    index: int = Field(..., description="Position of the cell in the notebook.")
+    seconds: float = Field(..., description="Time from execute request to reply.")
+    source: str = Field(..., description="First line of the cell source.")
+
+
+class NotebookTiming(BaseModel):
+    seconds: float = Field(..., description="Wall time to execute and export the notebook.")
+    slowest_cells: list[CellTiming] = Field(
+        default_factory=list, description="Slowest executed cells, slowest first."
+    )
+
+
+class BuildReport(BaseModel):
+    rebuilt: list[str] = Field(
+        default_factory=list, description="Sources whose docs were generated."
+    )
+    skipped: list[str] = Field(
+        default_factory=list, description="Sources unchanged since the last build."
+    )
+    removed: list[str] = Field(
+        default_factory=list, description="Docs deleted because their source was removed."
+    )
+    failed: list[str] = Field(default_factory=list, description="Sources that raised an error.")
+    notebooks: dict[str, NotebookTiming] = Field(
+        default_factory=dict, description="Wall time and slowest cells of each rendered notebook."
+    )
+    seconds: float = Field(default=0.0, description="Wall time of the whole build.")
+
+
+# Kernel managers of a notebook worker process, kept alive across the notebooks it renders
+_kernels: dict[str, Any] = {}
+
+
+def _shutdown_kernels() -> None:
+    for kernel_manager in _kernels.values():
+        run_sync(kernel_manager.shutdown_kernel)(now=True)
+    _kernels.clear()
+
+
+def _discard_kernel(kernel_name: str) -> None:
+    kernel_manager = _kernels.pop(kernel_name, None)
+    if kernel_manager is not None:
+        run_sync(kernel_manager.shutdown_kernel)(now=True)
+
+
+def _cell_timings(notebook: nbformat.NotebookNode) -> list[CellTiming]:
+    cells = []
+    for index, cell in enumerate(notebook.cells):
+        seconds = _cell_seconds(cell)
+        if cell.cell_type == "code" and seconds is not None:
+            source = cell.source.strip().splitlines()[0] if cell.source.strip() else ""
+            cells.append(CellTiming(index=index, seconds=seconds, source=source))
+    return cells
+
+
+def _raised(notebook: nbformat.NotebookNode) -> bool:
+    return any(
+        output.output_type == "error"
+        for cell in notebook.cells
+        for output in cell.get("outputs", [])
+    )
+
+
+def _init_notebook_worker() -> None:
+    # Runs when the worker process exits, which skips `atexit`
+    Finalize(None, _shutdown_kernels, exitpriority=10)
+
+
+def _cell_seconds(cell: nbformat.NotebookNode) -> float | None:
+    timing = cell.get("metadata", {}).get("execution", {})
+    started, finished = timing.get("iopub.execute_input"), timing.get("shell.execute_reply")
+    if not started or not finished:
+        return None
+    try:
+        return (
+            datetime.fromisoformat(finished.replace("Z", "+00:00"))
+            - datetime.fromisoformat(started.replace("Z", "+00:00"))
+        ).total_seconds()
+    except ValueError:
+        return None
+
+
+def render_notebook(
+    file: str,
+    execute: bool,
+    kernel_name: str = "python3",
+    cell_timeout: int = 600,
+    notebook_timeout: int = 1800,
+    reuse_kernel: bool = False,
+    slowest: int = 3,
+) -> tuple[str, NotebookTiming]:
+    """Executes a notebook if asked to and exports it to markdown, in a worker process.
+
+    With `reuse_kernel`, the kernel started for the first notebook of the worker is kept for
+    the next ones: its namespace is reset and its working directory changed before each, so
+    only the kernel start-up and already imported modules carry over. A notebook has
+    `notebook_timeout` seconds in total, and a kernel whose notebook timed out or raised is
+    shut down, so the next notebook starts a fresh one.
+
+    Returns:
+        tuple[str, NotebookTiming]: The markdown and how long the notebook and its cells took.
+    """
+    started = time.perf_counter()
+    path = Path(file)
+    notebook = nbformat.reads(path.read_text(encoding="utf-8"), as_version=4)
+    cells: list[CellTiming] = []
+    if execute:
+        deadline = time.monotonic() + notebook_timeout
+        execute_preprocessor = ExecutePreprocessor(
+            timeout=cell_timeout,
+            timeout_func=lambda cell: min(cell_timeout, max(deadline - time.monotonic(), 1)),
+            kernel_name=kernel_name,
+            allow_errors=True,
+            store_widget_state=True,
+            record_timing=True,
+        )
+        kernel_manager = _kernels.get(kernel_name) if reuse_kernel else None
+        reset = kernel_manager is not None and kernel_manager.has_kernel
+        if reset:
+            # The kernel only starts in the notebook's folder once, later notebooks move it
+            notebook.cells.insert(
+                0,
+                nbformat.v4.new_code_cell(
+                    f"%reset -f\nimport os as _os\n_os.chdir({path.parent.absolute().as_posix()!r})\ndel _os"
+                ),
+            )
+        elif reuse_kernel:
+            kernel_manager = _kernels[kernel_name] = execute_preprocessor.create_kernel_manager()
+        try:
+            execute_preprocessor.preprocess(
+                notebook, {"metadata": {"path": path.parent.as_posix()}}, km=kernel_manager
+            )
+        except Exception:
+            if reuse_kernel:
+                _discard_kernel(kernel_name)
+            raise
+        finally:
+            if reuse_kernel and execute_preprocessor.kc is not None:
+                execute_preprocessor.kc.stop_channels()
+        if reuse_kernel and _raised(notebook):
+            # A cell that raised may have left the kernel half set up
+            _discard_kernel(kernel_name)
+        if reset:
+            notebook.cells.pop(0)
+        cells = _cell_timings(notebook)
+    markdown_exporter = MarkdownExporter(template_name="markdown")
+    markdown_output, _ = markdown_exporter.from_notebook_node(notebook)
+    cells.sort(key=lambda cell: cell.seconds, reverse=True)
+    timing = NotebookTiming(seconds=time.perf_counter() - started, slowest_cells=cells[:slowest])
+    return markdown_output, timing
+
 
 class DocsGenerator(BaseModel):
     """DocsGenerator is a class that generates documentation for Python files or classes within a specified source directory.
@@ -37,7 +204,10 @@ class DocsGenerator(BaseModel):
 
     Methods:
         gen_docs() -> None:
-            Generates documentation by file or class.
+            Generates documentation by file or class, only for sources changed since the last build.
+
+        build() -> BuildReport:
+            Same as gen_docs, and returns which sources were rebuilt, skipped or removed.
 
         __call__() -> None:
             Asynchronously calls the gen_docs method.
@@ -94,6 +264,27 @@ class DocsGenerator(BaseModel):
         description="Maximum number of files to process concurrently.",
         examples=[5, 10, 20],
     )
+    notebook_timeout: int = Field(
+        default=1800,
+        title="Notebook Timeout",
+        description="Seconds a notebook may take to execute in total, each cell still stops after 600 seconds.",
+        examples=[600, 1800],
+    )
+    reuse_kernels: bool = Field(
+        default=False,
+        title="Reuse Kernels",
+        description="Keep one kernel per notebook worker process and reset it between notebooks instead of starting a kernel per notebook. Imported modules, environment variables and monkeypatches carry over, so only enable it for notebooks that don't depend on a clean process.",
+        examples=["True", "False"],
+    )
+    incremental: bool = Field(
+        default=True,
+        title="Incremental Build",
+        description="Only regenerate docs whose source changed since the last build, based on a manifest of content hashes in the output folder. Disable it to wipe the output folder and rebuild everything.",
+        examples=["True", "False"],
+    )
+
+    _executor: ProcessPoolExecutor | None = PrivateAttr(default=None)
+    _timings: dict[str, NotebookTiming] = PrivateAttr(default_factory=dict)
 
     def _get_all_files(self, suffix: str) -> list[Path]:
         targets = [s.strip() for s in suffix.split(",")]
@@ -112,8 +303,6 @@ class DocsGenerator(BaseModel):
             Path: The source path.
         """
         if self.source_path.is_dir():
-            if self.output_path.exists():
-                shutil.rmtree(self.output_path.absolute())
             exclude_list = [ex.strip() for ex in self.exclude.split(",")]
             need_to_exclude = list({*exclude_list, ".venv", "__init__.py"})
             all_files = self._get_all_files(suffix="py,ipynb")
@@ -129,14 +318,16 @@ class DocsGenerator(BaseModel):
             )
         return all_files
 
-    async def _prepare_docs_path(self, file: Path) -> Path:
+    def _docs_path(self, file: Path) -> Path:
         # 因為多層結構的資料夾 我們希望他可以依然放在對應的資料夾內
         filename = file.with_suffix(".md").name
         if file.parent.as_posix() != ".":
             related_path = file.parent.relative_to(self.source_path)
-            docs_path = Path(f"{self.output_path}/{related_path}/{filename}")
-        else:
-            docs_path = Path(f"{self.output_path}/{filename}")
+            return Path(f"{self.output_path}/{related_path}/{filename}")
+        return Path(f"{self.output_path}/{filename}")
+
+    async def _prepare_docs_path(self, file: Path) -> Path:
+        docs_path = self._docs_path(file=file)
         docs_path.parent.mkdir(parents=True, exist_ok=True)
         docs_path.unlink(missing_ok=True)
         return docs_path
@@ -160,35 +351,29 @@ class DocsGenerator(BaseModel):
             raise ValueError("Invalid mode")
         if not note_content:
             note_content = f"::: {file.with_suffix('').as_posix().replace('/', '.')}\n"
-        docs_path.write_text(data=note_content, encoding="utf-8")
+        async with await anyio.open_file(docs_path, "w", encoding="utf-8") as f:
+            await f.write(note_content)
         return docs_path.as_posix()
 
     async def _gen_notebook_docs(self, file: Path) -> str:
         docs_path = await self._prepare_docs_path(file=file)
-        # 讀取 notebook 檔案
-        async with await anyio.open_file(file, encoding="utf-8") as f:
-            notebook_content = nbformat.reads(await f.read(), as_version=4)
-
+        # 執行和轉換都在 process pool 裡, 不會卡住 event loop
+        render = partial(
+            render_notebook,
+            file.as_posix(),
+            execute=self.execute,
+            notebook_timeout=self.notebook_timeout,
+            reuse_kernel=self.reuse_kernels,
+        )
+        loop = asyncio.get_running_loop()
+        markdown_output, timing = await loop.run_in_executor(self._executor, render)
+        self._timings[file.as_posix()] = timing
         if self.execute:
-            # 執行 notebook 中的所有 code block
-            execute_preprocessor = ExecutePreprocessor(
-                timeout=600,
-                kernel_name="python3",
-                allow_errors=True,
-                store_widget_state=True,
-                record_timing=True,
-            )
-            if not isinstance(execute_preprocessor, ExecutePreprocessor):
-                raise TypeError("ExecutePreprocessor is not a valid type")
-            execute_preprocessor.preprocess(
-                notebook_content, {"metadata": {"path": file.parent.as_posix()}}
+            slowest = ", ".join(
+                f"#{cell.index} {cell.seconds:.1f}s `{cell.source[:40]}`"
+                for cell in timing.slowest_cells
             )
-
-        # 使用執行後的 notebook 內容轉換為 markdown
-        markdown_exporter = MarkdownExporter(template_name="markdown")
-        if not isinstance(markdown_exporter, MarkdownExporter):
-            raise TypeError("TemplateExporter is not a valid type")
-        markdown_output, _ = markdown_exporter.from_notebook_node(notebook_content)
+            console.log(f"Executed {file.name} in {timing.seconds:.1f}s, slowest cells: {slowest}")
         # 寫入轉換後的 markdown 內容到檔案
         async with await anyio.open_file(docs_path, "w", encoding="utf-8") as f:
             await f.write(markdown_output)
@@ -226,24 +411,138 @@ class DocsGenerator(BaseModel):
         tasks = [process_with_semaphore(file) for file in files]
         return await asyncio.gather(*tasks)
 
-    async def gen_docs(self) -> None:
+    @property
+    def manifest_path(self) -> Path:
+        return self.output_path / MANIFEST_NAME
+
+    def _load_manifest(self) -> dict[str, dict[str, str]]:
+        """Returns the outputs of the last build keyed by source, empty if they can't be reused.
+
+        A manifest written with another `mode` or `execute` flag describes different docs, so
+        it is treated like no manifest at all and everything is rebuilt.
+        """
+        if not self.incremental or not self.manifest_path.exists():
+            return {}
+        try:
+            manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        if manifest.get("mode") != self.mode or manifest.get("execute") != self.execute:
+            return {}
+        return manifest.get("files", {})
+
+    def _save_manifest(self, files: dict[str, dict[str, str]]) -> None:
+        self.output_path.mkdir(parents=True, exist_ok=True)
+        manifest = {"mode": self.mode, "execute": self.execute, "files": files}
+        self.manifest_path.write_text(json.dumps(manifest, indent=2, sort_keys=True), "utf-8")
+
+    @staticmethod
+    def _hash(file: Path) -> str:
+        return hashlib.sha256(file.read_bytes()).hexdigest()
+
+    def _remove_docs(self, docs_path: Path) -> None:
+        """Deletes generated docs and the folders they leave empty inside the output folder.
+
+        Paths come from the manifest, anything outside the output folder is left alone.
+        """
+        output_path = self.output_path.resolve()
+        docs_path = docs_path.resolve()
+        if not docs_path.is_relative_to(output_path):
+            console.log(f"[yellow]Not removing {docs_path}, it is outside {output_path}")
+            return
+        docs_path.unlink(missing_ok=True)
+        parent = docs_path.parent
+        while parent != output_path and parent.is_dir() and not any(parent.iterdir()):
+            parent.rmdir()
+            parent = parent.parent
+
+    @contextmanager
+    def _notebook_pool(self, files: list[Path]) -> Iterator[None]:
+        """Starts the worker processes for the notebooks among `files`, one per core at most."""
+        notebooks = sum(file.suffix == ".ipynb" for file in files)
+        if not notebooks:
+            yield
+            return
+        self._executor = ProcessPoolExecutor(
+            max_workers=min(self.concurrency, os.cpu_count() or 1, notebooks),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_notebook_worker,
+        )
+        try:
+            yield
+        finally:
+            self._executor.shutdown()
+            self._executor = None
+
+    async def build(self) -> BuildReport:
+        """Generates the docs of every source file that changed since the last build.
+
+        Returns:
+            BuildReport: Which sources were rebuilt, skipped, removed or failed.
+        """
+        started = time.perf_counter()
+        report = BuildReport()
+        previous = self._load_manifest()
+        if not previous and self.source_path.is_dir() and self.output_path.exists():
+            # Without a usable manifest nothing in the output folder is known to be current
+            shutil.rmtree(self.output_path.absolute())
+        hashes = {file.as_posix(): self._hash(file) for file in self.source_files}
+        files = {source: entry for source, entry in previous.items() if source in hashes}
+        for source in previous.keys() - hashes.keys():
+            self._remove_docs(Path(previous[source]["output"]))
+            report.removed.append(source)
+        changed = []
+        for file in self.source_files:
+            entry = files.get(file.as_posix())
+            if (
+                entry
+                and entry["hash"] == hashes[file.as_posix()]
+                and Path(entry["output"]).exists()
+            ):
+                report.skipped.append(file.as_posix())
+            else:
+                changed.append(file)
+
         with Progress() as progress:
-            total_files = len(self.source_files)
+            total_files = len(changed)
             task = progress.add_task(f"[green]Generating {total_files}...", total=total_files)
 
             if not self.source_files:
                 console.log("[yellow]No files found to process")
-                return
+                # Still saved, so the removed sources are not looked for again
+                self._save_manifest(files)
+                return report
 
             # Process all files concurrently with controlled concurrency
-            results = await self._process_batch(self.source_files, progress, task)
-
-            # Summarize results
-            successful = len([r for r in results if r])
+            with self._notebook_pool(changed):
+                results = await self._process_batch(changed, progress, task)
+
+        for file, result in zip(changed, results, strict=False):
+            source = file.as_posix()
+            if result:
+                files[source] = {"hash": hashes[source], "output": result}
+                report.rebuilt.append(source)
+            else:
+                # Dropped from the manifest so the next build retries it
+                files.pop(source, None)
+                report.failed.append(source)
+        self._save_manifest(files)
+        report.notebooks = {
+            source: timing for source, timing in self._timings.items() if source in report.rebuilt
+        }
+        report.seconds = time.perf_counter() - started
         console.log(
-            f"[green]Documentation generation complete ({successful}/{total_files})!",
+            f"[green]Documentation generation complete in {report.seconds:.1f}s: "
+            f"{len(report.rebuilt)} rebuilt, {len(report.skipped)} unchanged, "
+            f"{len(report.removed)} removed, {len(report.failed)} failed.",
             highlight=True,
         )
+        for source in report.rebuilt:
+            console.log(f"Rebuilt {source}")
+        return report
+
+    async def gen_docs(self) -> None:
+        await self.build()
 
     async def __call__(self) -> None:
         """Asynchronously calls the gen_docs method.
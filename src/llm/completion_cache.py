@@ -0,0 +1,202 @@
+import json
+import time
+from types import TracebackType
+from typing import Any
+import hashlib
+from pathlib import Path
+import sqlite3
+import threading
+
+import logfire
+from pydantic import Field, BaseModel
+from openai.types.chat import ChatCompletion
+from typing_extensions import Self
+
+
+class CompletionCacheStats(BaseModel):
+    hits: int = Field(default=0, description="Completions served from the cache.")
+    misses: int = Field(default=0, description="Completions that had to call the LLM.")
+    writes: int = Field(default=0, description="Completions stored in the cache.")
+    skipped: int = Field(
+        default=0, description="Requests sampled with a temperature above 0, never cached."
+    )
+    evictions: int = Field(default=0, description="Entries dropped to stay within the limits.")
+    entries: int = Field(default=0, description="Entries currently stored.")
+    size_bytes: int = Field(default=0, description="Total size of the stored completions.")
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class SQLiteCompletionCache:
+    """Disk-backed LLM completion cache that AG2 accepts as the `cache` of a chat.
+
+    AG2 builds the key from the full request (model, messages, tools and sampling params)
+    and stores the response object, a `ChatCompletion` that is kept here as JSON. A request
+    with a `temperature` above 0 asks for a sampled answer, so it is neither served from
+    nor stored in the cache; a request without one is cached, as AG2's own caches do. The
+    least recently used entries are evicted once `max_entries` or `max_bytes` is exceeded.
+    AG2 calls the cache from worker threads and enters it as a context manager around every
+    request, so access is serialized and leaving the context does not close the connection;
+    call `close()` when done.
+
+    Examples:
+        >>> cache = SQLiteCompletionCache(":memory:")
+        >>> cache.set({"model": "gpt-4o", "messages": []}, "plan")
+        >>> cache.get({"model": "gpt-4o", "messages": []})
+        'plan'
+        >>> cache.stats().hit_rate
+        1.0
+    """
+
+    def __init__(
+        self,
+        path: str | Path = ".cache/completions.sqlite",
+        max_entries: int = 10_000,
+        max_bytes: int | None = 512 * 1024 * 1024,
+    ):
+        if str(path) != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = CompletionCacheStats()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS completions_accessed ON completions (accessed_at)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _hash(key: object) -> str:
+        # AG2 passes the request parameters as a JSON-able object rather than a string
+        payload = key if isinstance(key, str) else json.dumps(key, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    @staticmethod
+    def _sampled(key: object) -> bool:
+        return isinstance(key, dict) and (key.get("temperature") or 0) > 0
+
+    @staticmethod
+    def _encode(value: object) -> str | None:
+        if isinstance(value, ChatCompletion):
+            # AG2 sets the retrieval function on responses served from the cache
+            data = value.model_dump(mode="json", exclude={"message_retrieval_function"})
+            return json.dumps({"chat_completion": data})
+        try:
+            return json.dumps({"value": value})
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _decode(text: str | bytes) -> Any:  # noqa: ANN401
+        payload = json.loads(text)
+        if "chat_completion" in payload:
+            return ChatCompletion.model_validate(payload["chat_completion"])
+        return payload["value"]
+
+    def get(self, key: object, default: Any = None) -> Any:  # noqa: ANN401
+        if self._sampled(key):
+            with self._lock:
+                self._stats.skipped += 1
+            return default
+        digest = self._hash(key)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM completions WHERE key = ?", (digest,)
+            ).fetchone()
+            try:
+                value = None if row is None else self._decode(row[0])
+            except (ValueError, KeyError, TypeError):
+                # Written by an older version, or not a completion at all
+                self._conn.execute("DELETE FROM completions WHERE key = ?", (digest,))
+                row = None
+            if row is None:
+                self._conn.commit()
+                self._stats.misses += 1
+                return default
+            self._conn.execute(
+                "UPDATE completions SET accessed_at = ? WHERE key = ?", (time.time(), digest)
+            )
+            self._conn.commit()
+            self._stats.hits += 1
+        return value
+
+    def set(self, key: object, value: Any) -> None:  # noqa: ANN401
+        if self._sampled(key):
+            return
+        text = self._encode(value)
+        if text is None:
+            logfire.warn(
+                "Completion of type {type} can't be stored as JSON, not caching it",
+                type=type(value).__name__,
+            )
+            return
+        digest = self._hash(key)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (key, value, size, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (digest, text, len(text.encode()), time.time()),
+            )
+            self._stats.writes += 1
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        entries, size = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions"
+        ).fetchone()
+        over_count = max(entries - self.max_entries, 0)
+        over_size = max(size - self.max_bytes, 0) if self.max_bytes is not None else 0
+        if not over_count and not over_size:
+            return
+        evicted: list[tuple[str]] = []
+        freed = 0
+        # The cursor is consumed lazily, so only the rows that are dropped get read
+        for key, entry_size in self._conn.execute(
+            "SELECT key, size FROM completions ORDER BY accessed_at ASC"
+        ):
+            if len(evicted) >= over_count and freed >= over_size:
+                break
+            evicted.append((key,))
+            freed += entry_size
+        self._conn.executemany("DELETE FROM completions WHERE key = ?", evicted)
+        self._stats.evictions += len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM completions")
+            self._conn.commit()
+
+    def stats(self) -> CompletionCacheStats:
+        """Returns hit and miss counts since start-up along with the current size on disk."""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions"
+            ).fetchone()
+            return self._stats.model_copy(update={"entries": entries, "size_bytes": size})
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> Self:
+        """Returns the cache itself, the connection stays open across requests."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Keeps the connection open, AG2 enters the cache once per request."""
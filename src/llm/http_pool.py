@@ -0,0 +1,134 @@
+import threading
+
+import httpx
+from pydantic import Field, BaseModel, ConfigDict
+
+
+class HttpPoolConfig(BaseModel):
+    model_config = ConfigDict(frozen=True)
+    max_connections: int = Field(
+        default=100, ge=1, description="Open connections across all hosts.", examples=[20, 100]
+    )
+    max_keepalive_connections: int = Field(
+        default=20, ge=0, description="Idle connections kept alive for reuse.", examples=[10, 20]
+    )
+    keepalive_expiry: float = Field(
+        default=30.0, ge=0, description="Seconds an idle connection is kept open."
+    )
+    http2: bool = Field(
+        default=False,
+        description="Negotiate HTTP/2, which multiplexes requests over one connection per host. "
+        "Requires the optional `h2` package.",
+    )
+    timeout: float = Field(
+        default=600.0, description="Seconds before an LLM request times out.", examples=[60.0]
+    )
+
+    def timeouts(self) -> httpx.Timeout:
+        return httpx.Timeout(self.timeout, connect=5.0)
+
+
+class HttpPoolStats(BaseModel):
+    requests: int = Field(default=0, description="Requests sent through the pool.")
+    connections_opened: int = Field(default=0, description="Connections established.")
+    open_connections: int = Field(default=0, description="Connections currently open.")
+    idle_connections: int = Field(default=0, description="Open connections waiting for reuse.")
+    http2_connections: int = Field(default=0, description="Open connections using HTTP/2.")
+
+    @property
+    def reuse_rate(self) -> float:
+        """Share of requests that did not need a new connection."""
+        if not self.requests:
+            return 0.0
+        return max(self.requests - self.connections_opened, 0) / self.requests
+
+
+class CountingTransport(httpx.HTTPTransport):
+    """`httpx.HTTPTransport` that counts requests and newly opened connections."""
+
+    def __init__(self, **kwargs: object):
+        super().__init__(**kwargs)
+        self._lock = threading.Lock()
+        self._stats = HttpPoolStats()
+        self._seen: set[int] = set()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        response = super().handle_request(request)
+        with self._lock:
+            self._stats.requests += 1
+            for connection in self._pool.connections:
+                if id(connection) not in self._seen:
+                    self._seen.add(id(connection))
+                    self._stats.connections_opened += 1
+            self._seen &= {id(connection) for connection in self._pool.connections}
+        return response
+
+    def stats(self) -> HttpPoolStats:
+        with self._lock:
+            connections = list(self._pool.connections)
+            return self._stats.model_copy(
+                update={
+                    "open_connections": len(connections),
+                    "idle_connections": sum(c.is_idle() for c in connections),
+                    "http2_connections": sum("HTTP/2" in c.info() for c in connections),
+                }
+            )
+
+
+class SharedHttpClient:
+    """One `httpx.Client` per pool configuration, shared by every LLM client of the process.
+
+    AG2 builds an OpenAI client for every agent, and rebuilds it for every tool registered
+    for the LLM; without a shared client each of them opens its own TLS connections and
+    loads the CA bundle again. The OpenAI SDK is used from worker threads, which
+    `httpx.Client` supports.
+
+    Examples:
+        >>> client = SharedHttpClient.get(HttpPoolConfig())
+        >>> client is SharedHttpClient.get(HttpPoolConfig())
+        True
+        >>> SharedHttpClient.stats(HttpPoolConfig()).requests
+        0
+    """
+
+    _clients: dict[HttpPoolConfig, tuple[httpx.Client, CountingTransport]] = {}  # noqa: RUF012
+    _lock = threading.Lock()
+
+    @classmethod
+    def _entry(cls, config: HttpPoolConfig) -> tuple[httpx.Client, CountingTransport]:
+        with cls._lock:
+            entry = cls._clients.get(config)
+            if entry is None:
+                limits = httpx.Limits(
+                    max_connections=config.max_connections,
+                    max_keepalive_connections=config.max_keepalive_connections,
+                    keepalive_expiry=config.keepalive_expiry,
+                )
+                transport = CountingTransport(limits=limits, http2=config.http2)
+                client = httpx.Client(
+                    transport=transport, timeout=config.timeouts(), follow_redirects=True
+                )
+                entry = cls._clients[config] = (client, transport)
+            return entry
+
+    @classmethod
+    def get(cls, config: HttpPoolConfig) -> httpx.Client:
+        """Returns the client for `config`, creating it on first use."""
+        return cls._entry(config)[0]
+
+    @classmethod
+    def transport(cls, config: HttpPoolConfig) -> CountingTransport:
+        """Returns the pooled transport of the client for `config`."""
+        return cls._entry(config)[1]
+
+    @classmethod
+    def stats(cls, config: HttpPoolConfig) -> HttpPoolStats:
+        """Returns request and connection counts of the client for `config`."""
+        return cls._entry(config)[1].stats()
+
+    @classmethod
+    def close_all(cls) -> None:
+        with cls._lock:
+            for client, _ in cls._clients.values():
+                client.close()
+            cls._clients.clear()
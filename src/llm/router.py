@@ -0,0 +1,410 @@
+import json
+import time
+from typing import Literal
+import threading
+from collections import deque
+from urllib.parse import urlsplit
+
+import httpx
+import logfire
+from pydantic import Field, BaseModel, ConfigDict
+
+from src.llm.http_pool import HttpPoolConfig, SharedHttpClient
+
+# Base URL the OpenAI clients are pointed at when requests are routed, never resolved
+ROUTER_BASE_URL = "http://llm-router.invalid/v1"
+# Rough prompt size of a request body, the same four characters per token as the compaction
+CHARS_PER_TOKEN = 4
+RETRYABLE_STATUS = frozenset({408, 409, 429, 500, 502, 503, 504})
+# Paths that Azure serves per deployment rather than per resource
+AZURE_DEPLOYMENT_PATHS = ("/chat/completions", "/completions", "/embeddings")
+
+
+class LLMEndpoint(BaseModel):
+    model_config = ConfigDict(frozen=True)
+    name: str | None = Field(
+        default=None,
+        description="Name used in stats and logs, defaults to the host of `base_url`.",
+    )
+    api_type: Literal["openai", "azure"] = Field(
+        default="openai", description="Wire format of the endpoint."
+    )
+    base_url: str = Field(
+        ...,
+        description="Base URL of an OpenAI endpoint, or the resource URL of an Azure endpoint.",
+        examples=["https://api.openai.com/v1", "https://my-resource.openai.azure.com"],
+    )
+    api_key: str = Field(..., description="API key of the endpoint.")
+    model: str | None = Field(
+        default=None,
+        description="Model, or Azure deployment, serving the requests; defaults to `Config.model`.",
+    )
+    api_version: str = Field(
+        default="2025-04-01-preview", description="API version of an Azure endpoint."
+    )
+    headers: dict[str, str] = Field(
+        default_factory=dict, description="Extra headers sent with every request."
+    )
+    requests_per_minute: int | None = Field(
+        default=None, ge=1, description="Request budget of the key, `None` if unknown."
+    )
+    tokens_per_minute: int | None = Field(
+        default=None, ge=1, description="Token budget of the key, `None` if unknown."
+    )
+
+    @property
+    def label(self) -> str:
+        return self.name or urlsplit(self.base_url).netloc
+
+    def __hash__(self) -> int:
+        """Hashes the endpoint by value, so equal endpoint lists share one router."""
+        return hash(self.model_dump_json())
+
+    def rewrite(self, request: httpx.Request, model: str) -> httpx.Request:
+        """Rebuilds a request sent to `ROUTER_BASE_URL` for this endpoint."""
+        path = request.url.path.removeprefix(urlsplit(ROUTER_BASE_URL).path)
+        body = request.content
+        model = self.model or model
+        params = dict(request.url.params)
+        headers = {
+            key: value
+            for key, value in request.headers.items()
+            if key.lower() not in {"host", "content-length", "authorization", "api-key"}
+        }
+        if self.api_type == "azure":
+            base = f"{self.base_url.rstrip('/')}/openai"
+            if path in AZURE_DEPLOYMENT_PATHS:
+                # Azure deployment names can't have dots, the same as AG2 does for them
+                path = f"/deployments/{model.replace('.', '')}{path}"
+            params["api-version"] = self.api_version
+            headers["api-key"] = self.api_key
+        else:
+            base = self.base_url.rstrip("/")
+            headers["authorization"] = f"Bearer {self.api_key}"
+            if body and request.headers.get("content-type", "").startswith("application/json"):
+                payload = json.loads(body)
+                if "model" in payload:
+                    body = json.dumps({**payload, "model": model}).encode()
+        headers.update(self.headers)
+        return httpx.Request(
+            request.method,
+            httpx.URL(base + path, params=params),
+            headers=headers,
+            content=body,
+            extensions=request.extensions,
+        )
+
+
+class EndpointStats(BaseModel):
+    name: str = Field(..., description="Name of the endpoint.")
+    requests: int = Field(default=0, description="Requests sent to the endpoint.")
+    failures: int = Field(default=0, description="Requests that failed over to another endpoint.")
+    rate_limited: int = Field(default=0, description="Requests answered with HTTP 429.")
+    in_flight: int = Field(default=0, description="Requests waiting for their response headers.")
+    latency_ms: float = Field(default=0.0, description="Moving average time to response headers.")
+    headroom: float = Field(
+        default=1.0, description="Share of the request or token budget still free, the lower one."
+    )
+    cooldown_s: float = Field(
+        default=0.0, description="Seconds until the endpoint is used again after a failure."
+    )
+
+
+class EndpointState:
+    """Budgets, health and latency of one endpoint, guarded by the router's lock."""
+
+    def __init__(self, endpoint: LLMEndpoint):
+        self.endpoint = endpoint
+        self.stats = EndpointStats(name=endpoint.label)
+        self.window: deque[tuple[float, int]] = deque()
+        self.remaining_requests: int | None = None
+        self.remaining_tokens: int | None = None
+        self.remaining_until = 0.0
+        self.cooldown_until = 0.0
+        self.failures_in_row = 0
+        # Typical time to first token, keyed by whether the request was streamed
+        self.baselines: dict[bool, float] = {}
+
+    def headroom(self, now: float) -> float:
+        while self.window and self.window[0][0] <= now - 60:
+            self.window.popleft()
+        shares = [1.0]
+        if self.endpoint.requests_per_minute:
+            used = len(self.window)
+            shares.append(1 - used / self.endpoint.requests_per_minute)
+        if self.endpoint.tokens_per_minute:
+            used = sum(tokens for _, tokens in self.window)
+            shares.append(1 - used / self.endpoint.tokens_per_minute)
+        # The limits the server reports are authoritative until they reset
+        if now < self.remaining_until:
+            if self.remaining_requests is not None and self.endpoint.requests_per_minute:
+                shares.append(self.remaining_requests / self.endpoint.requests_per_minute)
+            elif self.remaining_requests == 0:
+                shares.append(0.0)
+            if self.remaining_tokens is not None and self.endpoint.tokens_per_minute:
+                shares.append(self.remaining_tokens / self.endpoint.tokens_per_minute)
+            elif self.remaining_tokens == 0:
+                shares.append(0.0)
+        return max(min(shares), 0.0)
+
+    def ready_at(self, now: float) -> float:
+        """Returns when the endpoint has headroom again, `now` if it has some already."""
+        ready = max(self.cooldown_until, now)
+        if self.headroom(now) > 0:
+            return ready
+        if now < self.remaining_until:
+            return max(ready, self.remaining_until)
+        return max(ready, self.window[0][0] + 60 if self.window else now)
+
+
+def parse_reset(value: str | None) -> float | None:
+    """Parses `retry-after` style durations such as `6`, `1.5s`, `250ms` or `1m30s`.
+
+    Examples:
+        >>> parse_reset("1m30s"), parse_reset("250ms"), parse_reset("6"), parse_reset(None)
+        (90.0, 0.25, 6.0, None)
+    """
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    seconds, number = 0.0, ""
+    units = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    rest = value.strip()
+    while rest:
+        if rest[0].isdigit() or rest[0] == ".":
+            number, rest = number + rest[0], rest[1:]
+            continue
+        unit = "ms" if rest.startswith("ms") else rest[0]
+        if unit not in units or not number:
+            return None
+        seconds += float(number) * units[unit]
+        number, rest = "", rest[len(unit) :]
+    return seconds
+
+
+class EndpointRouter(httpx.BaseTransport):
+    """Sends each LLM request to the endpoint with the most rate-limit headroom.
+
+    Every OpenAI client of the process talks to `ROUTER_BASE_URL`, and this transport rewrites
+    each request for the chosen endpoint, so mixed OpenAI and Azure keys serve the same
+    agents. Request and token budgets are tracked per endpoint from a one-minute window of
+    what was sent and from the `x-ratelimit-*` headers it answers with. A request that fails
+    with a connection error, a 429 or a 5xx fails over to the next endpoint right away, and
+    the failed endpoint cools down. An endpoint whose time to first token jumps well above
+    its own average cools down briefly as well; a streamed response has its first token with
+    the headers, a non-streamed one only has its whole completion, so its latency is taken
+    per completion token. When no endpoint has headroom the request goes to the one that
+    frees up first rather than blocking the calling thread, which for AG2 is an executor
+    thread, or the event loop; its 429 is then retried by the OpenAI SDK.
+
+    Examples:
+        >>> router = EndpointRouter(
+        ...     [
+        ...         LLMEndpoint(base_url="https://a.example/v1", api_key="a"),
+        ...         LLMEndpoint(base_url="https://b.example/v1", api_key="b"),
+        ...     ],
+        ...     model="gpt-4o",
+        ... )
+        >>> [stats.name for stats in router.stats()]
+        ['a.example', 'b.example']
+    """
+
+    def __init__(
+        self,
+        endpoints: list[LLMEndpoint],
+        model: str,
+        pool: HttpPoolConfig | None = None,
+        failure_cooldown: float = 5.0,
+        spike_factor: float = 3.0,
+    ):
+        if not endpoints:
+            raise ValueError("The router needs at least one endpoint.")
+        self.model = model
+        self.pool = pool or HttpPoolConfig()
+        self.failure_cooldown = failure_cooldown
+        self.spike_factor = spike_factor
+        self._states = [EndpointState(endpoint) for endpoint in endpoints]
+        self._lock = threading.Lock()
+        self._client: httpx.Client | None = None
+
+    def _order(self, now: float) -> list[EndpointState]:
+        """Ranks the endpoints by headroom shared among their requests in flight, then latency.
+
+        Dividing by the requests in flight spreads concurrent calls over every key instead of
+        sending all of them to the one that looked freest when they started.
+        """
+        available = [state for state in self._states if state.cooldown_until <= now]
+        cooling = sorted(
+            (state for state in self._states if state.cooldown_until > now),
+            key=lambda state: state.cooldown_until,
+        )
+        available.sort(
+            key=lambda state: (
+                -state.headroom(now) / (1 + state.stats.in_flight),
+                state.stats.latency_ms,
+            )
+        )
+        return available + cooling
+
+    def _acquire(self, tokens: int, tried: set[int]) -> EndpointState | None:
+        with self._lock:
+            now = time.monotonic()
+            candidates = [state for state in self._order(now) if id(state) not in tried]
+            if not candidates:
+                return None
+            best = candidates[0]
+            if best.ready_at(now) > now:
+                # Nothing is free, the endpoint itself answers with its limit
+                best = min(candidates, key=lambda state: state.ready_at(now))
+            best.window.append((now, tokens))
+            best.stats.requests += 1
+            best.stats.in_flight += 1
+            return best
+
+    def _release(
+        self,
+        state: EndpointState,
+        response: httpx.Response | None,
+        elapsed: float,
+        streamed: bool = True,
+        completion_tokens: int | None = None,
+    ) -> None:
+        now = time.monotonic()
+        with self._lock:
+            state.stats.in_flight -= 1
+            if response is None or response.status_code in RETRYABLE_STATUS:
+                state.stats.failures += 1
+                state.failures_in_row += 1
+                cooldown = self.failure_cooldown * 2 ** min(state.failures_in_row - 1, 4)
+                if response is not None and response.status_code == 429:
+                    state.stats.rate_limited += 1
+                    cooldown = parse_reset(response.headers.get("retry-after")) or cooldown
+                    if retry_ms := parse_reset(response.headers.get("retry-after-ms")):
+                        cooldown = retry_ms / 1000
+                state.cooldown_until = now + cooldown
+                return
+            state.failures_in_row = 0
+            self._record_limits(state, response, now)
+            latency = elapsed * 1000
+            state.stats.latency_ms = (
+                latency
+                if not state.stats.latency_ms
+                else (0.8 * state.stats.latency_ms + 0.2 * latency)
+            )
+            if not streamed:
+                if not completion_tokens:
+                    return
+                latency /= completion_tokens
+            baseline = state.baselines.get(streamed)
+            spike = baseline is not None and latency > self.spike_factor * baseline
+            state.baselines[streamed] = (
+                latency if baseline is None else (0.95 * baseline + 0.05 * latency)
+            )
+            if spike and len(self._states) > 1:
+                state.cooldown_until = now + self.failure_cooldown
+                logfire.info(
+                    "LLM endpoint {endpoint} slowed down to {latency:.0f}ms to first token, "
+                    "routing around it",
+                    endpoint=state.stats.name,
+                    latency=latency if streamed else elapsed * 1000,
+                )
+
+    @staticmethod
+    def _record_limits(state: EndpointState, response: httpx.Response, now: float) -> None:
+        headers = response.headers
+        requests = headers.get("x-ratelimit-remaining-requests")
+        tokens = headers.get("x-ratelimit-remaining-tokens")
+        if requests is None and tokens is None:
+            return
+        state.remaining_requests = int(requests) if requests is not None else None
+        state.remaining_tokens = int(tokens) if tokens is not None else None
+        resets = [
+            parse_reset(headers.get("x-ratelimit-reset-requests")),
+            parse_reset(headers.get("x-ratelimit-reset-tokens")),
+        ]
+        state.remaining_until = now + max((reset for reset in resets if reset), default=60.0)
+
+    @staticmethod
+    def _completion_tokens(response: httpx.Response) -> int | None:
+        """Reads a non-streamed completion and returns how many tokens it generated."""
+        try:
+            usage = json.loads(response.read()).get("usage") or {}
+        except (ValueError, AttributeError, httpx.HTTPError):
+            return None
+        return usage.get("completion_tokens")
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        body = request.read()
+        tokens = len(body) // CHARS_PER_TOKEN
+        streamed = True
+        if body and request.headers.get("content-type", "").startswith("application/json"):
+            payload = json.loads(body)
+            tokens += payload.get("max_completion_tokens") or payload.get("max_tokens") or 0
+            streamed = bool(payload.get("stream"))
+        transport = SharedHttpClient.transport(self.pool)
+        tried: set[int] = set()
+        error: httpx.TransportError | None = None
+        response: httpx.Response | None = None
+        while (state := self._acquire(tokens, tried)) is not None:
+            tried.add(id(state))
+            started = time.monotonic()
+            try:
+                response = transport.handle_request(state.endpoint.rewrite(request, self.model))
+            except httpx.TransportError as e:
+                self._release(state, None, time.monotonic() - started)
+                error, response = e, None
+            else:
+                elapsed = time.monotonic() - started
+                completion_tokens = None
+                if not streamed and response.status_code == 200:
+                    # The headers only came with the whole completion, the body is here too
+                    completion_tokens = self._completion_tokens(response)
+                self._release(state, response, elapsed, streamed, completion_tokens)
+                if response.status_code not in RETRYABLE_STATUS or len(tried) == len(self._states):
+                    return response
+                response.close()
+            logfire.warn(
+                "LLM endpoint {endpoint} failed with {error}, failing over",
+                endpoint=state.stats.name,
+                error=str(error) if response is None else response.status_code,
+            )
+        if error is not None:
+            raise error
+        raise httpx.ConnectError("No LLM endpoint is available.", request=request)
+
+    def stats(self) -> list[EndpointStats]:
+        """Returns the load, budget and health of every endpoint."""
+        with self._lock:
+            now = time.monotonic()
+            return [
+                state.stats.model_copy(
+                    update={
+                        "headroom": state.headroom(now),
+                        "cooldown_s": max(state.cooldown_until - now, 0.0),
+                    }
+                )
+                for state in self._states
+            ]
+
+    def client(self) -> httpx.Client:
+        """Returns the `httpx.Client` the OpenAI clients send their requests through."""
+        if self._client is None:
+            self._client = httpx.Client(transport=self, timeout=self.pool.timeouts())
+        return self._client
+
+    _routers: dict[tuple[object, ...], "EndpointRouter"] = {}  # noqa: RUF012
+    _routers_lock = threading.Lock()
+
+    @classmethod
+    def shared(
+        cls, endpoints: list[LLMEndpoint], model: str, pool: HttpPoolConfig
+    ) -> "EndpointRouter":
+        """Returns the process-wide router for these endpoints, so budgets are tracked once."""
+        key = (tuple(endpoints), model, pool)
+        with cls._routers_lock:
+            if key not in cls._routers:
+                cls._routers[key] = cls(endpoints, model=model, pool=pool)
+            return cls._routers[key]
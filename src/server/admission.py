@@ -0,0 +1,128 @@
+import asyncio
+
+from pydantic import Field, BaseModel, PrivateAttr
+
+
+class AdmissionError(Exception):
+    """Raised when a run is not admitted, served as HTTP 429."""
+
+
+class AdmissionStats(BaseModel):
+    running: int = Field(default=0, description="Runs currently executing.")
+    queued: int = Field(default=0, description="Admitted runs waiting for a free slot.")
+    admitted: int = Field(default=0, description="Runs admitted since start-up.")
+    rejected: int = Field(default=0, description="Runs rejected since start-up.")
+    tenants: dict[str, int] = Field(
+        default_factory=dict, description="Queued plus running runs per tenant."
+    )
+
+
+class Ticket:
+    """An admitted run, entering it waits for a running slot.
+
+    `close()` gives the reservation back and is safe to call more than once, so a run that
+    is cancelled before it ever started does not keep its place in the queue.
+    """
+
+    def __init__(self, control: "AdmissionControl", tenant: str):
+        self.control = control
+        self.tenant = tenant
+        self._running = False
+        self._closed = False
+
+    async def __aenter__(self) -> "Ticket":
+        """Waits until the run may start."""
+        await self.control._start(self)  # noqa: SLF001
+        self._running = True
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        """Frees the running slot, see `close`."""
+        self.close()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self.control._finish(self, running=self._running)  # noqa: SLF001
+
+
+class AdmissionControl(BaseModel):
+    """Bounds how many runs execute, wait, and belong to one tenant at a time.
+
+    `admit` decides right away: a run needs room in the queue and under its tenant's limit,
+    otherwise it is rejected instead of piling up behind a saturated server. Admitted runs
+    then wait in FIFO order for one of `max_running` slots.
+
+    Examples:
+        >>> admission = AdmissionControl(max_running=1, max_queued=1, max_per_tenant=1)
+        >>> ticket = admission.admit("acme")
+        >>> admission.admit("acme")
+        Traceback (most recent call last):
+        ...
+        src.server.admission.AdmissionError: Tenant acme already has 1 runs in flight.
+        >>> ticket.close()
+        >>> admission.stats().queued
+        0
+    """
+
+    max_running: int = Field(
+        default=8, ge=1, description="Runs executing at the same time.", examples=[4, 8, 32]
+    )
+    max_queued: int = Field(
+        default=64,
+        ge=0,
+        description="Admitted runs waiting for a slot, more are rejected.",
+        examples=[0, 64, 256],
+    )
+    max_per_tenant: int = Field(
+        default=8,
+        ge=1,
+        description="Queued plus running runs of one tenant, more are rejected.",
+        examples=[2, 8],
+    )
+
+    _slots: asyncio.Semaphore | None = PrivateAttr(default=None)
+    _tenants: dict[str, int] = PrivateAttr(default_factory=dict)
+    _stats: AdmissionStats = PrivateAttr(default_factory=AdmissionStats)
+
+    def admit(self, tenant: str) -> Ticket:
+        """Reserves a place for a run of `tenant`.
+
+        Raises:
+            AdmissionError: If the queue is full or the tenant is at its limit.
+        """
+        if self._tenants.get(tenant, 0) >= self.max_per_tenant:
+            self._stats.rejected += 1
+            raise AdmissionError(
+                f"Tenant {tenant} already has {self.max_per_tenant} runs in flight."
+            )
+        free = self.max_running - self._stats.running
+        if self._stats.queued >= self.max_queued + max(free, 0):
+            self._stats.rejected += 1
+            raise AdmissionError(f"Server is saturated, {self._stats.queued} runs are queued.")
+        self._tenants[tenant] = self._tenants.get(tenant, 0) + 1
+        self._stats.admitted += 1
+        self._stats.queued += 1
+        return Ticket(self, tenant)
+
+    async def _start(self, ticket: Ticket) -> None:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_running)
+        await self._slots.acquire()
+        self._stats.queued -= 1
+        self._stats.running += 1
+
+    def _finish(self, ticket: Ticket, running: bool) -> None:
+        if running:
+            self._stats.running -= 1
+            self._slots.release()
+        else:
+            self._stats.queued -= 1
+        self._tenants[ticket.tenant] -= 1
+        if not self._tenants[ticket.tenant]:
+            del self._tenants[ticket.tenant]
+
+    def stats(self) -> AdmissionStats:
+        """Returns the current load and how many runs were admitted and rejected."""
+        return self._stats.model_copy(update={"tenants": dict(self._tenants)})
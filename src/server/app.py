@@ -0,0 +1,290 @@
+import json
+import time
+import uuid
+from typing import Literal, Protocol
+import asyncio
+from functools import partial
+from contextlib import asynccontextmanager
+from collections import OrderedDict
+from collections.abc import Callable, AsyncIterator
+
+import logfire
+from pydantic import Field, BaseModel, ValidationError
+from starlette.types import Send, Scope, Receive
+from starlette.routing import Route
+from starlette.requests import Request
+from starlette.responses import Response, JSONResponse, StreamingResponse
+from starlette.applications import Starlette
+
+from src.types.events import RunEvent, RunFinished
+from src.server.admission import Ticket, AdmissionError, AdmissionControl
+
+RunStatus = Literal["queued", "running", "succeeded", "failed", "cancelled"]
+
+
+class StreamingAgent(Protocol):
+    def a_stream(
+        self, message: str, planning: bool = False, conversation_id: str | None = None
+    ) -> AsyncIterator[RunEvent]: ...
+
+    async def aclose(self) -> None: ...
+
+
+class RunRequest(BaseModel):
+    message: str = Field(..., description="The user request.")
+    planning: bool = Field(
+        default=False, description="Use the routed planning workflow of `_create_run`."
+    )
+    wait: bool = Field(
+        default=False, description="Answer once the run finished instead of with 202."
+    )
+    stream: bool = Field(
+        default=False,
+        description="Answer with the run events as server-sent events, disconnecting cancels it.",
+    )
+    conversation_id: str | None = Field(
+        default=None,
+        description="Conversation the run belongs to, its runs stay on one worker process.",
+    )
+
+
+class RunRecord(BaseModel):
+    run_id: str = Field(..., description="Identifier used to poll or cancel the run.")
+    tenant: str = Field(..., description="Tenant that submitted the run.")
+    status: RunStatus = Field(default="queued", description="Where the run currently is.")
+    submitted_at: float = Field(default_factory=time.time, description="Unix time of submit.")
+    started_at: float | None = Field(default=None, description="Unix time it got a slot.")
+    finished_at: float | None = Field(default=None, description="Unix time it ended.")
+    summary: str | None = Field(default=None, description="Summary of the final stage.")
+    messages: list[dict] = Field(
+        default_factory=list, description="Chat history of the final stage."
+    )
+    error: str | None = Field(default=None, description="Error message if the run failed.")
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed", "cancelled")
+
+
+class RunManager:
+    """Executes admitted runs on one warm agent and keeps their records for polling.
+
+    Finished records are kept up to `max_finished`, the oldest are dropped beyond it. A
+    streamed run buffers up to `max_buffered_events` events, beyond that it waits for its
+    client to read them.
+    """
+
+    def __init__(
+        self,
+        agent: StreamingAgent,
+        admission: AdmissionControl,
+        max_finished: int = 1024,
+        max_buffered_events: int = 256,
+    ):
+        self.agent = agent
+        self.admission = admission
+        self.max_finished = max_finished
+        self.max_buffered_events = max_buffered_events
+        self.records: OrderedDict[str, RunRecord] = OrderedDict()
+        self._tasks: dict[str, asyncio.Task[None]] = {}
+        self._events: dict[str, asyncio.Queue[RunEvent | None]] = {}
+
+    def submit(self, tenant: str, request: RunRequest) -> RunRecord:
+        """Admits and starts a run, see `AdmissionControl.admit` for when it raises."""
+        ticket = self.admission.admit(tenant)
+        record = RunRecord(run_id=uuid.uuid4().hex, tenant=tenant)
+        self.records[record.run_id] = record
+        if request.stream:
+            self._events[record.run_id] = asyncio.Queue(maxsize=self.max_buffered_events)
+        task = asyncio.create_task(self._execute(record, request, ticket))
+        task.add_done_callback(partial(self._finished, record, ticket))
+        self._tasks[record.run_id] = task
+        return record
+
+    async def _publish(self, run_id: str, event: RunEvent | None) -> None:
+        # Once the client of a streamed run is gone nobody listens, its events are dropped
+        events = self._events.get(run_id)
+        if events is not None:
+            await events.put(event)
+
+    async def _execute(self, record: RunRecord, request: RunRequest, ticket: Ticket) -> None:
+        try:
+            async with ticket:
+                record.status = "running"
+                record.started_at = time.time()
+                async for event in self.agent.a_stream(
+                    request.message,
+                    planning=request.planning,
+                    conversation_id=request.conversation_id,
+                ):
+                    await self._publish(record.run_id, event)
+                    if isinstance(event, RunFinished):
+                        record.summary = event.summary
+                        record.messages = event.messages
+            record.status = "succeeded"
+        except Exception as e:
+            record.status = "failed"
+            record.error = f"{type(e).__name__}: {e}"
+            logfire.warn("Run {run_id} failed: {error}", run_id=record.run_id, error=record.error)
+        await self._publish(record.run_id, None)
+
+    def _finished(self, record: RunRecord, ticket: Ticket, task: asyncio.Task[None]) -> None:
+        # Also runs for tasks cancelled before they started, which never enter `_execute`
+        ticket.close()
+        if task.cancelled():
+            if not record.done:
+                record.status = "cancelled"
+            if (events := self._events.get(record.run_id)) is not None:
+                # The rest of a cancelled run's events is moot, make room for the end marker
+                if events.full():
+                    events.get_nowait()
+                events.put_nowait(None)
+        record.finished_at = time.time()
+        self._tasks.pop(record.run_id, None)
+        self._forget_finished()
+
+    def _forget_finished(self) -> None:
+        finished = [run_id for run_id, record in self.records.items() if record.done]
+        for run_id in finished[: max(len(finished) - self.max_finished, 0)]:
+            del self.records[run_id]
+            self._events.pop(run_id, None)
+
+    async def wait(self, run_id: str) -> RunRecord:
+        task = self._tasks.get(run_id)
+        if task is not None:
+            await asyncio.wait([task])
+        return self.records[run_id]
+
+    async def events(self, run_id: str) -> AsyncIterator[RunEvent]:
+        """Yields the events of a run submitted with `stream`, cancelling it if abandoned."""
+        queue = self._events[run_id]
+        try:
+            while (event := await queue.get()) is not None:
+                yield event
+        finally:
+            self.detach(run_id)
+
+    def detach(self, run_id: str) -> None:
+        """Drops the events of a streamed run whose client is gone, and cancels the run."""
+        self._events.pop(run_id, None)
+        self.cancel(run_id)
+
+    def cancel(self, run_id: str) -> bool:
+        """Cancels a queued or running run, returns whether there was one to cancel."""
+        task = self._tasks.get(run_id)
+        if task is None:
+            return False
+        return task.cancel()
+
+    async def aclose(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class RunEventsResponse(StreamingResponse):
+    """Server-sent events of a streamed run, which is cancelled when the client leaves.
+
+    The body is never iterated if the client disconnects before streaming starts, so the
+    run is detached once the response ends rather than when its events stop.
+    """
+
+    def __init__(self, runs: RunManager, run_id: str):
+        body = (f"data: {event.model_dump_json()}\n\n" async for event in runs.events(run_id))
+        super().__init__(body, media_type="text/event-stream", headers={"X-Run-ID": run_id})
+        self.runs = runs
+        self.run_id = run_id
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.runs.detach(self.run_id)
+
+
+async def submit_run(request: Request) -> Response:
+    runs: RunManager = request.app.state.runs
+    try:
+        run_request = RunRequest.model_validate(await request.json())
+    except (ValidationError, json.JSONDecodeError) as e:
+        return JSONResponse({"error": str(e)}, status_code=422)
+    tenant = request.headers.get(request.app.state.tenant_header, "default")
+    try:
+        record = runs.submit(tenant, run_request)
+    except AdmissionError as e:
+        return JSONResponse({"error": str(e)}, status_code=429, headers={"Retry-After": "1"})
+    if run_request.stream:
+        return RunEventsResponse(runs, record.run_id)
+    if run_request.wait:
+        return JSONResponse((await runs.wait(record.run_id)).model_dump(mode="json"))
+    return JSONResponse(record.model_dump(mode="json"), status_code=202)
+
+
+async def get_run(request: Request) -> Response:
+    record = request.app.state.runs.records.get(request.path_params["run_id"])
+    if record is None:
+        return JSONResponse({"error": "Unknown run."}, status_code=404)
+    return JSONResponse(record.model_dump(mode="json"))
+
+
+async def cancel_run(request: Request) -> Response:
+    runs: RunManager = request.app.state.runs
+    run_id = request.path_params["run_id"]
+    if run_id not in runs.records:
+        return JSONResponse({"error": "Unknown run."}, status_code=404)
+    if runs.cancel(run_id):
+        await runs.wait(run_id)
+    return JSONResponse(runs.records[run_id].model_dump(mode="json"))
+
+
+async def health(request: Request) -> Response:
+    return JSONResponse(request.app.state.runs.admission.stats().model_dump(mode="json"))
+
+
+def create_app(
+    agent_factory: Callable[[], StreamingAgent],
+    admission: AdmissionControl | None = None,
+    tenant_header: str = "X-Tenant-ID",
+) -> Starlette:
+    """Creates an ASGI app that keeps one agent warm and serves runs over HTTP.
+
+    The agent is built on start-up and closed on shutdown, together with any run still
+    in flight. Runs are told apart per tenant by `tenant_header`.
+
+    Routes:
+        - `POST /runs`: submits a `RunRequest` and answers 202 with its `RunRecord`, 200
+          once finished with `wait`, or server-sent events with `stream`. 429 when the run
+          is not admitted.
+        - `GET /runs/{run_id}`: the `RunRecord`.
+        - `DELETE /runs/{run_id}`: cancels the run and returns its record.
+        - `GET /health`: admission stats, for load balancer checks.
+
+    Examples:
+        ```python
+        app = create_app(lambda: MCPAgent(model="gpt-4o", params=params))
+        uvicorn.run(app, port=8000)
+        ```
+    """
+    admission = admission or AdmissionControl()
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette) -> AsyncIterator[None]:
+        agent = agent_factory()
+        app.state.runs = RunManager(agent, admission)
+        app.state.tenant_header = tenant_header
+        try:
+            yield
+        finally:
+            await app.state.runs.aclose()
+            await agent.aclose()
+
+    return Starlette(
+        routes=[
+            Route("/runs", submit_run, methods=["POST"]),
+            Route("/runs/{run_id}", get_run, methods=["GET"]),
+            Route("/runs/{run_id}", cancel_run, methods=["DELETE"]),
+            Route("/health", health, methods=["GET"]),
+        ],
+        lifespan=lifespan,
+    )
@@ -0,0 +1,269 @@
+import uuid
+import queue
+import signal
+from typing import TYPE_CHECKING
+import asyncio
+import hashlib
+import threading
+from collections.abc import Callable, AsyncIterator
+import multiprocessing
+
+import logfire
+from pydantic import Field, BaseModel
+
+from src.server.app import StreamingAgent
+from src.types.events import RunEvent
+
+if TYPE_CHECKING:
+    from multiprocessing.process import BaseProcess
+
+# Messages between the pool and a worker are tuples tagged by their first item. A worker
+# gets ("run", run_id, message, planning, conversation_id), ("cancel", run_id), or None to
+# shut down, and sends ("event", run_id, event), ("done", run_id, error), or ("stopped",).
+
+
+class WorkerError(Exception):
+    """Raised into a run whose worker failed or exited before the run finished."""
+
+
+class WorkerStats(BaseModel):
+    index: int = Field(..., description="Position of the worker in the pool.")
+    pid: int | None = Field(default=None, description="Process id of the worker.")
+    alive: bool = Field(default=False, description="Whether the worker process is running.")
+    in_flight: int = Field(default=0, description="Runs currently executing on the worker.")
+    runs: int = Field(default=0, description="Runs sent to the worker since start-up.")
+    restarts: int = Field(default=0, description="Times the worker was replaced after exiting.")
+
+
+async def _serve(factory: Callable[[], StreamingAgent], commands, results) -> None:  # noqa: ANN001
+    agent = factory()
+    loop = asyncio.get_running_loop()
+    tasks: dict[str, asyncio.Task[None]] = {}
+
+    async def run(run_id: str, message: str, planning: bool, conversation_id: str | None) -> None:
+        error = None
+        try:
+            async for event in agent.a_stream(
+                message, planning=planning, conversation_id=conversation_id
+            ):
+                results.put(("event", run_id, event))
+        except asyncio.CancelledError:
+            error = "cancelled"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            tasks.pop(run_id, None)
+            results.put(("done", run_id, error))
+
+    try:
+        while (command := await loop.run_in_executor(None, commands.get)) is not None:
+            if command[0] == "run":
+                tasks[command[1]] = asyncio.create_task(run(*command[1:]))
+            elif command[0] == "cancel" and command[1] in tasks:
+                tasks[command[1]].cancel()
+        # Runs already sent to this worker finish before its sessions are closed
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+    finally:
+        await agent.aclose()
+
+
+def _worker_main(factory: Callable[[], StreamingAgent], commands, results) -> None:  # noqa: ANN001
+    # Interrupts go to the pool, which drains the workers in order
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        asyncio.run(_serve(factory, commands, results))
+    finally:
+        results.put(("stopped",))
+
+
+class Worker:
+    """One worker process with its own agent, MCP sessions and stdio server subprocesses."""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.stats = WorkerStats(index=index)
+        self.process: BaseProcess | None = None
+        self.commands = None
+        self.results = None
+        self.reader: threading.Thread | None = None
+        # Cleared, under the pool's lock, once the process exited until its replacement runs
+        self.available = False
+
+
+class WorkerPool:
+    """Shards runs across worker processes, each with its own warm `MCPAgent`.
+
+    One agent runs in one event loop, so prompt rendering, schema handling and AG2 message
+    processing of concurrent runs share a single core. The pool starts `workers` processes
+    that each build an agent with `agent_factory`, which therefore has to be picklable, e.g.
+    a `functools.partial` of `MCPAgent`. Runs of the same `conversation_id` always go to
+    the same worker, so its caches stay warm for the conversation; other runs go to the
+    worker with the fewest runs in flight. A worker that exits fails its runs with
+    `WorkerError` and is replaced. `aclose` lets every worker finish the runs it already
+    has, close its sessions and exit, and terminates workers that take longer than
+    `shutdown_timeout`.
+
+    The pool implements the same `a_stream` and `aclose` as `MCPAgent`, so `create_app`
+    serves it like a single agent.
+
+    Examples:
+        ```python
+        pool = WorkerPool(partial(MCPAgent, params=params), workers=os.cpu_count())
+        async for event in pool.a_stream("Summarize issue ABC-1", conversation_id="c-42"):
+            ...
+        await pool.aclose()
+        ```
+    """
+
+    def __init__(
+        self,
+        agent_factory: Callable[[], StreamingAgent],
+        workers: int = 4,
+        shutdown_timeout: float = 30.0,
+    ):
+        if workers < 1:
+            raise ValueError("The pool needs at least one worker.")
+        self.agent_factory = agent_factory
+        self.shutdown_timeout = shutdown_timeout
+        self._context = multiprocessing.get_context("spawn")
+        self._workers = [Worker(index) for index in range(workers)]
+        self._runs: dict[str, tuple[Worker, asyncio.Queue, asyncio.AbstractEventLoop]] = {}
+        self._lock = threading.Lock()
+        self._closing = False
+        for worker in self._workers:
+            self._start(worker)
+
+    def _start(self, worker: Worker) -> None:
+        worker.commands = self._context.Queue()
+        worker.results = self._context.Queue()
+        worker.process = self._context.Process(
+            target=_worker_main,
+            args=(self.agent_factory, worker.commands, worker.results),
+            name=f"mcp-agent-worker-{worker.index}",
+            daemon=True,
+        )
+        worker.process.start()
+        worker.stats.pid = worker.process.pid
+        worker.reader = threading.Thread(
+            target=self._read, args=(worker,), name=f"{worker.process.name}-reader", daemon=True
+        )
+        worker.reader.start()
+        with self._lock:
+            worker.available = True
+
+    def _read(self, worker: Worker) -> None:
+        """Forwards what a worker sends to the runs waiting for it, until the worker exits."""
+        results, process = worker.results, worker.process
+        while True:
+            try:
+                message = results.get(timeout=1.0)
+            except queue.Empty:
+                if process.is_alive():
+                    continue
+                message = ("stopped",)
+            if message[0] == "stopped":
+                break
+            self._deliver(message[1], message)
+        process.join()
+        with self._lock:
+            # Together, so a run either gets failed here or is sent to another worker
+            worker.available = False
+            failed = [run_id for run_id, (owner, *_) in self._runs.items() if owner is worker]
+        for run_id in failed:
+            self._deliver(run_id, ("done", run_id, f"Worker {worker.index} exited"))
+        if not self._closing:
+            logfire.warn(
+                "Worker {index} exited with code {code}, restarting it",
+                index=worker.index,
+                code=process.exitcode,
+            )
+            worker.stats.restarts += 1
+            self._start(worker)
+
+    def _deliver(self, run_id: str, message: tuple) -> None:
+        with self._lock:
+            entry = self._runs.get(run_id)
+            if entry is None:
+                return
+            if message[0] == "done":
+                del self._runs[run_id]
+        _, events, loop = entry
+        loop.call_soon_threadsafe(events.put_nowait, message)
+
+    def _pick(self, conversation_id: str | None) -> Worker:
+        """Picks a running worker for a run, called with the lock held."""
+        running = [
+            worker for worker in self._workers if worker.available and worker.process.is_alive()
+        ]
+        if not running:
+            raise WorkerError("No worker is running.")
+        if conversation_id is not None:
+            digest = hashlib.sha256(conversation_id.encode()).digest()
+            worker = self._workers[int.from_bytes(digest[:8], "big") % len(self._workers)]
+            # While its worker restarts, a conversation is served by the least busy one
+            if worker in running:
+                return worker
+        return min(running, key=lambda worker: worker.stats.in_flight)
+
+    async def a_stream(
+        self, message: str, planning: bool = False, conversation_id: str | None = None
+    ) -> AsyncIterator[RunEvent]:
+        """Runs `message` on a worker and yields its events, see `MCPAgent.a_stream`.
+
+        Raises:
+            WorkerError: If the run failed in the worker, the worker exited, or no worker is
+                running.
+        """
+        if self._closing:
+            raise WorkerError("The worker pool is shutting down.")
+        run_id = uuid.uuid4().hex
+        events: asyncio.Queue[tuple] = asyncio.Queue()
+        with self._lock:
+            worker = self._pick(conversation_id)
+            self._runs[run_id] = (worker, events, asyncio.get_running_loop())
+            commands = worker.commands
+            worker.stats.runs += 1
+            worker.stats.in_flight += 1
+        commands.put(("run", run_id, message, planning, conversation_id))
+        done = False
+        try:
+            while True:
+                kind, _, payload = await events.get()
+                if kind == "done":
+                    done = True
+                    if payload is not None:
+                        raise WorkerError(payload)
+                    return
+                yield payload
+        finally:
+            worker.stats.in_flight -= 1
+            if not done:
+                # Abandoned or cancelled here, so the worker stops spending time on it
+                with self._lock:
+                    self._runs.pop(run_id, None)
+                worker.commands.put(("cancel", run_id))
+
+    def stats(self) -> list[WorkerStats]:
+        """Returns the load and health of every worker."""
+        return [
+            worker.stats.model_copy(update={"alive": worker.process.is_alive()})
+            for worker in self._workers
+        ]
+
+    async def aclose(self) -> None:
+        """Drains and stops every worker, see the class docstring."""
+        self._closing = True
+        for worker in self._workers:
+            worker.commands.put(None)
+        await asyncio.gather(
+            *(
+                asyncio.to_thread(worker.process.join, self.shutdown_timeout)
+                for worker in self._workers
+            )
+        )
+        for worker in self._workers:
+            if worker.process.is_alive():
+                logfire.warn("Worker {index} did not stop in time", index=worker.index)
+                worker.process.terminate()
+                worker.process.join()
+        await asyncio.gather(*(asyncio.to_thread(worker.reader.join) for worker in self._workers))
@@ -0,0 +1,62 @@
+import re
+from pathlib import Path
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+from collections.abc import AsyncGenerator
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.sse import sse_client
+from mcp.client.stdio import stdio_client
+from mcp.client.session import MessageHandlerFnT
+from mcp.client.session_group import (
+    ServerParameters,
+    SseServerParameters,
+    StreamableHttpParameters,
+)
+from mcp.client.streamable_http import streamablehttp_client
+
+# Commands that only launch the real server, e.g. `uvx mcp-atlassian` or `npx -y @upstash/...`
+_LAUNCHERS = {"uvx", "npx", "bunx", "pipx", "pnpx", "uv", "node", "python", "python3", "docker"}
+_LAUNCHER_VERBS = {"run", "exec", "dlx", "x"}
+
+
+def server_key(params: ServerParameters) -> str:
+    """Returns a stable, hashable key for the given server parameters."""
+    return f"{type(params).__name__}:{params.model_dump_json()}"
+
+
+def server_name(params: ServerParameters) -> str:
+    """Derives a short, tool-name safe label for a server, e.g. `mcp-atlassian` or `codex`."""
+    if isinstance(params, StdioServerParameters):
+        name = params.command
+        if Path(params.command).name in _LAUNCHERS:
+            args = [a for a in params.args if not a.startswith("-") and a not in _LAUNCHER_VERBS]
+            name = args[0] if args else params.command
+        name = Path(name).name if not name.startswith("@") else name.lstrip("@")
+        # Drop version pins such as `==0.11.2` or `@latest`
+        name = re.split(r"==|@", name)[0] or name
+    else:
+        name = urlparse(str(params.url)).hostname or "server"
+    return re.sub(r"[^a-zA-Z0-9_-]+", "_", name).strip("_") or "server"
+
+
+@asynccontextmanager
+async def open_session(
+    params: ServerParameters, message_handler: MessageHandlerFnT | None = None
+) -> AsyncGenerator[ClientSession, None]:
+    """Opens the transport for `params` and yields an initialized `ClientSession`."""
+    if isinstance(params, StdioServerParameters):
+        transport = stdio_client(params)
+    elif isinstance(params, SseServerParameters):
+        transport = sse_client(**params.model_dump())
+    elif isinstance(params, StreamableHttpParameters):
+        transport = streamablehttp_client(**params.model_dump())
+    else:
+        raise ValueError("Invalid parameters provided for MCPAgent.")
+
+    async with transport as streams:
+        # streamable HTTP also yields a `get_session_id` callback we do not need here
+        read, write = streams[0], streams[1]
+        async with ClientSession(read, write, message_handler=message_handler) as session:
+            await session.initialize()
+            yield session
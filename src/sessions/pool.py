@@ -0,0 +1,482 @@
+import time
+from typing import TypeVar
+import asyncio
+from contextlib import suppress, asynccontextmanager
+from collections import deque
+from collections.abc import Callable, Awaitable, AsyncGenerator
+
+from mcp import ClientSession
+import anyio
+import logfire
+from pydantic import Field, BaseModel, ConfigDict, PrivateAttr
+from mcp.types import CONNECTION_CLOSED, CallToolResult
+from mcp.shared.exceptions import McpError
+from mcp.client.session_group import ServerParameters
+
+from src.sessions.connection import server_key, server_name, open_session
+
+T = TypeVar("T")
+
+# Receives every server notification (e.g. `notifications/tools/list_changed`) of a pooled session
+SessionListener = Callable[[ServerParameters, object], Awaitable[None] | None]
+
+# Errors raised by a session whose transport went away (crashed subprocess, dropped HTTP stream)
+CONNECTION_ERRORS = (
+    anyio.ClosedResourceError,
+    anyio.BrokenResourceError,
+    anyio.EndOfStream,
+    ConnectionError,
+)
+
+
+def is_connection_error(error: BaseException) -> bool:
+    """Tells whether `error` means the session is gone, including requests the session failed
+    with `Connection closed` when its transport ended mid-call.
+    """
+    if isinstance(error, McpError):
+        return error.error.code == CONNECTION_CLOSED
+    return isinstance(error, CONNECTION_ERRORS)
+
+
+class PoolStats(BaseModel):
+    checkouts: int = Field(default=0, description="Number of sessions handed out.")
+    reused: int = Field(default=0, description="Checkouts served by an already open session.")
+    created: int = Field(default=0, description="Sessions opened and initialized.")
+    waits: int = Field(default=0, description="Checkouts that had to wait for a free session.")
+    wait_seconds: float = Field(default=0.0, description="Total time spent waiting on checkout.")
+    failures: int = Field(default=0, description="Sessions that failed to start.")
+    reconnects: int = Field(default=0, description="Dead sessions discarded and replaced.")
+    evicted: int = Field(default=0, description="Idle sessions closed by the reaper.")
+    multiplexed: int = Field(
+        default=0, description="Tool calls sent over a session that already had calls in flight."
+    )
+    in_use: int = Field(default=0, description="Sessions currently checked out.")
+    idle: int = Field(default=0, description="Sessions currently idle in the pool.")
+
+
+class PooledSession:
+    """A `ClientSession` kept open by a dedicated background task.
+
+    The MCP transports are anyio context managers that must be entered and exited in the
+    same task, so every pooled connection is owned by its own task and only lent out.
+    """
+
+    def __init__(self, params: ServerParameters, listeners: list[SessionListener] | None = None):
+        self.params = params
+        self.name = server_name(params)
+        self.listeners = listeners if listeners is not None else []
+        self.session: ClientSession | None = None
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.last_ping = self.created_at
+        self.calls = 0
+        self.broken = False
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._error: BaseException | None = None
+        self._task: asyncio.Task[None] | None = None
+
+    @property
+    def alive(self) -> bool:
+        return (
+            self.session is not None
+            and self._task is not None
+            and not self._task.done()
+            and not self._closing.is_set()
+        )
+
+    async def start(self, startup_timeout: float) -> None:
+        self._task = asyncio.create_task(self._serve(), name=f"mcp-session:{self.name}")
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=startup_timeout)
+        except asyncio.TimeoutError:
+            await self.close()
+            raise TimeoutError(
+                f"MCP server `{self.name}` did not start within {startup_timeout}s."
+            ) from None
+        if self._error is not None:
+            await self.close()
+            raise self._error
+
+    async def _notify(self, listener: SessionListener, message: object) -> None:
+        try:
+            result = listener(self.params, message)
+            if result is not None:
+                await result
+        except Exception as e:
+            logfire.warn("MCP session listener failed: {error}", error=str(e))
+
+    async def _on_message(self, message: object) -> None:
+        for listener in self.listeners:
+            await self._notify(listener, message)
+
+    async def _serve(self) -> None:
+        try:
+            async with open_session(self.params, message_handler=self._on_message) as session:
+                self.session = session
+                self._ready.set()
+                await self._closing.wait()
+        except Exception as e:
+            self._error = e
+        finally:
+            self.session = None
+            self._ready.set()
+
+    async def request(self, request: Awaitable[T]) -> T:
+        """Awaits `request`, raising `ConnectionError` if the session ends before it answers.
+
+        The session only fails the requests that are pending when its transport reports the
+        end of the stream; one in flight when the session is closed or its transport fails
+        is never answered.
+        """
+        call = asyncio.ensure_future(request)
+        waiting = {call} if self._task is None else {call, self._task}
+        try:
+            await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+        except BaseException:
+            call.cancel()
+            raise
+        if call.done():
+            return call.result()
+        call.cancel()
+        with suppress(asyncio.CancelledError, Exception):
+            await call
+        raise ConnectionError(f"MCP session for `{self.name}` ended during a request.")
+
+    async def ping(self, ping_timeout: float) -> bool:
+        if not self.alive or self.session is None:
+            return False
+        try:
+            await asyncio.wait_for(self.session.send_ping(), timeout=ping_timeout)
+        except Exception:
+            return False
+        self.last_ping = time.monotonic()
+        return True
+
+    async def close(self, grace_period: float = 5.0) -> None:
+        self._closing.set()
+        if self._task is None or self._task.done():
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout=grace_period)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            self._task.cancel()
+            with suppress(asyncio.CancelledError, Exception):
+                await self._task
+
+
+class _ServerSlot:
+    def __init__(self, params: ServerParameters, max_concurrent_calls: int):
+        self.params = params
+        self.idle: deque[PooledSession] = deque()
+        self.in_use: set[PooledSession] = set()
+        self.pending = 0
+        self.condition = asyncio.Condition()
+        self.stats = PoolStats()
+        # Session that tool calls are multiplexed over, checked out while it has calls in flight
+        self.shared: PooledSession | None = None
+        self.share_lock = asyncio.Lock()
+        self.calls = asyncio.Semaphore(max_concurrent_calls)
+
+    @property
+    def size(self) -> int:
+        return len(self.idle) + len(self.in_use) + self.pending
+
+
+class SessionPool(BaseModel):
+    """Long-lived pool of initialized MCP sessions keyed by `ServerParameters`.
+
+    Examples:
+        >>> pool = SessionPool(min_size=1, max_size=2)
+        >>> pool.max_size
+        2
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    min_size: int = Field(
+        default=0,
+        ge=0,
+        description="Sessions per server kept open even when idle.",
+        examples=[0, 1],
+    )
+    max_size: int = Field(
+        default=4,
+        ge=1,
+        description="Maximum number of open sessions per server.",
+        examples=[1, 4, 8],
+    )
+    idle_timeout: float = Field(
+        default=300.0,
+        description="Seconds an idle session may stay open before it is closed.",
+        examples=[60.0, 300.0],
+    )
+    ping_interval: float = Field(
+        default=60.0,
+        description="Seconds between liveness pings of idle sessions.",
+        examples=[30.0, 60.0],
+    )
+    ping_timeout: float = Field(
+        default=10.0, description="Seconds to wait for a ping response.", examples=[5.0, 10.0]
+    )
+    startup_timeout: float = Field(
+        default=120.0,
+        description="Seconds to wait for a server to start and finish `initialize`.",
+        examples=[30.0, 120.0],
+    )
+    reap_interval: float = Field(
+        default=15.0,
+        description="Seconds between maintenance passes over idle sessions.",
+        examples=[5.0, 15.0],
+    )
+    max_concurrent_calls: int = Field(
+        default=8,
+        ge=1,
+        description="Maximum number of tool calls in flight per server, multiplexed over one session.",
+        examples=[1, 8, 16],
+    )
+
+    _slots: dict[str, _ServerSlot] = PrivateAttr(default_factory=dict)
+    _reaper: asyncio.Task[None] | None = PrivateAttr(default=None)
+    _closing: set[asyncio.Task[None]] = PrivateAttr(default_factory=set)
+    _listeners: list[SessionListener] = PrivateAttr(default_factory=list)
+
+    def add_listener(self, listener: SessionListener) -> None:
+        """Registers a callback for server notifications of every pooled session."""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def _slot(self, params: ServerParameters) -> _ServerSlot:
+        key = server_key(params)
+        if key not in self._slots:
+            self._slots[key] = _ServerSlot(params, self.max_concurrent_calls)
+        return self._slots[key]
+
+    def _ensure_reaper(self) -> None:
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap(), name="mcp-session-pool-reaper")
+
+    async def _open(self, params: ServerParameters) -> PooledSession:
+        pooled = PooledSession(params, listeners=self._listeners)
+        with logfire.span("Open MCP session {server}", server=pooled.name):
+            await pooled.start(startup_timeout=self.startup_timeout)
+        return pooled
+
+    def _discard(self, pooled: PooledSession) -> None:
+        task = asyncio.create_task(pooled.close())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _checkout(self, params: ServerParameters) -> PooledSession:
+        self._ensure_reaper()
+        slot = self._slot(params)
+        slot.stats.checkouts += 1
+        started = time.monotonic()
+        async with slot.condition:
+            while True:
+                while slot.idle:
+                    pooled = slot.idle.pop()
+                    if pooled.alive:
+                        slot.in_use.add(pooled)
+                        slot.stats.reused += 1
+                        slot.stats.wait_seconds += time.monotonic() - started
+                        return pooled
+                    slot.stats.reconnects += 1
+                    self._discard(pooled)
+                if slot.size < self.max_size:
+                    slot.pending += 1
+                    break
+                slot.stats.waits += 1
+                await slot.condition.wait()
+
+        try:
+            pooled = await self._open(params)
+        except BaseException:
+            slot.stats.failures += 1
+            async with slot.condition:
+                slot.pending -= 1
+                slot.condition.notify()
+            raise
+        async with slot.condition:
+            slot.pending -= 1
+            slot.in_use.add(pooled)
+        slot.stats.created += 1
+        slot.stats.wait_seconds += time.monotonic() - started
+        return pooled
+
+    async def _checkin(self, pooled: PooledSession, broken: bool = False) -> None:
+        slot = self._slot(pooled.params)
+        async with slot.condition:
+            slot.in_use.discard(pooled)
+            if broken or not pooled.alive:
+                slot.stats.reconnects += 1
+                self._discard(pooled)
+            else:
+                pooled.last_used = time.monotonic()
+                slot.idle.append(pooled)
+            slot.condition.notify()
+
+    @asynccontextmanager
+    async def session(self, params: ServerParameters) -> AsyncGenerator[ClientSession, None]:
+        """Borrows an initialized session for `params`, opening one if none is idle.
+
+        A session whose transport fails while borrowed is discarded instead of being
+        returned, so the next checkout transparently reconnects.
+        """
+        pooled = await self._checkout(params)
+        broken = False
+        try:
+            if pooled.session is None:
+                raise ConnectionError(f"MCP session for `{pooled.name}` is closed.")
+            yield pooled.session
+        except Exception as e:
+            broken = is_connection_error(e)
+            raise
+        finally:
+            await self._checkin(pooled, broken=broken)
+
+    async def _lease(self, slot: _ServerSlot) -> PooledSession:
+        async with slot.share_lock:
+            pooled = slot.shared
+            if pooled is None or pooled.broken or not pooled.alive:
+                pooled = await self._checkout(slot.params)
+                slot.shared = pooled
+            elif pooled.calls:
+                slot.stats.multiplexed += 1
+            pooled.calls += 1
+            return pooled
+
+    async def _release(self, slot: _ServerSlot, pooled: PooledSession, broken: bool) -> None:
+        async with slot.share_lock:
+            pooled.calls -= 1
+            pooled.broken = pooled.broken or broken
+            if pooled.broken and slot.shared is pooled:
+                # New calls get a fresh session while the remaining ones drain
+                slot.shared = None
+            if pooled.calls == 0:
+                if slot.shared is pooled:
+                    slot.shared = None
+                await self._checkin(pooled, broken=pooled.broken)
+
+    @asynccontextmanager
+    async def _shared_session(
+        self, params: ServerParameters
+    ) -> AsyncGenerator[tuple[PooledSession, ClientSession], None]:
+        slot = self._slot(params)
+        async with slot.calls:
+            pooled = await self._lease(slot)
+            broken = False
+            try:
+                if pooled.session is None:
+                    raise ConnectionError(f"MCP session for `{pooled.name}` is closed.")
+                yield pooled, pooled.session
+            except Exception as e:
+                broken = is_connection_error(e)
+                raise
+            finally:
+                await self._release(slot, pooled, broken=broken)
+
+    async def call_tool(
+        self, params: ServerParameters, name: str, arguments: dict[str, object] | None = None
+    ) -> CallToolResult:
+        """Calls a tool, retrying once on a new session if the transport died.
+
+        MCP sessions accept several requests in flight, so concurrent calls to the same server
+        share one session instead of each checking out their own. At most
+        `max_concurrent_calls` calls per server run at the same time, the rest wait.
+        """
+        try:
+            async with self._shared_session(params) as (pooled, session):
+                return await pooled.request(session.call_tool(name, arguments))
+        except Exception as e:
+            if not is_connection_error(e):
+                raise
+        async with self._shared_session(params) as (pooled, session):
+            return await pooled.request(session.call_tool(name, arguments))
+
+    async def warmup(self, params: ServerParameters) -> None:
+        """Opens sessions for `params` until `min_size` of them are available."""
+        self._ensure_reaper()
+        slot = self._slot(params)
+        while slot.size < max(self.min_size, 1):
+            slot.pending += 1
+            try:
+                pooled = await self._open(params)
+            except BaseException:
+                slot.stats.failures += 1
+                raise
+            finally:
+                slot.pending -= 1
+            slot.stats.created += 1
+            async with slot.condition:
+                slot.idle.append(pooled)
+                slot.condition.notify()
+
+    async def _maintain(self, slot: _ServerSlot) -> None:
+        now = time.monotonic()
+        async with slot.condition:
+            keep: deque[PooledSession] = deque()
+            drop: list[PooledSession] = []
+            # The left side of the deque holds the sessions idle for the longest time
+            for pooled in slot.idle:
+                surplus = len(keep) + len(slot.in_use) >= self.min_size
+                if not pooled.alive:
+                    slot.stats.reconnects += 1
+                    drop.append(pooled)
+                elif surplus and now - pooled.last_used > self.idle_timeout:
+                    slot.stats.evicted += 1
+                    drop.append(pooled)
+                else:
+                    keep.append(pooled)
+            slot.idle = keep
+            to_ping = [p for p in keep if now - p.last_ping > self.ping_interval]
+
+        for pooled in drop:
+            await pooled.close()
+        for pooled in to_ping:
+            if await pooled.ping(ping_timeout=self.ping_timeout):
+                continue
+            logfire.warn("MCP session {server} failed a liveness ping", server=pooled.name)
+            async with slot.condition:
+                if pooled in slot.idle:
+                    slot.idle.remove(pooled)
+                    slot.stats.reconnects += 1
+            await pooled.close()
+
+        if slot.size < self.min_size:
+            with suppress(Exception):
+                await self.warmup(slot.params)
+
+    async def _reap(self) -> None:
+        while True:
+            await asyncio.sleep(self.reap_interval)
+            try:
+                for slot in list(self._slots.values()):
+                    await self._maintain(slot)
+            except Exception as e:
+                logfire.warn("MCP session pool maintenance failed: {error}", error=str(e))
+
+    def stats(self) -> dict[str, PoolStats]:
+        """Returns checkout metrics per `server_key`, as two servers may share a name."""
+        result: dict[str, PoolStats] = {}
+        for key, slot in self._slots.items():
+            result[key] = slot.stats.model_copy(
+                update={"in_use": len(slot.in_use), "idle": len(slot.idle)}
+            )
+        return result
+
+    async def aclose(self) -> None:
+        if self._reaper is not None:
+            self._reaper.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._reaper
+            self._reaper = None
+        for slot in self._slots.values():
+            async with slot.condition:
+                sessions = [*slot.idle, *slot.in_use]
+                slot.idle.clear()
+                slot.in_use.clear()
+            for pooled in sessions:
+                await pooled.close()
+        self._slots.clear()
+        if self._closing:
+            await asyncio.gather(*self._closing, return_exceptions=True)
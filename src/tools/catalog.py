@@ -0,0 +1,379 @@
+import re
+import json
+import time
+from typing import Any
+import asyncio
+import hashlib
+
+import logfire
+from pydantic import Field, BaseModel, ConfigDict, PrivateAttr
+from mcp.types import Tool as MCPTool
+from mcp.types import TextContent, CallToolResult, ServerNotification, ToolListChangedNotification
+from autogen.tools import Tool, Toolkit
+from mcp.client.session_group import ServerParameters
+
+from src.tools.spill import SpillStore
+from src.sessions.pool import SessionPool
+from src.tools.selection import BM25Index, tool_document
+from src.tools.result_cache import ToolResultCache
+from src.sessions.connection import server_key, server_name
+from src.workflow.checkpoints import active_replay
+
+# OpenAI rejects function names longer than this, failing every request that lists the tool
+MAX_TOOL_NAME = 64
+
+
+def merged_tool_name(server: str, tool: str) -> str:
+    """Returns `<server>__<tool>`, shortened with a hash suffix when it is too long.
+
+    Examples:
+        >>> merged_tool_name("jira", "search")
+        'jira__search'
+        >>> len(merged_tool_name("mcp-atlassian", "x" * 80))
+        64
+    """
+    name = re.sub(r"[^a-zA-Z0-9_-]", "_", f"{server}__{tool}")
+    if len(name) <= MAX_TOOL_NAME:
+        return name
+    digest = hashlib.sha256(f"{server}\0{tool}".encode()).hexdigest()[:8]
+    return f"{name[: MAX_TOOL_NAME - len(digest) - 1]}_{digest}"
+
+
+class CatalogStats(BaseModel):
+    hits: int = Field(default=0, description="Lookups served from the cache.")
+    misses: int = Field(default=0, description="Lookups that had to call `list_tools`.")
+    invalidations: int = Field(
+        default=0, description="Entries dropped by `list_changed` or by hand."
+    )
+    expirations: int = Field(default=0, description="Entries dropped because the TTL elapsed.")
+
+
+class CatalogEntry(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    server: str = Field(..., description="Short name of the server the tools belong to.")
+    tools: list[MCPTool] = Field(..., description="Raw tools returned by `list_tools`.")
+    detail: str = Field(..., description="Markdown listing of tool names and descriptions.")
+    toolkit: Toolkit = Field(..., description="AG2 toolkit whose tools call the session pool.")
+    loaded_at: float = Field(..., description="`time.monotonic()` when the entry was loaded.")
+    version: int = Field(default=1, description="Incremented each time the server is reloaded.")
+
+
+class MergedCatalog(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    entries: dict[str, CatalogEntry] = Field(
+        ..., description="Catalog entries of the servers that started, keyed by server name."
+    )
+    failed: dict[str, str] = Field(
+        default_factory=dict, description="Error message of every server that failed to start."
+    )
+    detail: str = Field(..., description="Tool detail of all available servers.")
+    toolkit: Toolkit = Field(..., description="Toolkit with tools of all available servers.")
+    routes: dict[str, str] = Field(
+        default_factory=dict, description="Maps every exposed tool name to its server name."
+    )
+    index: BM25Index = Field(
+        ..., description="Relevance index over the names and descriptions of the tools."
+    )
+    builtin: list[str] = Field(
+        default_factory=list,
+        description="Names of synthetic tools such as `read_chunk`, always sent to the LLM.",
+    )
+
+    @property
+    def version(self) -> tuple[tuple[str, int], ...]:
+        return tuple((name, entry.version) for name, entry in self.entries.items())
+
+
+def render_tool_detail(tools: list[MCPTool]) -> str:
+    return "".join(f"\n- `{tool.name}`:\n{tool.description}" for tool in tools)
+
+
+def render_builtin_detail(tool: Tool) -> str:
+    return f"\n- `{tool.name}`:\n{tool.description}"
+
+
+def convert_call_tool_result(result: CallToolResult) -> tuple[str | list[str], Any]:
+    """Splits a tool result into text and non-text content the same way `create_toolkit` does."""
+    texts = [content.text for content in result.content if isinstance(content, TextContent)]
+    others = [content for content in result.content if not isinstance(content, TextContent)]
+    tool_content: str | list[str] = texts[0] if len(texts) == 1 else texts
+    if result.isError:
+        raise ValueError(f"Tool call failed: {tool_content}")
+    return tool_content, others or None
+
+
+def build_tool(
+    pool: SessionPool,
+    params: ServerParameters,
+    tool: MCPTool,
+    name: str | None = None,
+    cache: ToolResultCache | None = None,
+    spill: SpillStore | None = None,
+) -> Tool:
+    """Wraps an MCP tool so each call borrows a session from the pool instead of holding one.
+
+    `name` overrides the name shown to the LLM, the call is still routed to `tool.name`.
+    With `cache`, results of tools allowed by its policies are served from the cache.
+    With `spill`, large text results are replaced by a handle into the store.
+    Inside `replaying`, calls the run already completed are answered from its checkpoint
+    and successful new calls are added to it.
+    """
+    exposed = name or tool.name
+
+    async def call_tool(**arguments: object) -> tuple[str | list[str], Any]:
+        replay = active_replay.get()
+        stored = replay.lookup(exposed, arguments) if replay is not None else None
+        if stored is not None:
+            result = CallToolResult.model_validate(stored)
+        else:
+            with logfire.span(
+                "Call MCP tool {tool}", tool=tool.name, server=server_name(params)
+            ) as span:
+                if cache is None:
+                    result = await pool.call_tool(params, tool.name, arguments)
+                else:
+                    result = await cache.call(
+                        server_key(params),
+                        tool.name,
+                        arguments,
+                        lambda: pool.call_tool(params, tool.name, arguments),
+                    )
+                span.set_attribute("arguments_size", len(json.dumps(arguments, default=str)))
+                span.set_attribute(
+                    "result_size",
+                    sum(len(c.text) for c in result.content if isinstance(c, TextContent)),
+                )
+                span.set_attribute("is_error", bool(result.isError))
+            if replay is not None and not result.isError:
+                # Stored as sent by the server, so images and resources come back as such
+                replay.record(exposed, arguments, result.model_dump(mode="json"))
+        content, others = convert_call_tool_result(result)
+        if spill is not None:
+            if isinstance(content, str):
+                content = spill.spill(tool.name, content)
+            else:
+                content = [spill.spill(tool.name, text) for text in content]
+        return content, others
+
+    return Tool(
+        name=exposed,
+        description=tool.description or "",
+        func_or_tool=call_tool,
+        parameters_json_schema=tool.inputSchema,
+    )
+
+
+class ToolCatalog(BaseModel):
+    """Per-server cache of the tool list, its rendered detail and the built toolkit.
+
+    Entries are dropped when the server sends `notifications/tools/list_changed` or once
+    `ttl` seconds have passed since they were loaded. Only tools are exposed: unlike
+    `autogen.mcp.create_toolkit`, MCP resource templates are not turned into tools.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    ttl: float | None = Field(
+        default=600.0,
+        description="Seconds a catalog entry stays valid, `None` keeps it until `list_changed`.",
+        examples=[60.0, 600.0, None],
+    )
+    retry_failed_after: float = Field(
+        default=30.0,
+        description="Seconds before a server that failed to start is tried again.",
+        examples=[10.0, 30.0],
+    )
+    result_cache: ToolResultCache | None = Field(
+        default=None,
+        description="Cache for the results of read-only tools, used by every built toolkit.",
+    )
+    spill_store: SpillStore | None = Field(
+        default=None,
+        description="Store for large tool results, which adds the `read_chunk` tool to the toolkit.",
+    )
+
+    _entries: dict[str, CatalogEntry] = PrivateAttr(default_factory=dict)
+    _versions: dict[str, int] = PrivateAttr(default_factory=dict)
+    _locks: dict[str, asyncio.Lock] = PrivateAttr(default_factory=dict)
+    _stats: dict[str, CatalogStats] = PrivateAttr(default_factory=dict)
+    _failures: dict[str, tuple[float, str]] = PrivateAttr(default_factory=dict)
+    _merged: dict[tuple[tuple[object, ...], ...], MergedCatalog] = PrivateAttr(
+        default_factory=dict
+    )
+
+    def _expired(self, entry: CatalogEntry) -> bool:
+        return self.ttl is not None and time.monotonic() - entry.loaded_at > self.ttl
+
+    def _lookup(self, key: str, stats: CatalogStats) -> CatalogEntry | None:
+        entry = self._entries.get(key)
+        if entry is not None and self._expired(entry):
+            del self._entries[key]
+            stats.expirations += 1
+            entry = None
+        return entry
+
+    async def get(self, params: ServerParameters, pool: SessionPool) -> CatalogEntry:
+        pool.add_listener(self._on_notification)
+        key = server_key(params)
+        stats = self._stats.setdefault(key, CatalogStats())
+        entry = self._lookup(key, stats)
+        if entry is not None:
+            stats.hits += 1
+            return entry
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            # Another caller may have loaded it while we were waiting for the lock
+            entry = self._lookup(key, stats)
+            if entry is not None:
+                stats.hits += 1
+                return entry
+            stats.misses += 1
+            entry = await self._load(params, pool)
+            self._entries[key] = entry
+        return entry
+
+    async def _load(self, params: ServerParameters, pool: SessionPool) -> CatalogEntry:
+        name = server_name(params)
+        with logfire.span("Load MCP tool catalog {server}", server=name):
+            async with pool.session(params) as session:
+                tools_result = await session.list_tools()
+        key = server_key(params)
+        self._versions[key] = self._versions.get(key, 0) + 1
+        tools = tools_result.tools
+        with logfire.span("Build toolkit {server}", server=name, tools=len(tools)):
+            toolkit = Toolkit([
+                build_tool(pool, params, tool, cache=self.result_cache, spill=self.spill_store)
+                for tool in tools
+            ])
+        return CatalogEntry(
+            server=name,
+            tools=tools,
+            detail=render_tool_detail(tools),
+            toolkit=toolkit,
+            loaded_at=time.monotonic(),
+            version=self._versions[key],
+        )
+
+    async def _get_or_fail(
+        self, params: ServerParameters, pool: SessionPool
+    ) -> CatalogEntry | str:
+        key = server_key(params)
+        failure = self._failures.get(key)
+        if failure is not None and time.monotonic() - failure[0] < self.retry_failed_after:
+            return failure[1]
+        try:
+            entry = await self.get(params, pool)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            self._failures[key] = (time.monotonic(), error)
+            logfire.warn(
+                "MCP server {server} is unavailable: {error}",
+                server=server_name(params),
+                error=error,
+            )
+            return error
+        self._failures.pop(key, None)
+        return entry
+
+    async def get_many(
+        self, servers: dict[str, ServerParameters], pool: SessionPool
+    ) -> MergedCatalog:
+        """Loads the catalogs of all servers concurrently and merges them into one toolkit.
+
+        With more than one server, tool names are prefixed with `<server>__`, shortened to
+        `MAX_TOOL_NAME` characters, and every tool is routed to the server that owns it. Servers that fail to start are left out and
+        reported in `failed`, unless every server failed.
+        """
+        names = list(servers)
+        results = await asyncio.gather(*[self._get_or_fail(servers[n], pool) for n in names])
+        entries = {
+            n: r for n, r in zip(names, results, strict=False) if isinstance(r, CatalogEntry)
+        }
+        failed = {n: r for n, r in zip(names, results, strict=False) if isinstance(r, str)}
+        if not entries:
+            raise RuntimeError(f"No MCP server could be started: {failed}")
+
+        servers_id = tuple((n, server_key(p)) for n, p in servers.items())
+        cache_key = (
+            servers_id,
+            tuple((n, e.version) for n, e in entries.items()),
+            tuple(sorted(failed)),
+        )
+        merged = self._merged.get(cache_key)
+        if merged is not None:
+            return merged
+
+        if len(servers) == 1:
+            ((name, entry),) = entries.items()
+            merged = MergedCatalog(
+                entries=entries,
+                detail=entry.detail,
+                toolkit=entry.toolkit,
+                routes={tool.name: name for tool in entry.tools},
+                index=BM25Index({tool.name: tool_document(tool) for tool in entry.toolkit.tools}),
+            )
+        else:
+            tools: list[Tool] = []
+            routes: dict[str, str] = {}
+            details: list[str] = []
+            for name, entry in entries.items():
+                params = servers[name]
+                renamed = [
+                    tool.model_copy(update={"name": merged_tool_name(name, tool.name)})
+                    for tool in entry.tools
+                ]
+                for tool, original in zip(renamed, entry.tools, strict=False):
+                    tools.append(
+                        build_tool(
+                            pool,
+                            params,
+                            original,
+                            name=tool.name,
+                            cache=self.result_cache,
+                            spill=self.spill_store,
+                        )
+                    )
+                    routes[tool.name] = name
+                details.append(f"\n\n### Server `{name}`{render_tool_detail(renamed)}")
+            for name, error in failed.items():
+                details.append(f"\n\n### Server `{name}` is unavailable: {error}")
+            merged = MergedCatalog(
+                entries=entries,
+                failed=failed,
+                detail="".join(details),
+                toolkit=Toolkit(tools),
+                routes=routes,
+                index=BM25Index({tool.name: tool_document(tool) for tool in tools}),
+            )
+        if self.spill_store is not None:
+            read_chunk = self.spill_store.read_chunk_tool()
+            merged = merged.model_copy(
+                update={
+                    "toolkit": Toolkit([*merged.toolkit.tools, read_chunk]),
+                    "detail": f"{merged.detail}{render_builtin_detail(read_chunk)}",
+                    "builtin": [read_chunk.name],
+                }
+            )
+        # Only the latest merge per server set is useful, older versions are dropped
+        self._merged = {k: v for k, v in self._merged.items() if k[0] != servers_id}
+        self._merged[cache_key] = merged
+        return merged
+
+    def invalidate(self, params: ServerParameters | None = None) -> None:
+        """Drops the cached entry for `params`, or every entry when `params` is `None`."""
+        keys = list(self._entries) if params is None else [server_key(params)]
+        for key in keys:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._stats.setdefault(key, CatalogStats()).invalidations += 1
+
+    def _on_notification(self, params: ServerParameters, message: object) -> None:
+        if isinstance(message, ServerNotification) and isinstance(
+            message.root, ToolListChangedNotification
+        ):
+            logfire.info("Tool list of {server} changed", server=server_name(params))
+            self.invalidate(params)
+
+    def stats(self) -> dict[str, CatalogStats]:
+        """Returns cache hits and misses per `server_key`, like `SessionPool.stats`."""
+        return {key: stats.model_copy() for key, stats in self._stats.items()}
@@ -0,0 +1,250 @@
+import json
+import time
+from typing import TYPE_CHECKING, Protocol, runtime_checkable
+import asyncio
+import fnmatch
+import hashlib
+from collections import OrderedDict
+from collections.abc import Callable, Awaitable
+
+import logfire
+from pydantic import Field, BaseModel, ConfigDict, PrivateAttr
+from mcp.types import CallToolResult
+
+if TYPE_CHECKING:
+    from redis.asyncio import Redis
+
+
+@runtime_checkable
+class CacheBackend(Protocol):
+    """Storage used by `ToolResultCache`, values are serialized `CallToolResult`s."""
+
+    async def get(self, key: str) -> bytes | None: ...
+
+    async def set(self, key: str, value: bytes, ttl: float | None) -> None: ...
+
+    async def clear(self) -> None: ...
+
+
+class MemoryBackend:
+    """In-process LRU backend, the least recently used entry is dropped beyond `max_entries`."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float | None, bytes]] = OrderedDict()
+
+    async def get(self, key: str) -> bytes | None:
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at is not None and time.monotonic() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: float | None) -> None:
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def clear(self) -> None:
+        self._entries.clear()
+
+
+class RedisBackend:
+    """Redis backend, shared by every process that points at the same server.
+
+    `client` can be any `redis.asyncio.Redis` compatible object (e.g. `fakeredis.FakeAsyncRedis`),
+    otherwise one is created from `url`, which requires the optional `redis` package.
+    """
+
+    def __init__(
+        self,
+        client: "Redis | None" = None,
+        url: str = "redis://localhost:6379/0",
+        prefix: str = "mcp_agents:tool:",
+    ):
+        if client is None:
+            try:
+                from redis.asyncio import Redis
+            except ImportError as e:
+                raise ImportError(
+                    "RedisBackend requires the `redis` package, install it with `uv add redis`."
+                ) from e
+            client = Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    async def get(self, key: str) -> bytes | None:
+        return await self.client.get(self.prefix + key)
+
+    async def set(self, key: str, value: bytes, ttl: float | None) -> None:
+        px = None if ttl is None else max(int(ttl * 1000), 1)
+        await self.client.set(self.prefix + key, value, px=px)
+
+    async def clear(self) -> None:
+        keys = [key async for key in self.client.scan_iter(match=f"{self.prefix}*")]
+        if keys:
+            await self.client.delete(*keys)
+
+
+class ToolCachePolicy(BaseModel):
+    ttl: float | None = Field(
+        default=300.0,
+        description="Seconds a result stays cached, `None` keeps it until evicted.",
+        examples=[60.0, 300.0, None],
+    )
+    max_bytes: int = Field(
+        default=256_000,
+        description="Results whose serialized size exceeds this are not cached.",
+        examples=[64_000, 256_000],
+    )
+
+
+class ToolCacheStats(BaseModel):
+    hits: int = Field(default=0, description="Calls served from the backend.")
+    misses: int = Field(default=0, description="Calls that went to the MCP server.")
+    coalesced: int = Field(
+        default=0, description="Calls that waited for an identical call already in flight."
+    )
+    too_large: int = Field(default=0, description="Results not stored because of `max_bytes`.")
+    backend_errors: int = Field(
+        default=0, description="Backend reads or writes that failed, the tool was called anyway."
+    )
+
+
+class ToolResultCache(BaseModel):
+    """Caches the results of read-only tool calls and coalesces identical concurrent calls.
+
+    Only tools matching a key of `policies` (an `fnmatch` pattern such as `jira_get_*`) are
+    cached, every other tool is always called. Error results are never stored. When the
+    backend fails, e.g. during a Redis outage, calls go straight to the MCP server.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    policies: dict[str, ToolCachePolicy] = Field(
+        default_factory=dict,
+        description="Allowlist of cacheable tools, keyed by tool name or `fnmatch` pattern.",
+        examples=[{"jira_get_issue": {"ttl": 120}, "confluence_get_*": {}}],
+    )
+    backend: CacheBackend = Field(
+        default_factory=MemoryBackend, description="Where cached results are stored."
+    )
+
+    _inflight: dict[str, asyncio.Future[CallToolResult]] = PrivateAttr(default_factory=dict)
+    _stats: dict[tuple[str, str], ToolCacheStats] = PrivateAttr(default_factory=dict)
+
+    def policy_for(self, tool_name: str) -> ToolCachePolicy | None:
+        policy = self.policies.get(tool_name)
+        if policy is not None:
+            return policy
+        for pattern, policy in self.policies.items():
+            if fnmatch.fnmatchcase(tool_name, pattern):
+                return policy
+        return None
+
+    @staticmethod
+    def make_key(server: str, tool_name: str, arguments: dict[str, object]) -> str:
+        payload = json.dumps([server, tool_name, arguments], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    async def call(
+        self,
+        server: str,
+        tool_name: str,
+        arguments: dict[str, object],
+        call: Callable[[], Awaitable[CallToolResult]],
+    ) -> CallToolResult:
+        """Returns the cached result of the call, or runs `call` and caches its result.
+
+        Args:
+            server: Identity of the server, usually `server_key(params)`.
+            tool_name: Name of the tool on the server, used to look up the policy.
+            arguments: Arguments of the call, part of the cache key.
+            call: Performs the real call when the result is not cached.
+        """
+        policy = self.policy_for(tool_name)
+        if policy is None:
+            return await call()
+
+        stats = self._stats.setdefault((server, tool_name), ToolCacheStats())
+        key = self.make_key(server, tool_name, arguments)
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            stats.coalesced += 1
+            return await self._join(inflight, call)
+
+        try:
+            cached = await self.backend.get(key)
+        except Exception as e:
+            stats.backend_errors += 1
+            logfire.warn(
+                "Failed to read cached tool result, calling the tool: {error}",
+                error=f"{type(e).__name__}: {e}",
+            )
+            cached = None
+        if cached is not None:
+            stats.hits += 1
+            return CallToolResult.model_validate_json(cached)
+
+        # Re-check after the backend round trip, another caller may have started meanwhile
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            stats.coalesced += 1
+            return await self._join(inflight, call)
+
+        stats.misses += 1
+        future: asyncio.Future[CallToolResult] = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters retrieve it, this only silences "exception was never retrieved"
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        future.set_result(result)
+        if not result.isError:
+            await self._store(key, result, policy, stats)
+        return result
+
+    @staticmethod
+    async def _join(
+        inflight: asyncio.Future[CallToolResult], call: Callable[[], Awaitable[CallToolResult]]
+    ) -> CallToolResult:
+        try:
+            return await asyncio.shield(inflight)
+        except asyncio.CancelledError:
+            # Only the caller that started the call was cancelled, not this one
+            if not inflight.cancelled():
+                raise
+            return await call()
+
+    async def _store(
+        self, key: str, result: CallToolResult, policy: ToolCachePolicy, stats: ToolCacheStats
+    ) -> None:
+        value = result.model_dump_json(by_alias=True).encode()
+        if len(value) > policy.max_bytes:
+            stats.too_large += 1
+            return
+        try:
+            await self.backend.set(key, value, policy.ttl)
+        except Exception as e:
+            stats.backend_errors += 1
+            logfire.warn("Failed to cache tool result: {error}", error=f"{type(e).__name__}: {e}")
+
+    async def clear(self) -> None:
+        await self.backend.clear()
+
+    def stats(self) -> dict[tuple[str, str], ToolCacheStats]:
+        """Returns hits, misses and coalesced calls per `(server, tool_name)`."""
+        return {key: stats.model_copy() for key, stats in self._stats.items()}
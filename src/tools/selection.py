@@ -0,0 +1,207 @@
+import re
+import json
+import math
+import fnmatch
+import inspect
+from collections import Counter
+from collections.abc import Callable, Collection
+
+from autogen import ConversableAgent
+import logfire
+from pydantic import Field, BaseModel, ConfigDict
+from autogen.tools import Tool
+
+
+def tokenize(text: str) -> list[str]:
+    """Splits text into lowercase terms, breaking up `snake_case` and `camelCase` names.
+
+    Examples:
+        >>> tokenize("jira_get_issues searchConfluencePages")
+        ['jira', 'get', 'issue', 'search', 'confluence', 'page']
+    """
+    text = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", text)
+    terms = re.findall(r"[a-z0-9]+", text.lower())
+    # A light plural folding so that "issues" matches "issue"
+    return [
+        t[:-1] if len(t) > 3 and t.endswith("s") and not t.endswith("ss") else t for t in terms
+    ]
+
+
+class BM25Index:
+    """Okapi BM25 over short documents, used to rank tools by relevance to a request.
+
+    Examples:
+        >>> index = BM25Index({"get_issue": "Get a Jira issue", "create_page": "Create a page"})
+        >>> index.search("show me issue ABC-1", k=1)
+        ['get_issue']
+    """
+
+    def __init__(self, documents: dict[str, str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._terms = {name: Counter(tokenize(text)) for name, text in documents.items()}
+        self._lengths = {name: sum(terms.values()) for name, terms in self._terms.items()}
+        self._avg_length = sum(self._lengths.values()) / len(self._lengths) if self._terms else 0
+        frequencies = Counter(term for terms in self._terms.values() for term in terms)
+        total = len(self._terms)
+        self._idf = {
+            term: math.log(1 + (total - freq + 0.5) / (freq + 0.5))
+            for term, freq in frequencies.items()
+        }
+
+    def score(self, query: str) -> dict[str, float]:
+        query_terms = set(tokenize(query))
+        scores: dict[str, float] = {}
+        for name, terms in self._terms.items():
+            norm = self.k1 * (1 - self.b + self.b * self._lengths[name] / (self._avg_length or 1))
+            score = sum(
+                self._idf[term] * terms[term] * (self.k1 + 1) / (terms[term] + norm)
+                for term in query_terms
+                if term in terms
+            )
+            if score > 0:
+                scores[name] = score
+        return scores
+
+    def search(self, query: str, k: int) -> list[str]:
+        """Returns up to `k` document names with a positive score, best first."""
+        scores = self.score(query)
+        return sorted(scores, key=lambda name: -scores[name])[:k]
+
+
+def tool_document(tool: Tool) -> str:
+    """Text indexed for a tool: its name (weighted twice), description and parameter names."""
+    parameters = tool.tool_schema["function"].get("parameters", {}).get("properties", {})
+    return " ".join([tool.name, tool.name, tool.description, *parameters])
+
+
+def estimate_tokens(tools: list[Tool]) -> int:
+    """Rough prompt size of the tool schemas, about four characters per token."""
+    return sum(len(json.dumps(tool.tool_schema)) for tool in tools) // 4
+
+
+class SelectedTools(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    tools: list[Tool] = Field(..., description="Tools whose schemas are sent to the LLM.")
+    pruned: list[Tool] = Field(
+        default_factory=list, description="Tools left out, still executable on demand."
+    )
+    detail: str = Field(..., description="Tool detail of the selected tools for prompts.")
+    tokens_full: int = Field(..., description="Estimated schema tokens of all tools.")
+    tokens_selected: int = Field(..., description="Estimated schema tokens of the selection.")
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.tokens_full - self.tokens_selected
+
+
+class ToolSelection(BaseModel):
+    """Chooses which tools are exposed to the LLM for a given request."""
+
+    top_k: int | None = Field(
+        default=None,
+        ge=1,
+        description="Number of most relevant tools sent to the LLM, `None` sends every tool.",
+        examples=[8, 16, None],
+    )
+    pinned: list[str] = Field(
+        default_factory=list,
+        description="Tool names or `fnmatch` patterns that are always sent on top of the top-k.",
+        examples=[["jira_search", "confluence_get_page"]],
+    )
+
+    def select(
+        self,
+        tools: list[Tool],
+        index: BM25Index,
+        detail: str,
+        query: str,
+        always: Collection[str] = (),
+    ) -> SelectedTools:
+        """Ranks `tools` against `query` and keeps the pinned and `top_k` best matches.
+
+        Every tool is kept when `top_k` is not set, when there are no more than `top_k` tools,
+        or when nothing in the request matches any tool. Tools named in `always` are kept
+        on top, like the pinned ones.
+        """
+        tokens_full = estimate_tokens(tools)
+        if self.top_k is None or len(tools) <= self.top_k:
+            ranked = []
+        else:
+            ranked = index.search(query, k=self.top_k)
+        if not ranked:
+            return SelectedTools(
+                tools=tools, detail=detail, tokens_full=tokens_full, tokens_selected=tokens_full
+            )
+        keep = set(ranked) | set(always)
+        keep.update(
+            tool.name
+            for tool in tools
+            if any(fnmatch.fnmatchcase(tool.name, pattern) for pattern in self.pinned)
+        )
+        selected = [tool for tool in tools if tool.name in keep]
+        return SelectedTools(
+            tools=selected,
+            pruned=[tool for tool in tools if tool.name not in keep],
+            detail="".join(f"\n- `{tool.name}`:\n{tool.description}" for tool in selected),
+            tokens_full=tokens_full,
+            tokens_selected=estimate_tokens(selected),
+        )
+
+
+def _on_demand(tool: Tool, on_call: Callable[[str], None]) -> Tool:
+    """Copy of `tool` that reports its name to `on_call` before running.
+
+    Registered for execution in place of a pruned tool, so a call to it can widen the
+    tool set for the rest of the run.
+    """
+
+    async def call_tool(**arguments: object) -> object:
+        on_call(tool.name)
+        result = tool.func(**arguments)
+        return await result if inspect.isawaitable(result) else result
+
+    return Tool(
+        name=tool.name,
+        description=tool.description,
+        func_or_tool=call_tool,
+        parameters_json_schema=tool.tool_schema["function"].get("parameters"),
+    )
+
+
+def _register(
+    tools: list[Tool], callers: list[ConversableAgent], executors: list[ConversableAgent]
+) -> None:
+    for tool in tools:
+        for agent in executors:
+            tool.register_for_execution(agent)
+        for agent in callers:
+            tool.register_for_llm(agent)
+
+
+def register_tools(
+    selected: SelectedTools,
+    callers: list[ConversableAgent],
+    executors: list[ConversableAgent],
+    on_expand: Callable[[], None] | None = None,
+) -> None:
+    """Registers the selected tools for the LLM of `callers` and every tool for `executors`.
+
+    Pruned tools can still be executed; the first call to one of them exposes all pruned
+    tools to `callers` for the rest of the run and then calls `on_expand`.
+    """
+    expanded = False
+
+    def expand(name: str) -> None:
+        nonlocal expanded
+        if expanded:
+            return
+        expanded = True
+        logfire.info("Pruned tool {name} was called, exposing every tool", name=name)
+        _register(selected.pruned, callers=callers, executors=[])
+        if on_expand is not None:
+            on_expand()
+
+    _register(selected.tools, callers=callers, executors=executors)
+    fallbacks = [_on_demand(tool, on_call=expand) for tool in selected.pruned]
+    _register(fallbacks, callers=[], executors=executors)
@@ -0,0 +1,164 @@
+import time
+from typing import Annotated
+import hashlib
+from pathlib import Path
+import sqlite3
+import threading
+
+from pydantic import Field, BaseModel
+from autogen.tools import Tool
+
+READ_CHUNK = "read_chunk"
+
+
+class SpillStats(BaseModel):
+    spilled: int = Field(default=0, description="Tool results moved into the store.")
+    spilled_chars: int = Field(
+        default=0, description="Characters kept out of the chat because they were spilled."
+    )
+    chunks_read: int = Field(default=0, description="Calls to `read_chunk`.")
+    evictions: int = Field(default=0, description="Results dropped to stay within the limit.")
+    entries: int = Field(default=0, description="Results currently stored.")
+    size_bytes: int = Field(default=0, description="Total size of the stored results.")
+
+
+class SpillStore:
+    r"""Content-addressed SQLite store for tool results too large to put into the chat.
+
+    A result longer than `threshold` characters is stored once under a handle derived from
+    its content, and the model gets the handle, the size and a preview instead. The synthetic
+    `read_chunk` tool pages through a stored result; SQLite slices the text, so a page never
+    loads the whole result back into memory. The least recently read results are evicted
+    once `max_bytes` is exceeded.
+
+    Examples:
+        >>> store = SpillStore(":memory:", threshold=10, preview_chars=4)
+        >>> reply = store.spill("get_page", "0123456789abcdef")
+        >>> handle = reply.split("`")[3]
+        >>> store.read_chunk(handle, offset=10, length=4)
+        'abcd\n[characters 10-14 of 16, continue at offset 14]'
+    """
+
+    def __init__(
+        self,
+        path: str | Path = ".cache/tool_results.sqlite",
+        threshold: int = 16_000,
+        preview_chars: int = 2_000,
+        max_chunk_chars: int = 8_000,
+        max_bytes: int | None = 512 * 1024 * 1024,
+    ):
+        if str(path) != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.threshold = threshold
+        self.preview_chars = preview_chars
+        self.max_chunk_chars = max_chunk_chars
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = SpillStats()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "handle TEXT PRIMARY KEY, content TEXT NOT NULL, length INTEGER NOT NULL, "
+            "size INTEGER NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed_at)")
+        self._conn.commit()
+
+    def spill(self, tool_name: str, text: str) -> str:
+        """Returns `text` itself when it is small, otherwise stores it and returns a handle."""
+        if len(text) <= self.threshold:
+            return text
+        handle = hashlib.sha256(text.encode()).hexdigest()[:16]
+        size = len(text.encode())
+        with self._lock:
+            # The same content is only stored once, storing it again just refreshes it
+            self._conn.execute(
+                "INSERT INTO results (handle, content, length, size, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (handle) DO UPDATE SET accessed_at = excluded.accessed_at",
+                (handle, text, len(text), size, time.time()),
+            )
+            self._stats.spilled += 1
+            self._stats.spilled_chars += len(text) - self.preview_chars
+            self._evict(keep=handle)
+            self._conn.commit()
+        return (
+            f"The result of `{tool_name}` has {len(text)} characters and was stored as handle "
+            f"`{handle}`. Call `{READ_CHUNK}` with this handle, an offset and a length of up "
+            f"to {self.max_chunk_chars} to read more of it. It starts with:\n"
+            f"{text[: self.preview_chars]}"
+        )
+
+    def read_chunk(self, handle: str, offset: int = 0, length: int | None = None) -> str:
+        """Returns up to `length` characters of a stored result, starting at `offset`."""
+        length = min(length or self.max_chunk_chars, self.max_chunk_chars)
+        offset = max(offset, 0)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT substr(content, ?, ?), length FROM results WHERE handle = ?",
+                (offset + 1, length, handle),
+            ).fetchone()
+            if row is None:
+                return f"No stored result with handle `{handle}`, it may have been evicted."
+            self._conn.execute(
+                "UPDATE results SET accessed_at = ? WHERE handle = ?", (time.time(), handle)
+            )
+            self._conn.commit()
+            self._stats.chunks_read += 1
+        chunk, total = row
+        end = offset + len(chunk)
+        position = f"characters {offset}-{end} of {total}"
+        if end < total:
+            return f"{chunk}\n[{position}, continue at offset {end}]"
+        return f"{chunk}\n[{position}, end of result]"
+
+    def read_chunk_tool(self) -> Tool:
+        """Builds the synthetic `read_chunk` tool that pages through this store."""
+
+        def read_chunk(
+            handle: Annotated[str, "Handle of the stored result."],
+            offset: Annotated[int, "Character offset to start reading at."] = 0,
+            length: Annotated[int, "Number of characters to read."] = self.max_chunk_chars,
+        ) -> str:
+            return self.read_chunk(handle, offset=offset, length=length)
+
+        return Tool(
+            name=READ_CHUNK,
+            description=(
+                "Reads part of a large tool result that was stored under a handle. "
+                f"Returns up to {self.max_chunk_chars} characters starting at `offset`."
+            ),
+            func_or_tool=read_chunk,
+        )
+
+    def _evict(self, keep: str) -> None:
+        if self.max_bytes is None:
+            return
+        (size,) = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()
+        over_size = size - self.max_bytes
+        if over_size <= 0:
+            return
+        evicted: list[tuple[str]] = []
+        freed = 0
+        for handle, entry_size in self._conn.execute(
+            "SELECT handle, size FROM results WHERE handle != ? ORDER BY accessed_at ASC", (keep,)
+        ):
+            if freed >= over_size:
+                break
+            evicted.append((handle,))
+            freed += entry_size
+        self._conn.executemany("DELETE FROM results WHERE handle = ?", evicted)
+        self._stats.evictions += len(evicted)
+
+    def stats(self) -> SpillStats:
+        """Returns how much was spilled and read along with the current size on disk."""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+            return self._stats.model_copy(update={"entries": entries, "size_bytes": size})
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
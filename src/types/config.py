@@ -1,8 +1,12 @@
 import dotenv
 from autogen import LLMConfig
-from pydantic import Field, AliasChoices, computed_field
+from pydantic import Field, PrivateAttr, AliasChoices, computed_field
 from pydantic_settings import BaseSettings
 
+from src.llm.router import ROUTER_BASE_URL, LLMEndpoint, EndpointStats, EndpointRouter
+from src.llm.http_pool import HttpPoolStats, HttpPoolConfig, SharedHttpClient
+from src.llm.completion_cache import SQLiteCompletionCache
+
 dotenv.load_dotenv()
 
 
@@ -39,11 +43,82 @@ class Config(BaseSettings):
         frozen=False,
         deprecated=False,
     )
+    completion_cache_path: str | None = Field(
+        default=None,
+        description="SQLite file that caches LLM completions of the planning stage, `None` disables it.",
+        validation_alias=AliasChoices("COMPLETION_CACHE_PATH", "completion_cache_path"),
+        frozen=False,
+        deprecated=False,
+    )
+    completion_cache_max_entries: int = Field(
+        default=10_000,
+        description="Maximum number of cached completions before the least recently used are evicted.",
+        validation_alias=AliasChoices(
+            "COMPLETION_CACHE_MAX_ENTRIES", "completion_cache_max_entries"
+        ),
+        frozen=False,
+        deprecated=False,
+    )
+    http_pool: HttpPoolConfig = Field(
+        default_factory=HttpPoolConfig,
+        description="Connection pool of the HTTP client shared by every LLM client in the process.",
+        validation_alias=AliasChoices("HTTP_POOL", "http_pool"),
+        frozen=False,
+        deprecated=False,
+    )
+    endpoints: list[LLMEndpoint] = Field(
+        default_factory=list,
+        description="Further endpoints serving `model` next to `base_url`, LLM calls are routed "
+        "to the one with the most rate-limit headroom and fail over between them.",
+        validation_alias=AliasChoices("LLM_ENDPOINTS", "endpoints"),
+        frozen=False,
+        deprecated=False,
+    )
+
+    _completion_cache: SQLiteCompletionCache | None = PrivateAttr(default=None)
+    _llm_config: tuple[tuple[object, ...], LLMConfig] | None = PrivateAttr(default=None)
+
+    @property
+    def completion_cache(self) -> SQLiteCompletionCache | None:
+        """Opens the completion cache on first use, `None` when it is not enabled."""
+        if self.completion_cache_path is None:
+            return None
+        if self._completion_cache is None:
+            self._completion_cache = SQLiteCompletionCache(
+                path=self.completion_cache_path, max_entries=self.completion_cache_max_entries
+            )
+        return self._completion_cache
 
     @computed_field
     @property
     def llm_config(self) -> LLMConfig:
-        if self.api_type == "azure":
+        """Builds the `LLMConfig` once and reuses it until one of the fields it uses changes.
+
+        Agents copy the config they are given, so sharing one instance is safe.
+        """
+        key = (
+            self.model,
+            self.api_type,
+            self.base_url,
+            self.api_key,
+            self.http_pool,
+            tuple(self.endpoints),
+        )
+        http_client = SharedHttpClient.get(self.http_pool)
+        if self._llm_config is not None and self._llm_config[0] == key:
+            return self._llm_config[1]
+        if self.api_type not in {"azure", "openai"}:
+            raise ValueError(f"Unsupported API type: {self.api_type}")
+        if self.endpoints:
+            # Every call goes through the router, which speaks each endpoint's own API
+            llm_config = LLMConfig(
+                model=self.model,
+                api_key="routed",
+                base_url=ROUTER_BASE_URL,
+                api_type="openai",
+                http_client=self.endpoint_router.client(),
+            )
+        elif self.api_type == "azure":
             llm_config = LLMConfig(
                 model=self.model,
                 api_key=self.api_key,
@@ -51,6 +126,7 @@ class Config(BaseSettings):
                 api_version="2025-04-01-preview",
                 api_type=self.api_type,
                 default_headers={"X-User-Id": "srv_dvc_tma001"},
+                http_client=http_client,
             )
         elif self.api_type == "openai":
             llm_config = LLMConfig(
@@ -58,7 +134,29 @@ class Config(BaseSettings):
                 api_key=self.api_key,
                 base_url=self.base_url,
                 api_type=self.api_type,
+                http_client=http_client,
             )
-        else:
-            raise ValueError(f"Unsupported API type: {self.api_type}")
+        self._llm_config = (key, llm_config)
         return llm_config
+
+    @property
+    def endpoint_router(self) -> EndpointRouter:
+        """The router shared by every config with the same endpoints, `base_url` comes first."""
+        primary = LLMEndpoint(
+            api_type=self.api_type,
+            base_url=self.base_url,
+            api_key=self.api_key,
+            model=self.model,
+            headers={"X-User-Id": "srv_dvc_tma001"} if self.api_type == "azure" else {},
+        )
+        return EndpointRouter.shared([primary, *self.endpoints], self.model, self.http_pool)
+
+    def llm_endpoint_stats(self) -> list[EndpointStats]:
+        """Returns the load, budget and health of every LLM endpoint, empty without `endpoints`."""
+        if not self.endpoints:
+            return []
+        return self.endpoint_router.stats()
+
+    def llm_http_stats(self) -> HttpPoolStats:
+        """Returns how many LLM requests reused a pooled connection instead of opening one."""
+        return SharedHttpClient.stats(self.http_pool)
@@ -0,0 +1,92 @@
+from typing import Any, Literal, Annotated
+
+from pydantic import Field, BaseModel
+
+
+class TokenDelta(BaseModel):
+    type: Literal["token"] = "token"
+    stage: str = Field(..., description="Workflow stage that produced the token.")
+    agent: str | None = Field(default=None, description="Agent that is generating the reply.")
+    content: str = Field(..., description="Streamed chunk of the LLM reply.")
+
+
+class AgentTurn(BaseModel):
+    type: Literal["turn"] = "turn"
+    stage: str = Field(..., description="Workflow stage the message belongs to.")
+    sender: str = Field(..., description="Agent that sent the message.")
+    recipient: str = Field(..., description="Agent that received the message.")
+    content: Any = Field(default=None, description="Message content, if any.")
+    tool_calls: list[str] = Field(
+        default_factory=list, description="Names of the tools the message asks to call."
+    )
+
+
+class ToolCallStarted(BaseModel):
+    type: Literal["tool_call_started"] = "tool_call_started"
+    stage: str = Field(..., description="Workflow stage that runs the tool.")
+    call_id: str | None = Field(default=None, description="Tool call id assigned by the LLM.")
+    name: str = Field(..., description="Name of the tool.")
+    arguments: dict[str, Any] = Field(default_factory=dict, description="Tool arguments.")
+
+
+class ToolCallFinished(BaseModel):
+    type: Literal["tool_call_finished"] = "tool_call_finished"
+    stage: str = Field(..., description="Workflow stage that ran the tool.")
+    call_id: str | None = Field(default=None, description="Tool call id assigned by the LLM.")
+    name: str = Field(..., description="Name of the tool.")
+    success: bool = Field(..., description="Whether the tool call succeeded.")
+    content: Any = Field(default=None, description="Tool output as returned to the agent.")
+    duration: float = Field(..., description="Seconds between start and end of the call.")
+
+
+class StageStarted(BaseModel):
+    type: Literal["stage_started"] = "stage_started"
+    stage: str = Field(..., description="Name of the workflow stage.")
+
+
+class StageFinished(BaseModel):
+    type: Literal["stage_finished"] = "stage_finished"
+    stage: str = Field(..., description="Name of the workflow stage.")
+    duration: float = Field(..., description="Seconds the stage took.")
+
+
+class Terminated(BaseModel):
+    type: Literal["terminated"] = "terminated"
+    stage: str = Field(..., description="Workflow stage that terminated.")
+    reason: str = Field(..., description="Termination reason reported by AG2.")
+
+
+class Routed(BaseModel):
+    type: Literal["routed"] = "routed"
+    route: Literal["direct", "plan"] = Field(..., description="Workflow chosen by the router.")
+    reply: str = Field(..., description="Raw reply of the router.")
+
+
+class RunStarted(BaseModel):
+    type: Literal["run_started"] = "run_started"
+    run_id: str = Field(..., description="Checkpoint of the run, see `MCPAgent.a_resume`.")
+    resumed: bool = Field(default=False, description="Whether an earlier attempt is resumed.")
+
+
+class RunFinished(BaseModel):
+    type: Literal["run_finished"] = "run_finished"
+    messages: list[dict[str, Any]] = Field(
+        default_factory=list, description="Chat history of the final stage."
+    )
+    summary: str | None = Field(default=None, description="Summary of the final stage.")
+    duration: float = Field(..., description="Seconds the whole run took.")
+
+
+RunEvent = Annotated[
+    TokenDelta
+    | AgentTurn
+    | ToolCallStarted
+    | ToolCallFinished
+    | StageStarted
+    | StageFinished
+    | Terminated
+    | Routed
+    | RunStarted
+    | RunFinished,
+    Field(discriminator="type"),
+]
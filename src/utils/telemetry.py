@@ -0,0 +1,275 @@
+import json
+from typing import TYPE_CHECKING, Any
+import threading
+from collections import deque
+from http.server import HTTPServer, ThreadingHTTPServer, BaseHTTPRequestHandler
+from collections.abc import Sequence, AsyncIterator
+
+import logfire
+from pydantic import Field, BaseModel, AliasChoices
+from opentelemetry import trace
+from pydantic_settings import BaseSettings
+from opentelemetry.context import attach, detach
+from opentelemetry.sdk.trace import ReadableSpan, SpanProcessor
+from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult, BatchSpanProcessor
+
+from src.utils.stats import percentile
+from src.types.events import RunEvent, RunStarted, StageStarted, StageFinished
+
+if TYPE_CHECKING:
+    from opentelemetry.trace import Span
+
+# Numeric span attributes that are summed up per span name
+COUNTED_ATTRIBUTES = (
+    "gen_ai.usage.input_tokens",
+    "gen_ai.usage.output_tokens",
+    "request_size",
+    "arguments_size",
+    "result_size",
+)
+
+
+class TelemetryConfig(BaseSettings):
+    otlp_endpoint: str | None = Field(
+        default=None,
+        description="OTLP/HTTP traces endpoint, e.g. a local collector or Jaeger.",
+        examples=["http://localhost:4318/v1/traces"],
+        validation_alias=AliasChoices("TELEMETRY_OTLP_ENDPOINT", "otlp_endpoint"),
+    )
+    jsonl_path: str | None = Field(
+        default=None,
+        description="File that receives one JSON line per finished span.",
+        examples=["./logs/spans.jsonl"],
+        validation_alias=AliasChoices("TELEMETRY_JSONL_PATH", "jsonl_path"),
+    )
+    prometheus_port: int | None = Field(
+        default=None,
+        description="Port of a Prometheus scrape endpoint serving span latency and counters.",
+        examples=[9464],
+        validation_alias=AliasChoices("TELEMETRY_PROMETHEUS_PORT", "prometheus_port"),
+    )
+    instrument_llm: bool = Field(
+        default=True,
+        description="Trace every OpenAI request with its token usage.",
+        validation_alias=AliasChoices("TELEMETRY_INSTRUMENT_LLM", "instrument_llm"),
+    )
+    window: int = Field(
+        default=4096,
+        description="Latest durations per span name used for the percentiles.",
+        validation_alias=AliasChoices("TELEMETRY_WINDOW", "window"),
+    )
+
+
+class SpanSummary(BaseModel):
+    count: int = Field(..., description="Spans finished since start-up.")
+    total_seconds: float = Field(..., description="Summed duration of those spans.")
+    p50: float = Field(..., description="Median duration over the recent window.")
+    p99: float = Field(..., description="99th percentile duration over the recent window.")
+    max: float = Field(..., description="Slowest duration over the recent window.")
+    counters: dict[str, float] = Field(
+        default_factory=dict, description="Sums of token counts and payload sizes."
+    )
+
+
+class SpanRecorder(SpanProcessor):
+    """Keeps latency percentiles and token/payload counters per span name in memory."""
+
+    def __init__(self, window: int = 4096):
+        self.window = window
+        self._lock = threading.Lock()
+        self._durations: dict[str, deque[float]] = {}
+        self._counts: dict[str, int] = {}
+        self._totals: dict[str, float] = {}
+        self._counters: dict[str, dict[str, float]] = {}
+
+    def on_end(self, span: ReadableSpan) -> None:
+        if span.start_time is None or span.end_time is None:
+            return
+        attributes = span.attributes or {}
+        if attributes.get("logfire.span_type") == "log":
+            return
+        duration = (span.end_time - span.start_time) / 1e9
+        counted = {k: attributes[k] for k in COUNTED_ATTRIBUTES if k in attributes}
+        if "request_data" in attributes:
+            # Set by `logfire.instrument_openai`, the JSON payload sent to the LLM
+            counted["request_size"] = len(str(attributes["request_data"]))
+        with self._lock:
+            name = span.name
+            self._durations.setdefault(name, deque(maxlen=self.window)).append(duration)
+            self._counts[name] = self._counts.get(name, 0) + 1
+            self._totals[name] = self._totals.get(name, 0.0) + duration
+            counters = self._counters.setdefault(name, {})
+            for key, value in counted.items():
+                if isinstance(value, int | float):
+                    counters[key] = counters.get(key, 0) + value
+
+    def summary(self) -> dict[str, SpanSummary]:
+        """Returns count, p50/p99 latency and counters per span name."""
+        with self._lock:
+            return {
+                name: SpanSummary(
+                    count=self._counts[name],
+                    total_seconds=self._totals[name],
+                    p50=percentile(durations, 50),
+                    p99=percentile(durations, 99),
+                    max=max(durations, default=0.0),
+                    counters=dict(self._counters.get(name, {})),
+                )
+                for name, durations in self._durations.items()
+            }
+
+    def render_prometheus(self) -> str:
+        """Renders the summary in the Prometheus text exposition format."""
+        lines = [
+            "# TYPE mcp_agents_span_duration_seconds summary",
+            "# TYPE mcp_agents_span_attribute_total counter",
+        ]
+        for name, summary in self.summary().items():
+            label = json.dumps(name)
+            for quantile, value in (("0.5", summary.p50), ("0.99", summary.p99)):
+                lines.append(
+                    f'mcp_agents_span_duration_seconds{{span={label},quantile="{quantile}"}} {value}'
+                )
+            lines.append(
+                f"mcp_agents_span_duration_seconds_sum{{span={label}}} {summary.total_seconds}"
+            )
+            lines.append(f"mcp_agents_span_duration_seconds_count{{span={label}}} {summary.count}")
+            for key, value in summary.counters.items():
+                lines.append(
+                    f'mcp_agents_span_attribute_total{{span={label},attribute="{key}"}} {value}'
+                )
+        return "\n".join(lines) + "\n"
+
+    def serve_prometheus(self, port: int, host: str = "127.0.0.1") -> HTTPServer:
+        """Serves `render_prometheus` on `http://host:port/metrics` from a daemon thread."""
+        recorder = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:  # noqa: N802
+                body = recorder.render_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:  # noqa: A002, ANN401
+                """Keeps scrapes out of the console."""
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        thread = threading.Thread(target=server.serve_forever, name="prometheus", daemon=True)
+        thread.start()
+        return server
+
+
+class JsonlSpanExporter(SpanExporter):
+    """Appends one JSON object per span to a file, readable without any tracing backend."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        lines = []
+        for span in spans:
+            context = span.get_span_context()
+            lines.append(
+                json.dumps(
+                    {
+                        "name": span.name,
+                        "trace_id": f"{context.trace_id:032x}" if context else None,
+                        "span_id": f"{context.span_id:016x}" if context else None,
+                        "parent_id": f"{span.parent.span_id:016x}" if span.parent else None,
+                        "start": (span.start_time or 0) / 1e9,
+                        "duration": ((span.end_time or 0) - (span.start_time or 0)) / 1e9,
+                        "attributes": dict(span.attributes or {}),
+                    },
+                    default=str,
+                )
+            )
+        with self._lock, open(self.path, "a", encoding="utf-8") as file:
+            file.write("".join(f"{line}\n" for line in lines))
+        return SpanExportResult.SUCCESS
+
+
+_telemetry: SpanRecorder | None = None
+_telemetry_lock = threading.Lock()
+
+
+def configure_telemetry(config: TelemetryConfig | None = None) -> SpanRecorder:
+    """Configures logfire without its cloud service and attaches the local exporters.
+
+    Returns the in-memory recorder, whose `summary()` gives p50/p99 per span name.
+    """
+    config = config or TelemetryConfig()
+    recorder = SpanRecorder(window=config.window)
+    processors: list[SpanProcessor] = [recorder]
+    if config.jsonl_path is not None:
+        processors.append(BatchSpanProcessor(JsonlSpanExporter(config.jsonl_path)))
+    if config.otlp_endpoint is not None:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        processors.append(BatchSpanProcessor(OTLPSpanExporter(endpoint=config.otlp_endpoint)))
+    logfire.configure(send_to_logfire=False, additional_span_processors=processors)
+    if config.instrument_llm:
+        logfire.instrument_openai()
+    if config.prometheus_port is not None:
+        recorder.serve_prometheus(config.prometheus_port)
+    return recorder
+
+
+def get_telemetry() -> SpanRecorder:
+    """Configures telemetry from the environment on first use and returns its recorder.
+
+    Called when an agent is built rather than on import, so importing `main` neither
+    instruments OpenAI nor starts a Prometheus endpoint.
+    """
+    global _telemetry
+    with _telemetry_lock:
+        if _telemetry is None:
+            _telemetry = configure_telemetry()
+        return _telemetry
+
+
+async def trace_stages(events: AsyncIterator[RunEvent]) -> AsyncIterator[RunEvent]:
+    """Passes `events` through and records a span for the run and for each of its stages.
+
+    The spans are started and ended by hand rather than entered, since the context of an
+    async generator must not be attached across `yield`. Instead, the span of the current
+    stage is attached only while `events` computes its next event, so tool calls, LLM
+    requests and chat tasks started during a stage are children of that stage.
+    """
+    tracer = trace.get_tracer("mcp_agents")
+    run_span = tracer.start_span("run")
+    # Stages are children of the run, whatever context the caller has
+    run_context = trace.set_span_in_context(run_span)
+    current = run_context
+    stages: dict[str, Span] = {}
+    iterator = aiter(events)
+    try:
+        while True:
+            token = attach(current)
+            try:
+                event = await anext(iterator)
+            except StopAsyncIteration:
+                break
+            finally:
+                detach(token)
+            if isinstance(event, StageStarted):
+                stages[event.stage] = tracer.start_span(
+                    f"stage {event.stage}", context=run_context, attributes={"stage": event.stage}
+                )
+                current = trace.set_span_in_context(stages[event.stage])
+            elif isinstance(event, StageFinished) and event.stage in stages:
+                stages.pop(event.stage).end()
+                # Back to a stage that is still open, or to the run
+                current = (
+                    trace.set_span_in_context([*stages.values()][-1]) if stages else run_context
+                )
+            elif isinstance(event, RunStarted):
+                run_span.set_attribute("run_id", event.run_id)
+            yield event
+    finally:
+        for span in stages.values():
+            span.end()
+        run_span.end()
@@ -0,0 +1,108 @@
+from contextlib import contextmanager
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Iterator
+
+from autogen import ConversableAgent
+from pydantic import Field, BaseModel, ConfigDict, PrivateAttr
+
+
+class AgentSet:
+    """The agents of one workflow with their tools registered, reused across runs.
+
+    A set is marked `dirty` when a run changed it in a way that `reset()` cannot undo,
+    such as exposing pruned tools, and is then dropped instead of reused.
+    """
+
+    def __init__(self, **agents: ConversableAgent):
+        self.agents = agents
+        self.dirty = False
+
+    def __getitem__(self, name: str) -> ConversableAgent:
+        """Returns the agent registered under `name`."""
+        return self.agents[name]
+
+    def reset(self) -> None:
+        for agent in self.agents.values():
+            agent.reset()
+
+
+class AgentPoolStats(BaseModel):
+    built: int = Field(default=0, description="Agent sets constructed.")
+    reused: int = Field(default=0, description="Runs served by an idle agent set.")
+    discarded: int = Field(
+        default=0, description="Sets dropped because they were dirty or aborted."
+    )
+    idle: int = Field(default=0, description="Agent sets currently idle.")
+
+
+class AgentPool(BaseModel):
+    """Idle agent sets keyed by workflow, toolkit version and exposed tools.
+
+    Building agents creates LLM clients and registers every tool on every agent, which adds
+    up at high request rates. A leased set is used by one run at a time and its chat state
+    is reset before the next run gets it.
+
+    Examples:
+        >>> pool = AgentPool()
+        >>> with pool.lease("key", lambda: AgentSet()) as agents:
+        ...     pass
+        >>> with pool.lease("key", lambda: AgentSet()) as agents:
+        ...     pass
+        >>> pool.stats().reused
+        1
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    max_idle: int = Field(
+        default=4,
+        ge=0,
+        description="Idle agent sets kept per key, more concurrent runs build extra sets.",
+        examples=[0, 4, 8],
+    )
+    max_keys: int = Field(
+        default=16,
+        ge=1,
+        description="Number of keys kept, the least recently used key is dropped beyond it.",
+        examples=[8, 16],
+    )
+
+    _idle: OrderedDict[Hashable, list[AgentSet]] = PrivateAttr(default_factory=OrderedDict)
+    _stats: AgentPoolStats = PrivateAttr(default_factory=AgentPoolStats)
+
+    @contextmanager
+    def lease(self, key: Hashable, build: Callable[[], AgentSet]) -> Iterator[AgentSet]:
+        """Lends an idle set for `key`, or one made by `build`, and takes it back afterwards.
+
+        A set whose run raised or was abandoned is discarded, since its chat may still be
+        running in the background.
+        """
+        idle = self._idle.get(key)
+        if idle:
+            agents = idle.pop()
+            self._stats.reused += 1
+        else:
+            agents = build()
+            self._stats.built += 1
+        try:
+            yield agents
+        except BaseException:
+            self._stats.discarded += 1
+            raise
+        if agents.dirty:
+            self._stats.discarded += 1
+            return
+        agents.reset()
+        idle = self._idle.setdefault(key, [])
+        self._idle.move_to_end(key)
+        if len(idle) < self.max_idle:
+            idle.append(agents)
+        while len(self._idle) > self.max_keys:
+            self._idle.popitem(last=False)
+
+    def clear(self) -> None:
+        self._idle.clear()
+
+    def stats(self) -> AgentPoolStats:
+        """Returns how often agent sets were built and reused."""
+        idle = sum(len(sets) for sets in self._idle.values())
+        return self._stats.model_copy(update={"idle": idle})
@@ -0,0 +1,152 @@
+import time
+from typing import Any
+import asyncio
+from contextlib import suppress
+from collections.abc import Callable, Iterable, Awaitable, AsyncIterable, AsyncIterator
+
+import logfire
+from pydantic import Field, BaseModel
+
+from src.utils.stats import percentile
+
+
+class RunOutcome(BaseModel):
+    index: int = Field(..., description="Position of the message in the submitted batch.")
+    message: str = Field(..., description="The submitted message.")
+    result: Any = Field(default=None, description="Return value of the run if it succeeded.")
+    error: str | None = Field(default=None, description="Error message if the run failed.")
+    latency: float = Field(..., description="Seconds the run took once it had started.")
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class BatchSummary(BaseModel):
+    total: int = Field(default=0, description="Number of runs that finished.")
+    succeeded: int = Field(default=0, description="Number of runs without an error.")
+    failed: int = Field(default=0, description="Number of runs that raised.")
+    wall_seconds: float = Field(default=0.0, description="Wall time of the whole batch.")
+    throughput: float = Field(default=0.0, description="Finished runs per second.")
+    latency_mean: float = Field(default=0.0, description="Mean run latency in seconds.")
+    latency_p50: float = Field(default=0.0, description="Median run latency in seconds.")
+    latency_p95: float = Field(default=0.0, description="95th percentile run latency in seconds.")
+    latency_max: float = Field(default=0.0, description="Slowest run latency in seconds.")
+
+    @classmethod
+    def from_outcomes(cls, outcomes: list[RunOutcome], wall_seconds: float) -> "BatchSummary":
+        latencies = [outcome.latency for outcome in outcomes]
+        failed = sum(1 for outcome in outcomes if not outcome.ok)
+        return cls(
+            total=len(outcomes),
+            succeeded=len(outcomes) - failed,
+            failed=failed,
+            wall_seconds=wall_seconds,
+            throughput=len(outcomes) / wall_seconds if wall_seconds > 0 else 0.0,
+            latency_mean=sum(latencies) / len(latencies) if latencies else 0.0,
+            latency_p50=percentile(latencies, 50),
+            latency_p95=percentile(latencies, 95),
+            latency_max=max(latencies, default=0.0),
+        )
+
+
+class BatchRun:
+    """Runs messages with at most `concurrency` in flight and yields outcomes as they finish.
+
+    A new run is only started once a slot is free, so a large (or lazy) message source
+    never floods the MCP servers. The batch summary is available as `summary` once the
+    iteration is exhausted.
+
+    Examples:
+        >>> async def echo(message: str) -> str:
+        ...     return message.upper()
+        >>> async def collect() -> list[str]:
+        ...     batch = BatchRun(echo, ["a", "b"], concurrency=2)
+        ...     return sorted([outcome.result async for outcome in batch])
+        >>> asyncio.run(collect())
+        ['A', 'B']
+    """
+
+    def __init__(
+        self,
+        runner: Callable[[str], Awaitable[Any]],
+        messages: Iterable[str] | AsyncIterable[str],
+        concurrency: int = 8,
+    ):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1.")
+        self.runner = runner
+        self.messages = messages
+        self.concurrency = concurrency
+        self.summary: BatchSummary | None = None
+
+    async def _iter_messages(self) -> AsyncIterator[str]:
+        if isinstance(self.messages, AsyncIterable):
+            async for message in self.messages:
+                yield message
+        else:
+            for message in self.messages:
+                yield message
+
+    async def _run_one(self, index: int, message: str) -> RunOutcome:
+        started = time.perf_counter()
+        try:
+            result = await self.runner(message)
+        except Exception as e:
+            return RunOutcome(
+                index=index,
+                message=message,
+                error=f"{type(e).__name__}: {e}",
+                latency=time.perf_counter() - started,
+            )
+        return RunOutcome(
+            index=index, message=message, result=result, latency=time.perf_counter() - started
+        )
+
+    async def __aiter__(self) -> AsyncIterator[RunOutcome]:
+        """Yields a `RunOutcome` per message in completion order."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        finished: asyncio.Queue[RunOutcome | BaseException | None] = asyncio.Queue()
+        tasks: set[asyncio.Task[None]] = set()
+
+        async def run_slot(index: int, message: str) -> None:
+            try:
+                await finished.put(await self._run_one(index, message))
+            finally:
+                semaphore.release()
+
+        async def produce() -> None:
+            try:
+                index = 0
+                async for message in self._iter_messages():
+                    await semaphore.acquire()
+                    task = asyncio.create_task(run_slot(index, message))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                    index += 1
+                if tasks:
+                    await asyncio.gather(*tasks)
+            except Exception as e:
+                await finished.put(e)
+            await finished.put(None)
+
+        started = time.perf_counter()
+        outcomes: list[RunOutcome] = []
+        producer = asyncio.create_task(produce())
+        try:
+            while (item := await finished.get()) is not None:
+                if isinstance(item, BaseException):
+                    raise item
+                outcomes.append(item)
+                yield item
+        finally:
+            producer.cancel()
+            for task in list(tasks):
+                task.cancel()
+            with suppress(asyncio.CancelledError):
+                await asyncio.gather(producer, *tasks, return_exceptions=True)
+            self.summary = BatchSummary.from_outcomes(outcomes, time.perf_counter() - started)
+            logfire.info(
+                "Batch finished: {succeeded}/{total} ok, {throughput} runs/s, p50 {latency_p50}s",
+                **self.summary.model_dump(),
+            )
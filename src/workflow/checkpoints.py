@@ -0,0 +1,193 @@
+import json
+import time
+import uuid
+from typing import Any, Literal
+import hashlib
+from pathlib import Path
+import sqlite3
+import threading
+from contextlib import contextmanager
+from collections import deque
+from contextvars import ContextVar
+from collections.abc import Iterator
+
+from pydantic import Field, BaseModel
+
+CheckpointStatus = Literal["running", "failed", "succeeded"]
+
+
+class RunCheckpoint(BaseModel):
+    run_id: str = Field(..., description="Identifier passed to `MCPAgent.a_resume`.")
+    message: str = Field(..., description="The user request of the run.")
+    status: CheckpointStatus = Field(default="running", description="Where the run ended up.")
+    route: Literal["direct", "plan"] | None = Field(
+        default=None, description="Workflow picked by the router, once it answered."
+    )
+    plan: str | None = Field(default=None, description="Plan handed to the execution stage.")
+    plan_messages: list[dict[str, Any]] = Field(
+        default_factory=list, description="Chat history of the planning stage."
+    )
+    messages: list[dict[str, Any]] = Field(
+        default_factory=list, description="Chat history of the execution stage once it finished."
+    )
+    summary: str | None = Field(default=None, description="Summary of the execution stage.")
+    error: str | None = Field(default=None, description="Error of the last failed attempt.")
+    attempts: int = Field(default=0, description="Times the run was started or resumed.")
+    tool_calls: int = Field(default=0, description="Completed tool calls stored for replay.")
+    updated_at: float = Field(default_factory=time.time, description="Unix time of last save.")
+
+
+def call_key(name: str, arguments: dict[str, Any]) -> str:
+    """Identifies a tool call by the tool and its arguments, regardless of their order."""
+    canonical = json.dumps(arguments, sort_keys=True, default=str)
+    return hashlib.sha256(f"{name}\0{canonical}".encode()).hexdigest()
+
+
+class CheckpointStore:
+    """SQLite store of per-stage run checkpoints and the tool calls each run completed.
+
+    A run is saved after every stage, and every tool call is saved as soon as it returns,
+    so a run that fails partway keeps its route, its plan and the results of the tools it
+    already called. Checkpoints older than `max_age` seconds are pruned on open.
+
+    Examples:
+        >>> store = CheckpointStore(":memory:")
+        >>> checkpoint = store.create("List my repositories")
+        >>> result = {"content": [{"type": "text", "text": "repo-a"}], "isError": False}
+        >>> store.record_tool_call(checkpoint.run_id, "list_repos", {}, result)
+        >>> store.tool_results(checkpoint.run_id)[call_key("list_repos", {})]
+        deque([{'content': [{'type': 'text', 'text': 'repo-a'}], 'isError': False}])
+    """
+
+    def __init__(
+        self, path: str | Path = ".cache/checkpoints.sqlite", max_age: float | None = 7 * 86400
+    ):
+        if str(path) != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            "run_id TEXT PRIMARY KEY, checkpoint TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tool_calls ("
+            "run_id TEXT NOT NULL, seq INTEGER NOT NULL, key TEXT NOT NULL, "
+            "result TEXT NOT NULL, PRIMARY KEY (run_id, seq))"
+        )
+        if max_age is not None:
+            self._prune(time.time() - max_age)
+        self._conn.commit()
+
+    def create(self, message: str, run_id: str | None = None) -> RunCheckpoint:
+        checkpoint = RunCheckpoint(run_id=run_id or uuid.uuid4().hex, message=message)
+        self.save(checkpoint)
+        return checkpoint
+
+    def save(self, checkpoint: RunCheckpoint) -> None:
+        checkpoint.updated_at = time.time()
+        data = json.dumps(checkpoint.model_dump(), default=str)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO runs (run_id, checkpoint, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (run_id) DO UPDATE SET "
+                "checkpoint = excluded.checkpoint, updated_at = excluded.updated_at",
+                (checkpoint.run_id, data, checkpoint.updated_at),
+            )
+            self._conn.commit()
+
+    def load(self, run_id: str) -> RunCheckpoint | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT checkpoint FROM runs WHERE run_id = ?", (run_id,)
+            ).fetchone()
+            (calls,) = self._conn.execute(
+                "SELECT COUNT(*) FROM tool_calls WHERE run_id = ?", (run_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return RunCheckpoint.model_validate_json(row[0]).model_copy(update={"tool_calls": calls})
+
+    def record_tool_call(
+        self,
+        run_id: str,
+        name: str,
+        arguments: dict[str, Any],
+        result: Any,  # noqa: ANN401
+    ) -> None:
+        """Stores a completed call, `result` must be JSON, such as `model_dump(mode="json")`."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO tool_calls (run_id, seq, key, result) VALUES (?, "
+                "(SELECT COALESCE(MAX(seq), 0) + 1 FROM tool_calls WHERE run_id = ?), ?, ?)",
+                (run_id, run_id, call_key(name, arguments), json.dumps(result)),
+            )
+            self._conn.commit()
+
+    def tool_results(self, run_id: str) -> dict[str, deque[Any]]:
+        """Returns the stored results of a run by `call_key`, in the order they were made."""
+        results: dict[str, deque[Any]] = {}
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, result FROM tool_calls WHERE run_id = ? ORDER BY seq", (run_id,)
+            ).fetchall()
+        for key, result in rows:
+            results.setdefault(key, deque()).append(json.loads(result))
+        return results
+
+    def delete(self, run_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+            self._conn.execute("DELETE FROM tool_calls WHERE run_id = ?", (run_id,))
+            self._conn.commit()
+
+    def _prune(self, before: float) -> None:
+        self._conn.execute(
+            "DELETE FROM tool_calls WHERE run_id IN (SELECT run_id FROM runs WHERE updated_at < ?)",
+            (before,),
+        )
+        self._conn.execute("DELETE FROM runs WHERE updated_at < ?", (before,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ToolReplay:
+    """Serves the tool calls a run already completed and records the ones it makes now.
+
+    A call with the same tool and arguments as a stored one gets the stored result instead
+    of reaching the MCP server again; each stored result is served once.
+    """
+
+    def __init__(self, store: CheckpointStore, run_id: str):
+        self.store = store
+        self.run_id = run_id
+        self.replayed = 0
+        self._results = store.tool_results(run_id)
+
+    def lookup(self, name: str, arguments: dict[str, Any]) -> Any | None:  # noqa: ANN401
+        stored = self._results.get(call_key(name, arguments))
+        if not stored:
+            return None
+        self.replayed += 1
+        return stored.popleft()
+
+    def record(self, name: str, arguments: dict[str, Any], result: Any) -> None:  # noqa: ANN401
+        self.store.record_tool_call(self.run_id, name, arguments, result)
+
+
+# Replay of the run whose chat is executing, AG2 runs each chat in a task copied from here
+active_replay: ContextVar[ToolReplay | None] = ContextVar("active_replay", default=None)
+
+
+@contextmanager
+def replaying(replay: ToolReplay | None) -> Iterator[None]:
+    """Makes `replay` serve the tool calls of chats started inside the block."""
+    token = active_replay.set(replay)
+    try:
+        yield
+    finally:
+        active_replay.reset(token)
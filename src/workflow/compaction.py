@@ -0,0 +1,162 @@
+from typing import Any
+from collections.abc import Iterable
+
+from autogen import ConversableAgent
+from pydantic import Field, BaseModel
+from autogen.agentchat.contrib.capabilities.transform_messages import TransformMessages
+
+# Rough prompt size of text, the same four characters per token as the tool selection
+CHARS_PER_TOKEN = 4
+
+
+def count_tokens(content: Any) -> int:  # noqa: ANN401
+    """Estimates the tokens of a message content, which may also be a list of parts."""
+    if content is None:
+        return 0
+    text = content if isinstance(content, str) else str(content)
+    return len(text) // CHARS_PER_TOKEN
+
+
+def history_tokens(messages: Iterable[dict[str, Any]]) -> int:
+    return sum(
+        count_tokens(message.get("content")) + count_tokens(message.get("tool_calls"))
+        for message in messages
+    )
+
+
+def truncate_text(text: str, max_tokens: int) -> str:
+    r"""Keeps the head and tail of `text` within `max_tokens` and marks what was cut.
+
+    Examples:
+        >>> truncate_text("a" * 10 + "b" * 10, max_tokens=2)
+        'aaaa\n[... 12 characters omitted ...]\nbbbb'
+        >>> truncate_text("short", max_tokens=2)
+        'short'
+    """
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    head = limit // 2
+    tail = limit - head
+    omitted = len(text) - head - tail
+    return f"{text[:head]}\n[... {omitted} characters omitted ...]\n{text[-tail:]}"
+
+
+class ContextBudget(BaseModel):
+    history_tokens: int = Field(
+        default=16_000,
+        ge=0,
+        description="Tokens of chat history sent per LLM call, older turns are dropped beyond it.",
+        examples=[8_000, 16_000, 64_000],
+    )
+    tool_output_tokens: int = Field(
+        default=2_000,
+        ge=0,
+        description="Tokens kept of each tool result, the middle of longer results is cut.",
+        examples=[1_000, 2_000],
+    )
+    plan_tokens: int = Field(
+        default=4_000,
+        ge=0,
+        description="Tokens of the plan handed from the planning to the execution stage.",
+        examples=[2_000, 4_000],
+    )
+
+
+class TruncateToolOutputs:
+    """Message transform that cuts oversized tool results down to `max_tokens`."""
+
+    def __init__(self, max_tokens: int):
+        self.max_tokens = max_tokens
+
+    def _truncate(self, message: dict[str, Any]) -> dict[str, Any]:
+        content = message.get("content")
+        if isinstance(content, str) and count_tokens(content) > self.max_tokens:
+            message = {**message, "content": truncate_text(content, self.max_tokens)}
+        if message.get("tool_responses"):
+            responses = [self._truncate(response) for response in message["tool_responses"]]
+            message = {**message, "tool_responses": responses}
+        return message
+
+    def apply_transform(self, messages: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        return [
+            self._truncate(message) if message.get("role") == "tool" else message
+            for message in messages
+        ]
+
+    def get_logs(
+        self,
+        pre_transform_messages: list[dict[str, Any]],
+        post_transform_messages: list[dict[str, Any]],
+    ) -> tuple[str, bool]:
+        saved = history_tokens(pre_transform_messages) - history_tokens(post_transform_messages)
+        return f"Truncated tool outputs by {saved} tokens.", saved > 0
+
+
+class DropStaleTurns:
+    """Message transform that keeps the first message and the latest turns within `max_tokens`.
+
+    The first message is the task itself. A kept history never starts with a tool result,
+    its tool call is kept as well even if that exceeds the budget.
+    """
+
+    def __init__(self, max_tokens: int):
+        self.max_tokens = max_tokens
+
+    def apply_transform(self, messages: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        if len(messages) <= 1:
+            return messages
+        first, rest = messages[0], messages[1:]
+        budget = self.max_tokens - history_tokens([first])
+        start = len(rest)
+        while start > 0 and history_tokens(rest[start - 1 : start]) <= budget:
+            budget -= history_tokens(rest[start - 1 : start])
+            start -= 1
+        # Always keep the latest message, and never cut between a tool call and its results
+        start = min(start, len(rest) - 1)
+        while start > 0 and rest[start].get("role") == "tool":
+            start -= 1
+        return [first, *rest[start:]]
+
+    def get_logs(
+        self,
+        pre_transform_messages: list[dict[str, Any]],
+        post_transform_messages: list[dict[str, Any]],
+    ) -> tuple[str, bool]:
+        dropped = len(pre_transform_messages) - len(post_transform_messages)
+        return f"Dropped {dropped} stale messages.", dropped > 0
+
+
+def add_compaction(budget: ContextBudget | None, *agents: ConversableAgent) -> None:
+    """Bounds the prompt of every LLM call of `agents` by `budget`, `None` leaves them as is.
+
+    The stored chat history is untouched, only what is sent to the LLM is compacted.
+    """
+    if budget is None:
+        return
+    for agent in agents:
+        TransformMessages(
+            transforms=[
+                TruncateToolOutputs(budget.tool_output_tokens),
+                DropStaleTurns(budget.history_tokens),
+            ],
+            verbose=False,
+        ).add_to_agent(agent)
+
+
+def extract_plan(messages: list[dict[str, Any]], budget: ContextBudget | None, author: str) -> str:
+    """Returns the last substantive message of `author`, without the transcript around it.
+
+    Falls back to the last substantive message of anyone. With a `budget`, the plan is cut
+    to `plan_tokens`.
+    """
+    replies = [
+        (message.get("name"), (message.get("content") or "").replace("TERMINATE", "").strip())
+        for message in messages
+        if isinstance(message.get("content"), str)
+    ]
+    replies = [(name, content) for name, content in replies if content]
+    plan = next((content for name, content in reversed(replies) if name == author), None)
+    if plan is None:
+        plan = replies[-1][1] if replies else ""
+    return plan if budget is None else truncate_text(plan, budget.plan_tokens)
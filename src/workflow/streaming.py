@@ -0,0 +1,174 @@
+import time
+from typing import Any
+import asyncio
+from collections.abc import AsyncIterator
+
+from autogen import OpenAIWrapper, ConversableAgent
+from autogen.io.base import IOStream
+from autogen.io.run_response import AsyncRunResponse, AsyncRunResponseProtocol
+from autogen.events.base_event import BaseEvent
+from autogen.events.agent_events import (
+    ErrorEvent,
+    TerminationEvent,
+    InputRequestEvent,
+    RunCompletionEvent,
+    ExecuteFunctionEvent,
+    ExecutedFunctionEvent,
+    BasePrintReceivedEvent,
+)
+from autogen.io.thread_io_stream import AsyncThreadIOStream
+from autogen.events.client_events import StreamEvent
+from autogen.io.processors.console_event_processor import AsyncConsoleEventProcessor
+
+from src.types.events import (
+    RunEvent,
+    AgentTurn,
+    Terminated,
+    TokenDelta,
+    ToolCallStarted,
+    ToolCallFinished,
+)
+
+
+def enable_streaming(*agents: ConversableAgent) -> None:
+    """Rebuilds the LLM clients of `agents` with `stream=True` so AG2 emits token deltas.
+
+    `LLMConfig` rejects a `stream` key, but `OpenAIWrapper` forwards it to every create call.
+    """
+    for agent in agents:
+        if agent.llm_config:
+            agent.client = OpenAIWrapper(**agent.llm_config, stream=True)
+
+
+class ChatRun:
+    """An AG2 chat like `ConversableAgent.a_run` with a recipient, in a task the caller owns.
+
+    `a_run` starts the chat in a task nobody keeps, so cancelling the consumer of its events
+    leaves the chat running, tool calls included. Here the task starts when the `ChatRun`
+    is created, with the context of the caller, and is cancelled and awaited when the
+    `async with` block exits.
+
+    Examples:
+        ```python
+        async with ChatRun(user, assistant, message="List my repositories") as response:
+            async for event in stream_response(response, stage="execute"):
+                ...
+        ```
+    """
+
+    def __init__(self, sender: ConversableAgent, recipient: ConversableAgent, **kwargs: Any):  # noqa: ANN401
+        self.sender = sender
+        self.recipient = recipient
+        iostream = AsyncThreadIOStream()
+        self.response = AsyncRunResponse(iostream, agents=[sender, recipient])
+        self.task = asyncio.create_task(self._initiate_chat(iostream, **kwargs))
+
+    async def _initiate_chat(self, iostream: AsyncThreadIOStream, **kwargs: Any) -> None:  # noqa: ANN401
+        with IOStream.set_default(iostream):
+            try:
+                chat_result = await self.sender.a_initiate_chat(self.recipient, **kwargs)
+                last_speaker = getattr(self.recipient, "last_speaker", None) or (
+                    self.recipient
+                    if chat_result.chat_history[-1]["name"] == self.recipient.name
+                    else self.sender
+                )
+                iostream.send(
+                    RunCompletionEvent(
+                        history=chat_result.chat_history,
+                        summary=chat_result.summary,
+                        cost=chat_result.cost,
+                        last_speaker=last_speaker.name,
+                    )
+                )
+            except Exception as e:
+                iostream.send(ErrorEvent(error=e))
+
+    async def __aenter__(self) -> AsyncRunResponseProtocol:
+        """Returns the response whose events and results the chat reports."""
+        return self.response
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        """Stops the chat if it is still running, see `aclose`."""
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Cancels the chat and waits until it stopped, so no tool call happens afterwards."""
+        self.task.cancel()
+        # `wait` does not raise the chat's cancellation, only a cancellation of the caller
+        await asyncio.wait([self.task])
+
+
+class EventTranslator:
+    """Turns the raw AG2 events of one stage into `RunEvent`s."""
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self._speaker: str | None = None
+        self._started: dict[str, float] = {}
+
+    def translate(self, event: BaseEvent) -> list[RunEvent]:
+        content = getattr(event, "content", None)
+        if isinstance(event, StreamEvent):
+            return [TokenDelta(stage=self.stage, agent=self._speaker, content=content.content)]
+        if isinstance(content, BasePrintReceivedEvent):
+            # The recipient of a message is the agent that speaks next
+            self._speaker = content.recipient
+            tool_calls = getattr(content, "tool_calls", None) or []
+            return [
+                AgentTurn(
+                    stage=self.stage,
+                    sender=content.sender,
+                    recipient=content.recipient,
+                    content=content.content,
+                    tool_calls=[tool_call.function.name or "" for tool_call in tool_calls],
+                )
+            ]
+        if isinstance(event, ExecuteFunctionEvent):
+            self._started[content.call_id or content.func_name] = time.perf_counter()
+            return [
+                ToolCallStarted(
+                    stage=self.stage,
+                    call_id=content.call_id,
+                    name=content.func_name,
+                    arguments=content.arguments,
+                )
+            ]
+        if isinstance(event, ExecutedFunctionEvent):
+            started = self._started.pop(content.call_id or content.func_name, time.perf_counter())
+            return [
+                ToolCallFinished(
+                    stage=self.stage,
+                    call_id=content.call_id,
+                    name=content.func_name,
+                    success=content.is_exec_success,
+                    content=content.content,
+                    duration=time.perf_counter() - started,
+                )
+            ]
+        if isinstance(event, TerminationEvent):
+            return [Terminated(stage=self.stage, reason=content.termination_reason)]
+        return []
+
+
+async def stream_response(
+    response: AsyncRunResponseProtocol, stage: str, echo: bool = False
+) -> AsyncIterator[RunEvent]:
+    """Yields the events of an AG2 run as they happen.
+
+    With `echo`, every raw event is also printed to the console and input requests are
+    answered from stdin, exactly like `response.process()`. Without it, input requests are
+    answered with `exit` since nobody is there to reply.
+    """
+    console = AsyncConsoleEventProcessor() if echo else None
+    translator = EventTranslator(stage=stage)
+    async for event in response.events:
+        if isinstance(event, InputRequestEvent):
+            if console is not None:
+                await console.process_event(event)
+            else:
+                await event.content.respond("exit")
+            continue
+        if console is not None:
+            await console.process_event(event)
+        for translated in translator.translate(event):
+            yield translated
@@ -0,0 +1,56 @@
+import sys
+import socket
+from contextlib import ExitStack
+from collections.abc import Callable, Iterator
+
+from mcp import StdioServerParameters
+import psutil
+import pytest
+from benchmarks.harness import ROOT, spawn
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def kill_stub_servers() -> int:
+    """Kills the stub MCP servers started by this process, as if they crashed."""
+    killed = 0
+    for child in psutil.Process().children(recursive=True):
+        if any("stub_mcp_server.py" in arg for arg in child.cmdline()):
+            child.kill()
+            killed += 1
+    return killed
+
+
+@pytest.fixture
+def stub_server() -> Callable[..., StdioServerParameters]:
+    """Builds parameters of a stdio `stub_mcp_server.py` with the given options."""
+
+    def build(
+        tools: int = 3, latency: float = 0.0, payload: int = 16, dynamic: bool = False
+    ) -> StdioServerParameters:
+        args = [f"--tools={tools}", f"--latency={latency}", f"--payload={payload}"]
+        if dynamic:
+            args.append("--dynamic")
+        return StdioServerParameters(
+            command=sys.executable, args=[str(ROOT / "stub_mcp_server.py"), *args]
+        )
+
+    return build
+
+
+@pytest.fixture
+def fake_llm() -> Iterator[Callable[..., str]]:
+    """Starts `fake_llm.py` with the given options and returns its base URL."""
+    with ExitStack() as stack:
+
+        def start(latency: float = 0.0, tool_calls: int = 1) -> str:
+            port = free_port()
+            args = [f"--port={port}", f"--latency={latency}", f"--tool-calls={tool_calls}"]
+            stack.enter_context(spawn([str(ROOT / "fake_llm.py"), *args], port))
+            return f"http://127.0.0.1:{port}/v1"
+
+        yield start
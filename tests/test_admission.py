@@ -0,0 +1,114 @@
+import asyncio
+from datetime import datetime, timezone
+from collections.abc import AsyncIterator
+
+import pytest
+from starlette.requests import ClientDisconnect
+from starlette.testclient import TestClient
+
+from src.server.app import RunManager, RunRequest, RunEventsResponse, create_app
+from src.types.events import RunEvent, RunFinished, StageStarted
+from src.server.admission import AdmissionError, AdmissionControl
+
+
+class BlockedAgent:
+    """Agent whose runs never finish, so admitted runs keep their slot."""
+
+    async def a_stream(
+        self, message: str, planning: bool = False, conversation_id: str | None = None
+    ) -> AsyncIterator[RunEvent]:
+        await asyncio.Event().wait()
+        yield
+
+    async def aclose(self) -> None:
+        pass
+
+
+async def test_admit_rejects_beyond_queue_and_tenant_limits():
+    admission = AdmissionControl(max_running=1, max_queued=1, max_per_tenant=1)
+    first = admission.admit("acme")
+    with pytest.raises(AdmissionError, match="Tenant acme"):
+        admission.admit("acme")
+    second = admission.admit("globex")
+    with pytest.raises(AdmissionError, match="saturated"):
+        admission.admit("initech")
+
+    async with first:
+        assert (admission.stats().running, admission.stats().queued) == (1, 1)
+    second.close()
+
+    stats = admission.stats()
+    assert (stats.admitted, stats.rejected, stats.queued, stats.running) == (2, 2, 0, 0)
+    assert stats.tenants == {}
+
+
+def test_saturated_server_answers_429():
+    admission = AdmissionControl(max_running=1, max_queued=0, max_per_tenant=1)
+    with TestClient(create_app(BlockedAgent, admission=admission)) as client:
+        accepted = client.post("/runs", json={"message": "hi"}, headers={"X-Tenant-ID": "a"})
+        rejected = client.post("/runs", json={"message": "hi"}, headers={"X-Tenant-ID": "a"})
+        health = client.get("/health").json()
+
+    assert accepted.status_code == 202
+    assert rejected.status_code == 429
+    assert rejected.headers["Retry-After"] == "1"
+    assert (health["admitted"], health["rejected"]) == (1, 1)
+
+
+class ChattyAgent:
+    """Agent that reports `count` stages and then finishes with a timestamped message."""
+
+    def __init__(self, count: int = 3):
+        self.count = count
+
+    async def a_stream(
+        self, message: str, planning: bool = False, conversation_id: str | None = None
+    ) -> AsyncIterator[RunEvent]:
+        for index in range(self.count):
+            yield StageStarted(stage=f"stage {index}")
+        sent_at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        yield RunFinished(messages=[{"content": message, "sent_at": sent_at}], duration=0.1)
+
+    async def aclose(self) -> None:
+        pass
+
+
+def test_records_are_answered_as_json():
+    with TestClient(create_app(ChattyAgent)) as client:
+        record = client.post("/runs", json={"message": "hi", "wait": True}).json()
+        streamed = client.post("/runs", json={"message": "hi", "stream": True})
+
+    assert record["status"] == "succeeded"
+    assert record["messages"] == [{"content": "hi", "sent_at": "2026-01-01T00:00:00Z"}]
+    events = [line for line in streamed.text.splitlines() if line.startswith("data: ")]
+    assert len(events) == 4
+
+
+async def test_streamed_runs_wait_for_a_slow_client():
+    runs = RunManager(ChattyAgent(count=10), AdmissionControl(), max_buffered_events=2)
+    record = runs.submit("acme", RunRequest(message="hi", stream=True))
+    await asyncio.sleep(0.1)
+    assert record.status == "running"
+    assert runs._events[record.run_id].qsize() == 2  # noqa: SLF001
+
+    events = [event async for event in runs.events(record.run_id)]
+    assert len(events) == 11
+    assert (await runs.wait(record.run_id)).status == "succeeded"
+
+
+async def test_client_leaving_before_the_stream_starts_cancels_the_run():
+    runs = RunManager(BlockedAgent(), AdmissionControl())
+    record = runs.submit("acme", RunRequest(message="hi", stream=True))
+
+    async def receive() -> dict:
+        return {"type": "http.disconnect"}
+
+    async def send(message: dict) -> None:
+        raise OSError("client is gone")
+
+    scope = {"type": "http", "asgi": {"spec_version": "2.4"}}
+    with pytest.raises(ClientDisconnect):
+        await RunEventsResponse(runs, record.run_id)(scope, receive, send)
+
+    assert (await runs.wait(record.run_id)).status == "cancelled"
+    assert runs.admission.stats().running == 0
@@ -0,0 +1,66 @@
+from main import MCPAgent
+import pytest
+from autogen import ConversableAgent
+
+from src.workflow.agents import AgentSet, AgentPool
+
+
+def build() -> AgentSet:
+    return AgentSet(user=ConversableAgent("user", llm_config=False))
+
+
+def chat(agents: AgentSet) -> None:
+    agents["user"].chat_messages[agents["user"]].append({"content": "hi"})
+
+
+def test_leased_sets_are_reset_and_reused():
+    pool = AgentPool()
+    with pool.lease("key", build) as first:
+        chat(first)
+    with pool.lease("key", build) as second:
+        assert second is first
+        assert not second["user"].chat_messages
+    with pool.lease("other", build) as third:
+        assert third is not first
+
+    stats = pool.stats()
+    assert (stats.built, stats.reused, stats.discarded, stats.idle) == (2, 1, 0, 2)
+
+
+def test_dirty_and_failed_sets_are_discarded():
+    pool = AgentPool()
+    with pool.lease("key", build) as agents:
+        agents.dirty = True
+    with pytest.raises(RuntimeError), pool.lease("key", build):
+        raise RuntimeError("run failed")
+    with pool.lease("key", build) as fresh:
+        assert not fresh.dirty
+
+    stats = pool.stats()
+    assert (stats.built, stats.reused, stats.discarded, stats.idle) == (3, 0, 2, 1)
+
+
+def test_idle_sets_are_bounded_per_key_and_by_key_count():
+    pool = AgentPool(max_idle=1, max_keys=2)
+    with pool.lease("a", build), pool.lease("a", build):
+        pass
+    assert pool.stats().idle == 1
+
+    for key in ("b", "c"):
+        with pool.lease(key, build):
+            pass
+    with pool.lease("a", build):
+        pass
+    assert pool.stats().reused == 0
+
+
+async def test_runs_reuse_the_agents_of_the_previous_run(stub_server, fake_llm):
+    async with MCPAgent(
+        model="fake", api_key="k", base_url=fake_llm(), params=stub_server()
+    ) as agent:
+        for _ in range(2):
+            events = [event async for event in agent._simple_workflow("list", echo=False)]  # noqa: SLF001
+            assert events[-1].summary == "Done. "
+
+        stats = agent.agent_pool.stats()
+        assert (stats.built, stats.reused, stats.idle) == (1, 1, 1)
@@ -0,0 +1,87 @@
+import asyncio
+
+from main import MCPAgent
+import pytest
+
+from src.workflow.batch import BatchRun
+
+
+async def test_runs_are_bounded_and_failures_are_reported():
+    running, peak = 0, 0
+
+    async def runner(message: str) -> str:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        if message == "bad":
+            raise RuntimeError("tool failed")
+        return message.upper()
+
+    async def messages():
+        for message in ["a", "bad", "c", "d", "e"]:
+            yield message
+
+    batch = BatchRun(runner, messages(), concurrency=2)
+    outcomes = sorted([outcome async for outcome in batch], key=lambda outcome: outcome.index)
+
+    assert peak == 2
+    assert [outcome.result for outcome in outcomes] == ["A", None, "C", "D", "E"]
+    assert outcomes[1].error == "RuntimeError: tool failed"
+    assert not outcomes[1].ok
+    summary = batch.summary
+    assert (summary.total, summary.succeeded, summary.failed) == (5, 4, 1)
+    assert summary.latency_max >= summary.latency_p50 > 0
+
+
+async def test_failing_message_source_stops_the_batch():
+    def messages():
+        yield "a"
+        raise OSError("disk gone")
+
+    async def runner(message: str) -> str:
+        return message
+
+    with pytest.raises(OSError, match="disk gone"):
+        async for _ in BatchRun(runner, messages()):
+            pass
+
+
+async def test_leaving_early_cancels_the_runs_in_flight():
+    cancelled = 0
+
+    async def runner(message: str) -> str:
+        nonlocal cancelled
+        if message == "fast":
+            return message
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled += 1
+            raise
+        return message
+
+    batch = BatchRun(runner, ["slow", "fast", "slow"], concurrency=3)
+    outcomes = batch.__aiter__()
+    assert (await outcomes.__anext__()).result == "fast"
+    await outcomes.aclose()
+
+    assert cancelled == 2
+    assert batch.summary.total == 1
+
+
+def test_concurrency_must_be_positive():
+    with pytest.raises(ValueError, match="at least 1"):
+        BatchRun(str, [], concurrency=0)
+
+
+async def test_agent_batches_run_without_echoing(stub_server, fake_llm, capsys):
+    async with MCPAgent(
+        model="fake", api_key="k", base_url=fake_llm(), params=stub_server()
+    ) as agent:
+        outcomes = [outcome async for outcome in agent.a_run_many(["a", "b", "c"], concurrency=3)]
+
+    assert all(outcome.ok for outcome in outcomes)
+    assert all(outcome.result[-1]["content"] == "Done. TERMINATE" for outcome in outcomes)
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,39 @@
+import asyncio
+
+from main import MCPAgent
+
+from src.sessions.pool import SessionPool
+
+
+def collect_run(agent: MCPAgent, message: str):
+    # The non-streaming workflow, streaming counts tokens with tiktoken
+    return agent._collect(agent._simple_workflow(message, echo=False))  # noqa: SLF001
+
+
+async def test_no_tool_is_called_after_a_run_is_cancelled(monkeypatch, stub_server, fake_llm):
+    calls: list[float] = []
+    call_tool = SessionPool.call_tool
+
+    async def counting_call_tool(self, *args, **kwargs):
+        calls.append(asyncio.get_running_loop().time())
+        return await call_tool(self, *args, **kwargs)
+
+    monkeypatch.setattr(SessionPool, "call_tool", counting_call_tool)
+    base_url = fake_llm(latency=0.5, tool_calls=2)
+    async with MCPAgent(
+        model="fake", api_key="k", base_url=base_url, params=stub_server()
+    ) as agent:
+        await agent.session_pool.warmup(stub_server())
+        # A run that is not cancelled calls the tools
+        await collect_run(agent, "list")
+        assert len(calls) == 2
+
+        calls.clear()
+        task = asyncio.create_task(collect_run(agent, "list"))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        assert task.cancelled()
+        # The LLM reply with the tool calls would have arrived by now
+        await asyncio.sleep(1.5)
+        assert calls == []
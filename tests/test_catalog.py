@@ -0,0 +1,127 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from src.sessions.pool import SessionPool
+from src.tools.catalog import ToolCatalog
+from src.sessions.connection import server_key
+
+
+@pytest.fixture
+async def pool():
+    pool = SessionPool()
+    yield pool
+    await pool.aclose()
+
+
+async def test_stats_keep_servers_with_the_same_name_apart(stub_server, pool):
+    small, large = stub_server(tools=1), stub_server(tools=5)
+    catalog = ToolCatalog()
+    assert len((await catalog.get(small, pool)).tools) == 1
+    assert len((await catalog.get(large, pool)).tools) == 5
+    await catalog.get(large, pool)
+    catalog.invalidate(small)
+
+    stats = catalog.stats()
+    assert set(stats) == {server_key(small), server_key(large)}
+    assert (stats[server_key(small)].misses, stats[server_key(small)].invalidations) == (1, 1)
+    assert (stats[server_key(large)].misses, stats[server_key(large)].hits) == (1, 1)
+
+
+async def test_entries_expire_after_the_ttl(stub_server, pool):
+    params, catalog = stub_server(), ToolCatalog(ttl=0.2)
+    first = await catalog.get(params, pool)
+    assert await catalog.get(params, pool) is first
+
+    await asyncio.sleep(0.3)
+    reloaded = await catalog.get(params, pool)
+    assert reloaded is not first
+    assert reloaded.version == first.version + 1
+    stats = catalog.stats()[server_key(params)]
+    assert (stats.hits, stats.misses, stats.expirations) == (1, 2, 1)
+
+
+async def test_list_changed_notification_reloads_the_tools(stub_server, pool):
+    params, catalog = stub_server(tools=1, dynamic=True), ToolCatalog(ttl=None)
+    entry = await catalog.get(params, pool)
+    assert [tool.name for tool in entry.tools] == ["tool_0", "add_tool"]
+
+    add_tool = next(tool for tool in entry.toolkit.tools if tool.name == "add_tool")
+    assert await add_tool.func(name="fresh") == ("added fresh", None)
+    for _ in range(100):
+        if catalog.stats()[server_key(params)].invalidations:
+            break
+        await asyncio.sleep(0.05)
+
+    reloaded = await catalog.get(params, pool)
+    assert "fresh" in [tool.name for tool in reloaded.tools]
+    assert catalog.stats()[server_key(params)].invalidations == 1
+
+
+async def test_resource_templates_are_not_exposed_as_tools(stub_server, pool):
+    params = stub_server(tools=1, dynamic=True)
+    async with pool.session(params) as session:
+        templates = (await session.list_resource_templates()).resourceTemplates
+    assert [template.name for template in templates] == ["item"]
+
+    entry = await ToolCatalog().get(params, pool)
+    assert sorted(tool.name for tool in entry.toolkit.tools) == ["add_tool", "tool_0"]
+    assert "item" not in entry.detail
+
+
+async def test_failed_server_is_retried_after_a_delay(stub_server, pool, tmp_path):
+    # The server script only appears after the first attempt, like a server coming back up
+    stub = stub_server()
+    script = tmp_path / "server.py"
+    params = stub.model_copy(update={"args": [str(script), *stub.args[1:]]})
+    catalog = ToolCatalog(retry_failed_after=0.5)
+
+    with pytest.raises(RuntimeError, match="No MCP server could be started"):
+        await catalog.get_many({"stub": params}, pool)
+    script.write_text(Path(stub.args[0]).read_text())
+    # Within `retry_failed_after` the failure is reported without starting the server again
+    with pytest.raises(RuntimeError, match="No MCP server could be started"):
+        await catalog.get_many({"stub": params}, pool)
+    assert pool.stats()[server_key(params)].failures == 1
+
+    await asyncio.sleep(0.5)
+    merged = await catalog.get_many({"stub": params}, pool)
+    assert not merged.failed
+    assert len(merged.toolkit.tools) == 3
+
+
+def broken_server(stub, tmp_path):
+    return stub.model_copy(update={"args": [str(tmp_path / "missing.py")]})
+
+
+async def test_merged_tools_are_prefixed_and_routed_to_their_server(stub_server, pool, tmp_path):
+    servers = {
+        "alpha": stub_server(tools=2, payload=4),
+        "beta": stub_server(tools=1, payload=8),
+        "broken": broken_server(stub_server(), tmp_path),
+    }
+    merged = await ToolCatalog().get_many(servers, pool)
+
+    tools = {tool.name: tool for tool in merged.toolkit.tools}
+    assert sorted(tools) == ["alpha__tool_0", "alpha__tool_1", "beta__tool_0"]
+    assert merged.routes["beta__tool_0"] == "beta"
+    assert await tools["alpha__tool_0"].func() == ("xxxx", None)
+    assert await tools["beta__tool_0"].func() == ("x" * 8, None)
+    # A server that does not start is reported instead of failing the merge
+    assert set(merged.failed) == {"broken"}
+    assert "### Server `broken` is unavailable" in merged.detail
+
+
+async def test_merged_tool_names_fit_the_openai_limit(stub_server, pool):
+    long_name = "an-mcp-server-with-a-really-long-name-taken-from-its-package-name"
+    servers = {long_name: stub_server(tools=2, payload=4), "short": stub_server(tools=1)}
+    merged = await ToolCatalog().get_many(servers, pool)
+
+    names = [tool.name for tool in merged.toolkit.tools]
+    assert all(len(name) <= 64 for name in names)
+    assert len(set(names)) == 3
+    assert "short__tool_0" in names
+    long_tool = next(tool for tool in merged.toolkit.tools if tool.name.startswith("an-mcp"))
+    assert merged.routes[long_tool.name] == long_name
+    assert await long_tool.func() == ("xxxx", None)
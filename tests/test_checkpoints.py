@@ -0,0 +1,114 @@
+import asyncio
+import sqlite3
+
+from mcp import StdioServerParameters
+from main import MCPAgent
+import pytest
+from mcp.types import Tool, TextContent, ImageContent, CallToolResult
+
+from src.sessions.pool import SessionPool
+from src.tools.catalog import build_tool
+from src.workflow.checkpoints import ToolReplay, CheckpointStore, replaying
+
+PNG = "iVBORw0KGgo="
+
+
+class ScreenshotPool:
+    def __init__(self):
+        self.calls = 0
+
+    async def call_tool(self, params, name, arguments):
+        self.calls += 1
+        return CallToolResult(
+            content=[
+                TextContent(type="text", text=f"{name} of {arguments['url']}"),
+                ImageContent(type="image", data=PNG, mimeType="image/png"),
+            ]
+        )
+
+
+async def test_replayed_results_keep_their_content_types():
+    pool, store = ScreenshotPool(), CheckpointStore(":memory:")
+    tool = build_tool(
+        pool,
+        StdioServerParameters(command="browser"),
+        Tool(name="screenshot", inputSchema={"type": "object"}),
+    )
+    run_id = store.create("Take a screenshot").run_id
+
+    with replaying(ToolReplay(store, run_id)):
+        called = await tool.func(url="https://example.com")
+    # A resumed run gets a fresh replay of the same store
+    with replaying(ToolReplay(store, run_id)):
+        replayed = await tool.func(url="https://example.com")
+
+    assert pool.calls == 1
+    assert replayed == called
+    text, (image,) = replayed
+    assert text == "screenshot of https://example.com"
+    assert isinstance(image, ImageContent)
+    assert (image.data, image.mimeType) == (PNG, "image/png")
+
+
+async def test_resumed_run_replays_completed_tool_calls(
+    monkeypatch, tmp_path, stub_server, fake_llm
+):
+    calls: list[str] = []
+    call_tool = SessionPool.call_tool
+
+    async def counting_call_tool(self, params, name, arguments):
+        calls.append(name)
+        return await call_tool(self, params, name, arguments)
+
+    monkeypatch.setattr(SessionPool, "call_tool", counting_call_tool)
+    store = CheckpointStore(tmp_path / "checkpoints.sqlite")
+    agent = MCPAgent(
+        model="fake",
+        api_key="k",
+        base_url=fake_llm(tool_calls=2),
+        params=stub_server(),
+        checkpoints=store,
+        route_requests=False,
+    )
+    async with agent:
+        checkpoint = store.create("Write a report")
+        await agent._collect(agent._checkpointed(checkpoint, echo=False))  # noqa: SLF001
+        assert len(calls) == 2
+
+        # As if the run had failed during its execution stage
+        finished = store.load(checkpoint.run_id)
+        store.save(finished.model_copy(update={"status": "failed", "messages": []}))
+        calls.clear()
+        messages = await agent.a_resume(checkpoint.run_id)
+
+        resumed = store.load(checkpoint.run_id)
+        assert calls == []
+        assert (resumed.status, resumed.attempts) == ("succeeded", 2)
+        assert resumed.plan == finished.plan
+        assert messages[-1]["content"] == "Done. TERMINATE"
+
+    with pytest.raises(sqlite3.ProgrammingError):
+        store.load(checkpoint.run_id)
+
+
+async def test_concurrent_resumes_of_a_run_execute_it_once(tmp_path, stub_server, fake_llm):
+    store = CheckpointStore(tmp_path / "checkpoints.sqlite")
+    async with MCPAgent(
+        model="fake",
+        api_key="k",
+        base_url=fake_llm(latency=0.05),
+        params=stub_server(),
+        checkpoints=store,
+        route_requests=False,
+    ) as agent:
+        checkpoint = store.create("Write a report")
+        store.save(checkpoint.model_copy(update={"status": "failed", "attempts": 1}))
+
+        first, second = await asyncio.gather(
+            agent.a_resume(checkpoint.run_id), agent.a_resume(checkpoint.run_id)
+        )
+
+        resumed = store.load(checkpoint.run_id)
+        assert (resumed.status, resumed.attempts) == ("succeeded", 2)
+        assert first == second
+        assert first[-1]["content"] == "Done. TERMINATE"
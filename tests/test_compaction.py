@@ -0,0 +1,91 @@
+from autogen import ConversableAgent
+
+from src.workflow.compaction import (
+    ContextBudget,
+    DropStaleTurns,
+    TruncateToolOutputs,
+    extract_plan,
+    add_compaction,
+)
+
+
+def message(role: str, tokens: int, **fields) -> dict:
+    return {"role": role, "content": "x" * tokens * 4, **fields}
+
+
+def test_only_tool_outputs_are_truncated():
+    long = "a" * 400 + "b" * 400
+    messages = [
+        {"role": "user", "content": long},
+        {"role": "tool", "content": long, "tool_responses": [{"role": "tool", "content": long}]},
+        {"role": "tool", "content": "short"},
+    ]
+    transform = TruncateToolOutputs(max_tokens=50)
+    compacted = transform.apply_transform(messages)
+
+    assert compacted[0] is messages[0]
+    assert compacted[1]["content"].startswith("a" * 100)
+    assert compacted[1]["content"].endswith("b" * 100)
+    assert "[... 600 characters omitted ...]" in compacted[1]["content"]
+    assert compacted[1]["tool_responses"][0]["content"] == compacted[1]["content"]
+    assert compacted[2] == messages[2]
+    # The stored history is left alone
+    assert messages[1]["content"] == long
+    log, changed = transform.get_logs(messages, compacted)
+    assert changed
+    assert log.startswith("Truncated tool outputs by")
+
+
+def test_oldest_turns_are_dropped_but_the_task_is_kept():
+    task = message("user", 10)
+    turns = [message("assistant", 30, name=f"turn {i}") for i in range(5)]
+    compacted = DropStaleTurns(max_tokens=75).apply_transform([task, *turns])
+
+    assert compacted == [task, *turns[-2:]]
+    assert DropStaleTurns(max_tokens=75).get_logs([task, *turns], compacted) == (
+        "Dropped 3 stale messages.",
+        True,
+    )
+
+
+def test_tool_results_keep_their_tool_call():
+    task = message("user", 1)
+    call = message("assistant", 1, tool_calls=[{"id": "call_1"}])
+    results = [message("tool", 40), message("tool", 40)]
+    # Over budget, the latest message is still kept along with the call it answers
+    compacted = DropStaleTurns(max_tokens=50).apply_transform([
+        task,
+        message("user", 5),
+        call,
+        *results,
+    ])
+
+    assert compacted == [task, call, *results]
+
+
+def test_plan_is_the_last_message_of_its_author():
+    messages = [
+        {"name": "assistant", "content": "Draft of the page."},
+        {"name": "planner", "content": "1. Open the page\n2. Add the draft"},
+        {"name": "assistant", "content": "Looks good. TERMINATE"},
+        {"name": "planner", "content": "TERMINATE"},
+        {"name": "assistant", "content": None, "tool_calls": []},
+    ]
+    assert extract_plan(messages, None, author="planner") == "1. Open the page\n2. Add the draft"
+    assert extract_plan(messages, None, author="reviewer") == "Looks good."
+    assert extract_plan([], None, author="planner") == ""
+
+    budget = ContextBudget(plan_tokens=2)
+    assert extract_plan(messages, budget, author="planner") == (
+        "1. O\n[... 25 characters omitted ...]\nraft"
+    )
+
+
+def test_agents_are_left_alone_without_a_budget():
+    def hooks(budget: ContextBudget | None) -> list:
+        agent = ConversableAgent(name="agent", llm_config=False)
+        add_compaction(budget, agent)
+        return agent.hook_lists["process_all_messages_before_reply"]
+
+    assert hooks(None) == []
+    assert len(hooks(ContextBudget())) == 1
@@ -0,0 +1,119 @@
+import json
+import pickle
+import sqlite3
+
+from main import MCPAgent
+from openai.types.chat import ChatCompletion
+
+from src.llm.completion_cache import SQLiteCompletionCache
+
+
+def request(content: str) -> dict:
+    return {"model": "gpt-4o", "messages": [{"role": "user", "content": content}]}
+
+
+def test_completions_survive_a_restart(tmp_path):
+    path = tmp_path / "completions.sqlite"
+    cache = SQLiteCompletionCache(path)
+    with cache:
+        assert cache.get(request("plan"), default="miss") == "miss"
+        cache.set(request("plan"), {"choices": ["step 1"]})
+    # Leaving the context keeps the connection open
+    assert cache.get(request("plan")) == {"choices": ["step 1"]}
+    cache.close()
+
+    reopened = SQLiteCompletionCache(path)
+    assert reopened.get(request("plan")) == {"choices": ["step 1"]}
+    stats = reopened.stats()
+    assert (stats.hits, stats.misses, stats.entries, stats.hit_rate) == (1, 0, 1, 1.0)
+    reopened.clear()
+    assert reopened.stats().entries == 0
+    reopened.close()
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = SQLiteCompletionCache(":memory:", max_entries=2)
+    cache.set(request("a"), "A")
+    cache.set(request("b"), "B")
+    cache.get(request("a"))
+    cache.set(request("c"), "C")
+
+    assert [cache.get(request(key)) for key in "abc"] == ["A", None, "C"]
+    assert cache.stats().evictions == 1
+
+
+def test_entries_are_evicted_beyond_max_bytes():
+    cache = SQLiteCompletionCache(":memory:", max_bytes=1000)
+    for key in "abcd":
+        cache.set(request(key), key * 400)
+
+    stats = cache.stats()
+    assert stats.size_bytes <= 1000
+    assert (stats.entries, stats.evictions) == (2, 2)
+    assert cache.get(request("d")) == "d" * 400
+
+
+def completion(content: str) -> ChatCompletion:
+    message = {"role": "assistant", "content": content}
+    return ChatCompletion.model_validate({
+        "id": "chatcmpl-1",
+        "object": "chat.completion",
+        "created": 1,
+        "model": "gpt-4o",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": message}],
+    })
+
+
+def test_completions_are_stored_as_json():
+    cache = SQLiteCompletionCache(":memory:")
+    response = completion("step 1")
+    response.cost = 0.25
+    response.message_retrieval_function = print
+    cache.set(request("plan"), response)
+
+    cached = cache.get(request("plan"))
+    assert isinstance(cached, ChatCompletion)
+    assert (cached.choices[0].message.content, cached.cost) == ("step 1", 0.25)
+    (stored,) = cache._conn.execute("SELECT value FROM completions").fetchone()  # noqa: SLF001
+    assert json.loads(stored)["chat_completion"]["id"] == "chatcmpl-1"
+
+
+def test_sampled_requests_are_not_cached():
+    cache = SQLiteCompletionCache(":memory:")
+    sampled = {**request("plan"), "temperature": 0.7}
+    cache.set(sampled, "step 1")
+    cache.set({**request("plan"), "temperature": 0}, "step 2")
+
+    assert cache.get(sampled) is None
+    assert cache.get({**request("plan"), "temperature": 0}) == "step 2"
+    stats = cache.stats()
+    assert (stats.skipped, stats.hits, stats.entries) == (1, 1, 1)
+
+
+def test_entries_that_are_not_json_are_misses(tmp_path):
+    path = tmp_path / "completions.sqlite"
+    SQLiteCompletionCache(path).close()
+    with sqlite3.connect(path) as conn:
+        digest = SQLiteCompletionCache._hash(request("plan"))  # noqa: SLF001
+        conn.execute("INSERT INTO completions VALUES (?, ?, 3, 0)", (digest, pickle.dumps("old")))
+
+    cache = SQLiteCompletionCache(path)
+    assert cache.get(request("plan"), default="miss") == "miss"
+    assert cache.stats().entries == 0
+
+
+async def test_repeated_plans_are_served_from_the_cache(stub_server, fake_llm, tmp_path):
+    async with MCPAgent(
+        model="fake",
+        api_key="k",
+        base_url=fake_llm(),
+        params=stub_server(),
+        completion_cache_path=str(tmp_path / "completions.sqlite"),
+    ) as agent:
+        for _ in range(2):
+            events = [event async for event in agent._planned_workflow("list", echo=False)]  # noqa: SLF001
+            assert events[-1].type == "run_finished"
+        stats = agent.completion_cache.stats()
+
+    assert stats.writes == stats.entries > 0
+    assert stats.hits == stats.entries
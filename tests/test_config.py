@@ -0,0 +1,20 @@
+import pytest
+
+from src.types.config import Config
+
+
+def test_llm_config_is_built_once_until_a_field_changes():
+    config = Config(model="gpt-4o", api_key="key", base_url="http://127.0.0.1:9/v1")
+    first = config.llm_config
+    assert config.llm_config is first
+
+    config.model = "gpt-4o-mini"
+    second = config.llm_config
+    assert second is not first
+    assert second.config_list[0].model == "gpt-4o-mini"
+
+
+def test_llm_config_rejects_unknown_api_types():
+    config = Config(model="gpt-4o", api_key="key", api_type="bedrock")
+    with pytest.raises(ValueError, match="Unsupported API type"):
+        _ = config.llm_config
@@ -0,0 +1,147 @@
+import pytest
+
+pytest.importorskip("nbconvert")
+
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+import nbformat
+from scripts.gen_docs import DocsGenerator, render_notebook, _shutdown_kernels
+
+
+def write_sources(source, names):
+    for name in names:
+        path = source / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"class {path.stem.title()}:\n    pass\n", encoding="utf-8")
+
+
+async def test_incremental_build_only_touches_changed_sources(tmp_path):
+    source, output = tmp_path / "src", tmp_path / "docs"
+    write_sources(source, ["a.py", "pkg/b.py", "pkg/c.py"])
+
+    def generator():
+        return DocsGenerator(source=source, output=output, mode="class")
+
+    first = await generator().build()
+    assert len(first.rebuilt) == 3
+    assert (output / "pkg" / "b.md").read_text(encoding="utf-8").endswith(".b.B\n")
+
+    unchanged = await generator().build()
+    assert (len(unchanged.rebuilt), len(unchanged.skipped)) == (0, 3)
+
+    (source / "a.py").write_text("class Renamed:\n    pass\n", encoding="utf-8")
+    (source / "pkg" / "c.py").unlink()
+    (source / "pkg" / "b.py").unlink()
+    changed = await generator().build()
+    assert changed.rebuilt == [(source / "a.py").as_posix()]
+    assert sorted(changed.removed) == sorted(
+        (source / "pkg" / name).as_posix() for name in ("b.py", "c.py")
+    )
+    assert "Renamed" in (output / "a.md").read_text(encoding="utf-8")
+    assert not (output / "pkg").exists()
+
+
+async def test_changed_mode_rebuilds_everything(tmp_path):
+    source, output = tmp_path / "src", tmp_path / "docs"
+    write_sources(source, ["a.py", "b.py"])
+
+    await DocsGenerator(source=source, output=output, mode="class").build()
+    report = await DocsGenerator(source=source, output=output, mode="file").build()
+
+    assert (len(report.rebuilt), len(report.skipped)) == (2, 0)
+
+
+async def test_removing_every_source_is_remembered(tmp_path):
+    source, output = tmp_path / "src", tmp_path / "docs"
+    write_sources(source, ["a.py"])
+
+    def generator():
+        return DocsGenerator(source=source, output=output, mode="class")
+
+    await generator().build()
+    (source / "a.py").unlink()
+    report = await generator().build()
+    assert report.removed == [(source / "a.py").as_posix()]
+    assert not (output / "a.md").exists()
+
+    again = await generator().build()
+    assert again.removed == []
+
+
+async def test_manifest_entries_outside_the_output_folder_are_not_deleted(tmp_path):
+    source, output = tmp_path / "src", tmp_path / "docs"
+    write_sources(source, ["a.py", "b.py"])
+
+    def generator():
+        return DocsGenerator(source=source, output=output, mode="class")
+
+    await generator().build()
+    outside = tmp_path / "keep.md"
+    outside.write_text("keep", encoding="utf-8")
+    manifest_path = generator().manifest_path
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    manifest["files"][(source / "b.py").as_posix()]["output"] = f"{output}/../keep.md"
+    manifest_path.write_text(json.dumps(manifest), encoding="utf-8")
+
+    (source / "b.py").unlink()
+    report = await generator().build()
+
+    assert report.removed == [(source / "b.py").as_posix()]
+    assert outside.read_text(encoding="utf-8") == "keep"
+
+
+def write_notebook(path, *sources):
+    notebook = nbformat.v4.new_notebook(
+        cells=[nbformat.v4.new_code_cell(source) for source in sources]
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    nbformat.write(notebook, path)
+
+
+LEAKS = "import os\nos.environ['LEAKED'] = 'yes'\nvalue = 42"
+CHECK = "import os\nprint('leaked' if 'LEAKED' in os.environ else 'clean', 'value' in dir())"
+
+
+async def test_executed_notebooks_each_get_a_fresh_kernel(tmp_path, monkeypatch):
+    pytest.importorskip("ipykernel")
+    # Once an agent configured logfire, `submit` pickles its config, span processors included;
+    # the docs script never builds an agent, so it runs with the plain `submit`
+    executors = pytest.importorskip("logfire._internal.integrations.executors")
+    monkeypatch.setattr(ProcessPoolExecutor, "submit", executors.submit_p_orig)
+    source, output = tmp_path / "src", tmp_path / "docs"
+    write_notebook(source / "first.ipynb", LEAKS, "print(value)")
+    write_notebook(source / "second.ipynb", CHECK)
+
+    report = await DocsGenerator(
+        source=source, output=output, mode="file", execute=True, concurrency=1
+    ).build()
+
+    assert sorted(report.rebuilt) == sorted(
+        (source / name).as_posix() for name in ("first.ipynb", "second.ipynb")
+    )
+    assert "42" in (output / "first.md").read_text(encoding="utf-8")
+    assert "clean False" in (output / "second.md").read_text(encoding="utf-8")
+    assert set(report.notebooks) == set(report.rebuilt)
+
+
+def test_reused_kernel_is_dropped_after_a_failing_notebook(tmp_path):
+    pytest.importorskip("ipykernel")
+    write_notebook(tmp_path / "leaks.ipynb", LEAKS)
+    write_notebook(tmp_path / "fails.ipynb", LEAKS, "raise ValueError('boom')")
+    write_notebook(tmp_path / "check.ipynb", CHECK)
+
+    def render(name):
+        markdown, _ = render_notebook(
+            (tmp_path / name).as_posix(), execute=True, reuse_kernel=True
+        )
+        return markdown
+
+    try:
+        # The namespace is reset between notebooks, the process is not
+        render("leaks.ipynb")
+        assert "leaked False" in render("check.ipynb")
+        assert "ValueError" in render("fails.ipynb")
+        assert "clean False" in render("check.ipynb")
+    finally:
+        _shutdown_kernels()
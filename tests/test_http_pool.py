@@ -0,0 +1,43 @@
+from main import MCPAgent
+
+from src.llm.http_pool import HttpPoolConfig, SharedHttpClient
+
+
+def chat(base_url: str, config: HttpPoolConfig) -> None:
+    body = {"model": "fake", "messages": [{"role": "user", "content": "hi"}]}
+    response = SharedHttpClient.get(config).post(f"{base_url}/chat/completions", json=body)
+    assert response.status_code == 200
+
+
+def test_requests_reuse_one_keepalive_connection(fake_llm):
+    base_url, config = fake_llm(), HttpPoolConfig(keepalive_expiry=11.0)
+    for _ in range(5):
+        chat(base_url, config)
+
+    stats = SharedHttpClient.stats(config)
+    assert (stats.requests, stats.connections_opened) == (5, 1)
+    assert (stats.open_connections, stats.idle_connections) == (1, 1)
+    assert stats.reuse_rate == 0.8
+
+
+def test_connections_are_counted_when_none_are_kept_alive(fake_llm):
+    base_url, config = fake_llm(), HttpPoolConfig(max_keepalive_connections=0)
+    for _ in range(3):
+        chat(base_url, config)
+
+    stats = SharedHttpClient.stats(config)
+    assert (stats.requests, stats.connections_opened, stats.open_connections) == (3, 3, 0)
+    assert stats.reuse_rate == 0
+
+
+async def test_agents_share_the_pooled_connection(stub_server, fake_llm):
+    config = HttpPoolConfig(keepalive_expiry=12.0)
+    async with MCPAgent(
+        model="fake", api_key="k", base_url=fake_llm(), params=stub_server(), http_pool=config
+    ) as agent:
+        for _ in range(2):
+            [event async for event in agent._simple_workflow("list", echo=False)]  # noqa: SLF001
+        stats = agent.llm_http_stats()
+
+    assert stats.requests >= 4
+    assert stats.connections_opened == 1
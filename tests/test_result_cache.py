@@ -0,0 +1,76 @@
+import asyncio
+
+from mcp.types import TextContent, CallToolResult
+
+from src.tools.result_cache import MemoryBackend, ToolCachePolicy, ToolResultCache
+
+
+class BrokenBackend:
+    async def get(self, key: str) -> bytes | None:
+        raise ConnectionError("redis is down")
+
+    async def set(self, key: str, value: bytes, ttl: float | None) -> None:
+        raise ConnectionError("redis is down")
+
+    async def clear(self) -> None:
+        raise ConnectionError("redis is down")
+
+
+def counting_call(text: str = "ok", delay: float = 0.0) -> tuple[list[int], object]:
+    calls = [0]
+
+    async def call() -> CallToolResult:
+        calls[0] += 1
+        await asyncio.sleep(delay)
+        return CallToolResult(content=[TextContent(type="text", text=text)])
+
+    return calls, call
+
+
+async def test_backend_failures_fall_through_to_the_tool():
+    cache = ToolResultCache(policies={"get_*": ToolCachePolicy()}, backend=BrokenBackend())
+    calls, call = counting_call()
+
+    for _ in range(2):
+        result = await cache.call("server", "get_issue", {"key": "A-1"}, call)
+        assert result.content[0].text == "ok"
+
+    assert calls[0] == 2
+    stats = cache.stats()[("server", "get_issue")]
+    assert (stats.misses, stats.hits, stats.backend_errors) == (2, 0, 4)
+
+
+async def test_results_are_served_from_the_backend():
+    cache = ToolResultCache(policies={"get_*": ToolCachePolicy()}, backend=MemoryBackend())
+    calls, call = counting_call()
+
+    await cache.call("server", "get_issue", {"key": "A-1"}, call)
+    await cache.call("server", "get_issue", {"key": "A-1"}, call)
+    await cache.call("server", "create_issue", {"key": "A-1"}, call)
+
+    assert calls[0] == 2
+    assert list(cache.stats()) == [("server", "get_issue")]
+
+
+async def test_identical_concurrent_calls_are_coalesced():
+    cache = ToolResultCache(policies={"get_*": ToolCachePolicy()})
+    calls, call = counting_call(delay=0.05)
+
+    results = await asyncio.gather(
+        *(cache.call("server", "get_issue", {"key": "A-1"}, call) for _ in range(5))
+    )
+
+    assert calls[0] == 1
+    assert {result.content[0].text for result in results} == {"ok"}
+    assert cache.stats()[("server", "get_issue")].coalesced == 4
+
+
+async def test_stats_keep_servers_apart():
+    cache = ToolResultCache(policies={"get_*": ToolCachePolicy()})
+    _, call = counting_call()
+
+    await cache.call("jira-a", "get_issue", {"key": "A-1"}, call)
+    await cache.call("jira-b", "get_issue", {"key": "A-1"}, call)
+
+    stats = cache.stats()
+    assert stats[("jira-a", "get_issue")].misses == stats[("jira-b", "get_issue")].misses == 1
@@ -0,0 +1,216 @@
+import json
+import time
+
+import httpx
+import pytest
+
+from src.llm.router import ROUTER_BASE_URL, LLMEndpoint, EndpointRouter
+from src.llm.http_pool import SharedHttpClient
+
+URL = f"{ROUTER_BASE_URL}/chat/completions"
+
+
+def completion(tokens: int = 10) -> dict:
+    return {"choices": [], "usage": {"prompt_tokens": 5, "completion_tokens": tokens}}
+
+
+@pytest.fixture
+def served(monkeypatch):
+    """Answers the router's requests with `handlers[host](request)` and records the hosts."""
+    handlers = {}
+    hosts: list[str] = []
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        hosts.append(request.url.host)
+        return handlers[request.url.host](request)
+
+    transport = httpx.MockTransport(handle)
+    monkeypatch.setattr(SharedHttpClient, "transport", classmethod(lambda cls, config: transport))
+    return handlers, hosts
+
+
+def router(*hosts: str, **kwargs) -> EndpointRouter:
+    endpoints = [LLMEndpoint(base_url=f"https://{host}/v1", api_key=host) for host in hosts]
+    return EndpointRouter(endpoints, model="gpt-4o", **kwargs)
+
+
+def post(router: EndpointRouter, **payload) -> httpx.Response:
+    return router.client().post(URL, json={"model": "gpt-4o", "messages": [], **payload})
+
+
+def test_rate_limited_endpoint_fails_over_and_cools_down(served):
+    handlers, hosts = served
+    handlers["a"] = lambda request: httpx.Response(429, headers={"retry-after": "2"})
+    handlers["b"] = lambda request: httpx.Response(200, json=completion())
+    llm = router("a", "b")
+
+    assert post(llm).status_code == 200
+    assert post(llm).status_code == 200
+
+    assert hosts == ["a", "b", "b"]
+    a, b = llm.stats()
+    assert (a.rate_limited, a.failures, b.requests) == (1, 1, 2)
+    assert 1.5 < a.cooldown_s <= 2
+
+
+def test_connection_errors_fail_over(served):
+    handlers, hosts = served
+
+    def refuse(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("refused", request=request)
+
+    handlers["a"] = refuse
+    handlers["b"] = lambda request: httpx.Response(200, json=completion())
+
+    assert post(router("a", "b")).status_code == 200
+    assert hosts == ["a", "b"]
+
+
+def test_last_failure_is_returned_when_every_endpoint_fails(served):
+    handlers, _ = served
+    handlers["a"] = handlers["b"] = lambda request: httpx.Response(503)
+
+    assert post(router("a", "b")).status_code == 503
+
+
+def test_requests_are_rewritten_for_each_endpoint(served):
+    handlers, _ = served
+    seen: list[httpx.Request] = []
+
+    def record(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        return httpx.Response(200, json=completion())
+
+    handlers["azure.example"] = handlers["openai.example"] = record
+    llm = EndpointRouter(
+        [
+            LLMEndpoint(api_type="azure", base_url="https://azure.example", api_key="az"),
+            LLMEndpoint(base_url="https://openai.example/v1", api_key="oa", model="gpt-4.1"),
+        ],
+        model="gpt-4.1",
+    )
+    post(llm)
+    handlers["azure.example"] = lambda request: httpx.Response(500)
+    post(llm)
+
+    azure = seen[0]
+    assert azure.url.path == "/openai/deployments/gpt-41/chat/completions"
+    assert azure.url.params["api-version"] == "2025-04-01-preview"
+    assert azure.headers["api-key"] == "az"
+    openai = seen[1]
+    assert openai.url.path == "/v1/chat/completions"
+    assert openai.headers["authorization"] == "Bearer oa"
+    assert json.loads(openai.content)["model"] == "gpt-4.1"
+
+
+def test_exhausted_budgets_do_not_block_the_caller(served):
+    handlers, hosts = served
+    handlers["a"] = handlers["b"] = lambda request: httpx.Response(200, json=completion())
+    endpoints = [
+        LLMEndpoint(base_url=f"https://{host}/v1", api_key=host, requests_per_minute=1)
+        for host in ("a", "b")
+    ]
+    llm = EndpointRouter(endpoints, model="gpt-4o")
+
+    started = time.monotonic()
+    for _ in range(4):
+        assert post(llm).status_code == 200
+
+    assert time.monotonic() - started < 1
+    assert sorted(hosts[:2]) == ["a", "b"]
+    assert [stats.headroom for stats in llm.stats()] == [0.0, 0.0]
+
+
+def test_long_completions_are_not_latency_spikes(served):
+    handlers, _ = served
+    tokens = iter([10, 10, 10, 400])
+
+    def generate(request: httpx.Request) -> httpx.Response:
+        count = next(tokens)
+        # A non-streamed response only starts once the whole completion is generated
+        time.sleep(count * 0.0005)
+        return httpx.Response(200, json=completion(count))
+
+    handlers["a"] = generate
+    handlers["b"] = lambda request: httpx.Response(200, json=completion())
+    llm = router("a", "b")
+    llm._order = lambda now: llm._states  # noqa: SLF001
+    for _ in range(4):
+        post(llm)
+
+    assert llm.stats()[0].cooldown_s == 0
+
+
+def test_slow_first_token_of_a_stream_is_a_spike(served):
+    handlers, _ = served
+    delays = iter([0.005, 0.005, 0.005, 0.2])
+
+    def stream(request: httpx.Request) -> httpx.Response:
+        time.sleep(next(delays))
+        return httpx.Response(200, text="data: [DONE]\n\n")
+
+    handlers["a"] = stream
+    handlers["b"] = lambda request: httpx.Response(200, text="data: [DONE]\n\n")
+    llm = router("a", "b")
+    llm._order = lambda now: llm._states  # noqa: SLF001
+    for _ in range(4):
+        post(llm, stream=True)
+
+    assert llm.stats()[0].cooldown_s > 0
+
+
+def test_cooled_down_endpoint_is_used_again(served):
+    handlers, hosts = served
+    handlers["a"] = lambda request: httpx.Response(503)
+    handlers["b"] = lambda request: httpx.Response(200, json=completion())
+    llm = router("a", "b", failure_cooldown=0.2)
+
+    post(llm)
+    handlers["a"] = lambda request: httpx.Response(200, json=completion())
+    post(llm)
+    time.sleep(0.25)
+    post(llm)
+
+    assert hosts == ["a", "b", "b", "a"]
+
+
+def test_repeated_failures_back_off_exponentially(served):
+    handlers, _ = served
+    handlers["a"] = lambda request: httpx.Response(500)
+    llm = router("a", failure_cooldown=1.0)
+
+    cooldowns = []
+    for _ in range(3):
+        post(llm)
+        cooldowns.append(llm.stats()[0].cooldown_s)
+
+    assert [round(cooldown) for cooldown in cooldowns] == [1, 2, 4]
+
+
+def test_reported_limits_steer_requests_to_the_other_endpoint(served):
+    handlers, hosts = served
+    exhausted = {"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "30s"}
+    handlers["a"] = lambda request: httpx.Response(200, headers=exhausted, json=completion())
+    handlers["b"] = lambda request: httpx.Response(200, json=completion())
+    llm = router("a", "b")
+
+    for _ in range(3):
+        post(llm)
+
+    assert hosts == ["a", "b", "b"]
+    assert llm.stats()[0].headroom == 0
+
+
+def test_connection_error_is_raised_when_every_endpoint_is_down(served):
+    handlers, hosts = served
+
+    def refuse(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("refused", request=request)
+
+    handlers["a"] = handlers["b"] = refuse
+    llm = router("a", "b")
+
+    with pytest.raises(httpx.ConnectError, match="refused"):
+        post(llm)
+    assert sorted(hosts) == ["a", "b"]
+    assert all(stats.cooldown_s > 0 for stats in llm.stats())
@@ -0,0 +1,46 @@
+from main import MCPAgent
+from autogen import ConversableAgent
+
+from src.workflow.agents import AgentSet
+from src.sessions.connection import server_key
+
+
+def stages(events) -> list[str]:
+    return [f"{event.type}:{event.stage}" for event in events if event.type.startswith("stage")]
+
+
+async def test_simple_requests_skip_the_plan(stub_server, fake_llm):
+    params = stub_server()
+    async with MCPAgent(model="fake", api_key="k", base_url=fake_llm(), params=params) as agent:
+        events = [event async for event in agent._routed_workflow("list", echo=False)]  # noqa: SLF001
+        # The catalog was loaded, and its session opened, while the router was answering
+        assert agent.session_pool.stats()[server_key(params)].created == 1
+
+    routed = next(event for event in events if event.type == "routed")
+    assert (routed.route, routed.reply) == ("direct", "DIRECT")
+    assert stages(events) == [
+        "stage_started:route",
+        "stage_finished:route",
+        "stage_started:execute",
+        "stage_finished:execute",
+    ]
+    assert events[-1].summary == "Done. "
+
+
+async def test_other_replies_keep_the_plan(stub_server, fake_llm, monkeypatch):
+    async with MCPAgent(
+        model="fake", api_key="k", base_url=fake_llm(), params=stub_server()
+    ) as agent:
+
+        def build_router() -> AgentSet:
+            router = ConversableAgent("router", llm_config=False)
+            router.register_reply([None], lambda *args, **kwargs: (True, "Direct, no PLAN"))
+            return AgentSet(router=router)
+
+        monkeypatch.setattr(agent, "_build_router", build_router)
+        events = [event async for event in agent._routed_workflow("list", echo=False)]  # noqa: SLF001
+
+    routed = next(event for event in events if event.type == "routed")
+    assert routed.route == "plan"
+    assert "stage_started:plan" in stages(events)
+    assert events[-1].type == "run_finished"
@@ -0,0 +1,146 @@
+import asyncio
+
+import pytest
+
+from src.sessions.pool import SessionPool
+from src.sessions.connection import server_key, server_name
+
+from .conftest import kill_stub_servers
+
+
+async def wait_until(condition, timeout: float = 10.0) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not met in time"
+        await asyncio.sleep(0.05)
+
+
+@pytest.fixture
+async def make_pool():
+    pools: list[SessionPool] = []
+
+    def make(**options) -> SessionPool:
+        pools.append(SessionPool(**options))
+        return pools[-1]
+
+    yield make
+    for pool in pools:
+        await pool.aclose()
+
+
+async def test_stats_keep_servers_with_the_same_name_apart(stub_server, make_pool):
+    small, large = stub_server(tools=1), stub_server(tools=5)
+    assert server_name(small) == server_name(large)
+
+    pool = make_pool()
+    await pool.warmup(small)
+    await pool.warmup(large)
+    stats = pool.stats()
+
+    assert set(stats) == {server_key(small), server_key(large)}
+    assert all(entry.idle == 1 for entry in stats.values())
+
+
+async def test_warmup_opens_min_size_sessions(stub_server, make_pool):
+    params, pool = stub_server(), make_pool(min_size=2)
+    await pool.warmup(params)
+
+    async with pool.session(params) as session:
+        assert (await session.list_tools()).tools
+    stats = pool.stats()[server_key(params)]
+    assert (stats.created, stats.idle, stats.reused) == (2, 2, 1)
+
+
+async def test_checkout_waits_for_a_free_session_at_max_size(stub_server, make_pool):
+    params, pool = stub_server(), make_pool(max_size=1)
+
+    async def borrow() -> None:
+        async with pool.session(params):
+            pass
+
+    async with pool.session(params):
+        waiting = asyncio.create_task(borrow())
+        await asyncio.sleep(0.2)
+        assert not waiting.done()
+    await asyncio.wait_for(waiting, timeout=5)
+
+    stats = pool.stats()[server_key(params)]
+    assert (stats.created, stats.reused, stats.waits) == (1, 1, 1)
+
+
+async def test_idle_sessions_beyond_min_size_are_evicted(stub_server, make_pool):
+    params = stub_server()
+    pool = make_pool(min_size=1, idle_timeout=0.2, reap_interval=0.05)
+    async with pool.session(params), pool.session(params):
+        pass
+    assert pool.stats()[server_key(params)].idle == 2
+
+    await wait_until(lambda: pool.stats()[server_key(params)].evicted == 1)
+    await asyncio.sleep(0.3)
+    stats = pool.stats()[server_key(params)]
+    assert (stats.evicted, stats.idle) == (1, 1)
+
+
+async def test_session_failing_its_ping_is_replaced(stub_server, make_pool):
+    params = stub_server()
+    pool = make_pool(min_size=1, ping_interval=0.0, ping_timeout=1.0, reap_interval=0.1)
+    await pool.warmup(params)
+    assert kill_stub_servers() == 1
+
+    await wait_until(lambda: pool.stats()[server_key(params)].created == 2)
+    stats = pool.stats()[server_key(params)]
+    assert (stats.reconnects, stats.idle) == (1, 1)
+    result = await pool.call_tool(params, "tool_0", {"query": "again"})
+    assert not result.isError
+
+
+async def test_call_tool_reconnects_after_the_server_crashed(stub_server, make_pool):
+    params, pool = stub_server(payload=4), make_pool()
+    assert (await pool.call_tool(params, "tool_0")).content[0].text == "xxxx"
+    assert kill_stub_servers() == 1
+
+    result = await asyncio.wait_for(pool.call_tool(params, "tool_0"), timeout=10)
+    assert result.content[0].text == "xxxx"
+    stats = pool.stats()[server_key(params)]
+    assert (stats.created, stats.reconnects) == (2, 1)
+
+
+async def test_concurrent_calls_share_one_session(stub_server, make_pool):
+    params, pool = stub_server(latency=0.3, payload=4), make_pool()
+    await pool.warmup(params)
+
+    started = asyncio.get_running_loop().time()
+    results = await asyncio.gather(*(pool.call_tool(params, "tool_0") for _ in range(6)))
+    elapsed = asyncio.get_running_loop().time() - started
+
+    assert [result.content[0].text for result in results] == ["xxxx"] * 6
+    assert elapsed < 6 * 0.3
+    stats = pool.stats()[server_key(params)]
+    assert (stats.created, stats.multiplexed, stats.idle) == (1, 5, 1)
+
+
+async def test_calls_beyond_max_concurrent_calls_wait(stub_server, make_pool):
+    params, pool = stub_server(latency=0.3), make_pool(max_concurrent_calls=2)
+    await pool.warmup(params)
+
+    started = asyncio.get_running_loop().time()
+    await asyncio.gather(*(pool.call_tool(params, "tool_0") for _ in range(4)))
+    elapsed = asyncio.get_running_loop().time() - started
+
+    assert elapsed >= 2 * 0.3
+    assert pool.stats()[server_key(params)].created == 1
+
+
+async def test_call_in_flight_when_its_session_ends_is_retried(stub_server, make_pool):
+    params, pool = stub_server(latency=0.5, payload=4), make_pool()
+    await pool.warmup(params)
+    call = asyncio.create_task(pool.call_tool(params, "tool_0"))
+    await asyncio.sleep(0.2)
+
+    # Ends the session under the call, its request is never answered
+    await pool._slots[server_key(params)].shared.close()  # noqa: SLF001
+
+    result = await asyncio.wait_for(call, timeout=10)
+    assert result.content[0].text == "xxxx"
+    stats = pool.stats()[server_key(params)]
+    assert (stats.created, stats.reconnects) == (2, 1)
@@ -0,0 +1,50 @@
+from src.tools.spill import READ_CHUNK, SpillStore
+
+
+def handle_of(reply: str) -> str:
+    return reply.split("`")[3]
+
+
+def test_small_results_stay_in_the_chat():
+    store = SpillStore(":memory:", threshold=10)
+    assert store.spill("get_page", "short") == "short"
+    assert store.stats().spilled == 0
+
+
+def test_large_results_are_paged_through_read_chunk():
+    store = SpillStore(":memory:", threshold=10, preview_chars=4, max_chunk_chars=8)
+    text = "".join(str(i % 10) for i in range(20))
+    reply = store.spill("get_page", text)
+    assert reply.endswith("\n0123")
+
+    tool = store.read_chunk_tool()
+    assert tool.name == READ_CHUNK
+    handle = handle_of(reply)
+    pages, offset = [], 0
+    while True:
+        chunk, position = tool.func(handle, offset=offset, length=100).rsplit("\n", 1)
+        pages.append(chunk)
+        if "end of result" in position:
+            break
+        offset += len(chunk)
+    assert "".join(pages) == text
+    assert [len(page) for page in pages] == [8, 8, 4]
+
+    # The same content is stored once
+    assert handle_of(store.spill("get_page", text)) == handle
+    stats = store.stats()
+    assert (stats.spilled, stats.entries, stats.chunks_read) == (2, 1, 3)
+    assert stats.size_bytes == len(text)
+
+
+def test_least_recently_read_results_are_evicted(tmp_path):
+    store = SpillStore(tmp_path / "spill.sqlite", threshold=1, max_bytes=25)
+    first = handle_of(store.spill("get_page", "a" * 10))
+    second = handle_of(store.spill("get_page", "b" * 10))
+    store.read_chunk(first)
+    store.spill("get_page", "c" * 10)
+
+    assert store.read_chunk(first).startswith("a" * 10)
+    assert "may have been evicted" in store.read_chunk(second)
+    assert store.stats().evictions == 1
+    store.close()
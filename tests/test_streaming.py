@@ -0,0 +1,71 @@
+import asyncio
+
+from main import MCPAgent
+from autogen import ConversableAgent
+from autogen.events.agent_events import TextEvent
+from autogen.events.client_events import StreamEvent
+
+from src.workflow.streaming import ChatRun, EventTranslator
+
+
+async def test_events_follow_the_run(stub_server, fake_llm):
+    async with MCPAgent(
+        model="fake", api_key="k", base_url=fake_llm(tool_calls=2), params=stub_server(payload=4)
+    ) as agent:
+        # The non-streaming workflow, streaming counts tokens with tiktoken
+        events = [event async for event in agent._simple_workflow("list", echo=False)]  # noqa: SLF001
+
+    assert [event.type for event in events] == [
+        "stage_started",
+        "turn",
+        "turn",
+        "tool_call_started",
+        "tool_call_started",
+        "tool_call_finished",
+        "tool_call_finished",
+        "turn",
+        "turn",
+        "terminated",
+        "stage_finished",
+        "run_finished",
+    ]
+    assert events[2].tool_calls == ["tool_0", "tool_1"]
+    started, finished = events[3:5], events[5:7]
+    assert [event.call_id for event in started] == [event.call_id for event in finished]
+    assert all(event.success and event.content == "('xxxx', None)" for event in finished)
+    assert events[-1].summary == "Done. "
+
+
+def test_token_deltas_belong_to_the_agent_that_speaks_next():
+    translator = EventTranslator(stage="plan")
+    turn = translator.translate(
+        TextEvent(content="Plan it", sender="assistant", recipient="planner")
+    )
+    deltas = translator.translate(StreamEvent(content="1. "))
+
+    assert turn[0].recipient == "planner"
+    assert [(delta.type, delta.agent, delta.content) for delta in deltas] == [
+        ("token", "planner", "1. ")
+    ]
+
+
+async def test_closing_a_chat_run_stops_the_chat():
+    replied = asyncio.Event()
+    started = asyncio.Event()
+
+    async def slow_reply(recipient, messages=None, sender=None, config=None):
+        started.set()
+        await asyncio.sleep(10)
+        replied.set()
+        return True, "done"
+
+    user = ConversableAgent(name="user", llm_config=False, human_input_mode="NEVER")
+    assistant = ConversableAgent(name="assistant", llm_config=False, human_input_mode="NEVER")
+    assistant.register_reply([ConversableAgent, None], slow_reply)
+
+    chat = ChatRun(user, assistant, message="hi", max_turns=1)
+    async with chat:
+        await asyncio.wait_for(started.wait(), timeout=5)
+
+    assert chat.task.cancelled()
+    assert not replied.is_set()
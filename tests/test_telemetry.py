@@ -0,0 +1,134 @@
+import sys
+import json
+import asyncio
+import subprocess
+import urllib.request
+
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from src.types.events import RunStarted, RunFinished, StageStarted, StageFinished
+from src.utils.telemetry import SpanRecorder, JsonlSpanExporter, trace_stages
+
+
+async def test_stage_spans_are_children_of_the_run_span(monkeypatch):
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    monkeypatch.setattr(trace, "get_tracer", provider.get_tracer)
+
+    async def events():
+        yield RunStarted(run_id="r-1")
+        for stage in ("plan", "execute"):
+            yield StageStarted(stage=stage)
+            yield StageFinished(stage=stage, duration=0.0)
+        yield RunFinished(messages=[], summary="", duration=0.0)
+
+    outer = provider.get_tracer("test").start_span("caller")
+    with trace.use_span(outer, end_on_exit=True):
+        seen = [event.type async for event in trace_stages(events())]
+
+    assert seen[0] == "run_started"
+    spans = {span.name: span for span in exporter.get_finished_spans()}
+    run = spans["run"]
+    assert run.attributes["run_id"] == "r-1"
+    for stage in ("stage plan", "stage execute"):
+        assert spans[stage].parent.span_id == run.context.span_id
+
+
+async def test_work_done_during_a_stage_is_a_child_of_the_stage(monkeypatch):
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    monkeypatch.setattr(trace, "get_tracer", provider.get_tracer)
+    tracer = provider.get_tracer("test")
+
+    async def call_tool(name: str) -> None:
+        with tracer.start_as_current_span(name):
+            await asyncio.sleep(0)
+
+    async def events():
+        yield RunStarted(run_id="r-1")
+        call = asyncio.create_task(call_tool("catalog"))
+        await call
+        for stage in ("plan", "execute"):
+            yield StageStarted(stage=stage)
+            # Like a chat task, started during the stage and awaited on a later step
+            chat = asyncio.create_task(call_tool(f"chat {stage}"))
+            yield StageFinished(stage=stage, duration=0.0)
+            await chat
+            await call_tool(f"tool {stage}")
+        yield RunFinished(messages=[], summary="", duration=0.0)
+
+    async for _ in trace_stages(events()):
+        # The caller's own work stays outside of the stages
+        await call_tool("caller")
+
+    spans = {span.name: span for span in exporter.get_finished_spans()}
+    run = spans["run"].context.span_id
+    assert spans["catalog"].parent.span_id == run
+    for stage in ("plan", "execute"):
+        assert spans[f"chat {stage}"].parent.span_id == spans[f"stage {stage}"].context.span_id
+        assert spans[f"tool {stage}"].parent.span_id == run
+    assert spans["caller"].parent is None
+
+
+def test_importing_main_does_not_configure_telemetry():
+    script = (
+        "from logfire._internal.config import GLOBAL_CONFIG\n"
+        "import main\n"
+        "print(GLOBAL_CONFIG._initialized)\n"
+        "main.MCPAgent(model='m', api_key='k', params=main.StdioServerParameters(command='-'))\n"
+        "print(GLOBAL_CONFIG._initialized)\n"
+    )
+    output = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True, timeout=120
+    ).stdout
+    assert output.split() == ["False", "True"]
+
+
+def finished_spans(*processors):
+    provider = TracerProvider()
+    for processor in processors:
+        provider.add_span_processor(processor)
+    tracer = provider.get_tracer("test")
+    for size in (10, 30):
+        with tracer.start_as_current_span("Call MCP tool", attributes={"result_size": size}):
+            pass
+    with tracer.start_as_current_span("chat", attributes={"request_data": '{"model": "m"}'}):
+        pass
+    provider.shutdown()
+
+
+def test_recorder_serves_latency_and_counters_to_prometheus():
+    recorder = SpanRecorder()
+    finished_spans(recorder)
+
+    summary = recorder.summary()
+    assert summary["Call MCP tool"].count == 2
+    assert summary["Call MCP tool"].counters == {"result_size": 40}
+    assert summary["chat"].counters == {"request_size": 14}
+
+    server = recorder.serve_prometheus(port=0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:  # noqa: S310
+            body = response.read().decode()
+    finally:
+        server.shutdown()
+    assert 'mcp_agents_span_duration_seconds_count{span="Call MCP tool"} 2' in body
+    assert (
+        'mcp_agents_span_attribute_total{span="Call MCP tool",attribute="result_size"} 40' in body
+    )
+
+
+def test_jsonl_exporter_writes_a_line_per_span(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    finished_spans(SimpleSpanProcessor(JsonlSpanExporter(str(path))))
+
+    spans = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [span["name"] for span in spans] == ["Call MCP tool", "Call MCP tool", "chat"]
+    assert spans[0]["attributes"] == {"result_size": 10}
+    assert all(span["parent_id"] is None and span["duration"] >= 0 for span in spans)
@@ -0,0 +1,84 @@
+import json
+
+from autogen import ConversableAgent
+from autogen.tools import Tool
+
+from src.tools.selection import BM25Index, ToolSelection, tool_document, register_tools
+
+DESCRIPTIONS = {
+    "jira_get_issue": "Get a Jira issue by its key.",
+    "jira_search": "Search Jira issues with JQL.",
+    "confluence_get_page": "Get a Confluence page by its title.",
+    "confluence_create_page": "Create a Confluence page.",
+    "slack_post_message": "Post a message to a Slack channel.",
+}
+
+
+def make_tools(calls: list[str]) -> list[Tool]:
+    def make(name: str) -> Tool:
+        def run(query: str) -> str:
+            calls.append(name)
+            return f"{name}: {query}"
+
+        return Tool(name=name, description=DESCRIPTIONS[name], func_or_tool=run)
+
+    return [make(name) for name in DESCRIPTIONS]
+
+
+def select(tools: list[Tool], query: str, **options):
+    index = BM25Index({tool.name: tool_document(tool) for tool in tools})
+    return ToolSelection(**options).select(tools, index, detail="all", query=query)
+
+
+def exposed(agent: ConversableAgent) -> set[str]:
+    return {tool["function"]["name"] for tool in agent.llm_config.get("tools", [])}
+
+
+def test_top_k_keeps_the_best_matches_and_pinned_tools():
+    tools = make_tools([])
+    selected = select(tools, "post the summary to slack", top_k=1, pinned=["jira_*"])
+
+    assert [tool.name for tool in selected.tools] == [
+        "jira_get_issue",
+        "jira_search",
+        "slack_post_message",
+    ]
+    assert {tool.name for tool in selected.pruned} == {
+        "confluence_get_page",
+        "confluence_create_page",
+    }
+    assert "`slack_post_message`" in selected.detail
+    assert 0 < selected.saved_tokens < selected.tokens_full
+
+
+def test_every_tool_is_kept_when_nothing_matches():
+    tools = make_tools([])
+    selected = select(tools, "what is the weather like", top_k=2)
+
+    assert selected.tools == tools
+    assert (selected.pruned, selected.detail, selected.saved_tokens) == ([], "all", 0)
+
+
+async def test_calling_a_pruned_tool_exposes_every_tool():
+    calls: list[str] = []
+    selected = select(make_tools(calls), "create a confluence page", top_k=1)
+    caller = ConversableAgent(
+        "caller", llm_config={"config_list": [{"model": "gpt-4o", "api_key": "test"}]}
+    )
+    executor = ConversableAgent("executor", llm_config=False)
+    expansions: list[bool] = []
+    register_tools(
+        selected, callers=[caller], executors=[executor], on_expand=lambda: expansions.append(True)
+    )
+    assert exposed(caller) == {"confluence_create_page"}
+    assert set(executor.function_map) == set(DESCRIPTIONS)
+
+    for _ in range(2):
+        call = {"name": "slack_post_message", "arguments": json.dumps({"query": "hi"})}
+        success, result = await executor.a_execute_function(call)
+        assert success
+        assert result["content"] == "slack_post_message: hi"
+
+    assert calls == ["slack_post_message"] * 2
+    assert expansions == [True]
+    assert exposed(caller) == set(DESCRIPTIONS)
@@ -0,0 +1,77 @@
+import os
+import signal
+import asyncio
+from pathlib import Path
+from functools import partial
+from collections.abc import AsyncIterator
+
+import pytest
+
+from src.types.events import RunEvent, StageStarted
+from src.server.workers import WorkerPool, WorkerError
+
+
+class SlowAgent:
+    """Agent of the worker processes, a run writes `<message>` to `log` once it finished."""
+
+    def __init__(self, log: str, seconds: float = 1.0):
+        self.log = Path(log)
+        self.seconds = seconds
+
+    async def a_stream(
+        self, message: str, planning: bool = False, conversation_id: str | None = None
+    ) -> AsyncIterator[RunEvent]:
+        yield StageStarted(stage=str(os.getpid()))
+        await asyncio.sleep(self.seconds)
+        with self.log.open("a") as log:
+            log.write(f"{message}\n")
+
+    async def aclose(self) -> None:
+        pass
+
+
+async def first_event(pool: WorkerPool, message: str, **kwargs) -> RunEvent:
+    stream = pool.a_stream(message, **kwargs)
+    try:
+        return await stream.__anext__()
+    finally:
+        await stream.aclose()
+
+
+@pytest.fixture
+async def pool(tmp_path):
+    log = tmp_path / "finished.log"
+    log.touch()
+    pool = WorkerPool(partial(SlowAgent, str(log), seconds=0.5), workers=2, shutdown_timeout=5)
+    yield pool, log
+    await pool.aclose()
+
+
+async def test_runs_of_a_conversation_stay_on_one_worker(pool):
+    workers, _ = pool
+    pids = {(await first_event(workers, "hi", conversation_id="c-1")).stage for _ in range(3)}
+    assert len(pids) == 1
+
+
+async def test_abandoned_run_is_cancelled_in_the_worker(pool):
+    workers, log = pool
+    await first_event(workers, "abandoned")
+    async for _ in workers.a_stream("finished"):
+        pass
+    await asyncio.sleep(0.5)
+    assert log.read_text().split() == ["finished"]
+
+
+async def test_runs_never_wait_on_a_dead_worker(pool):
+    workers, _ = pool
+    stream = workers.a_stream("doomed", conversation_id="c-1")
+    pid = int((await stream.__anext__()).stage)
+    os.kill(pid, signal.SIGKILL)
+    with pytest.raises(WorkerError, match="exited"):
+        await asyncio.wait_for(stream.__anext__(), timeout=10)
+
+    # Runs keep being served, by the other worker or the replacement
+    for _ in range(10):
+        event = await asyncio.wait_for(first_event(workers, "hi", conversation_id="c-1"), 10)
+        assert int(event.stage) != pid
+    assert sum(stats.restarts for stats in workers.stats()) == 1